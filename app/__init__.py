@@ -1,4 +1,5 @@
 from flask import Flask
+import click
 from flask_login import LoginManager, UserMixin
 import os
 from dotenv import load_dotenv
@@ -15,27 +16,19 @@ class UserSession(UserMixin):
         self.role = user_row['role']
         self.phone = user_row['phone']
 
-def create_app():
-    app = Flask(__name__)
-    
-    app.config['SECRET_KEY'] = os.environ.get('SESSION_SECRET')
-    
-    app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 31536000
-    app.config['TEMPLATES_AUTO_RELOAD'] = False
-    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
-    
-    @app.after_request
-    def add_header(response):
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, public, max-age=0'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
-        return response
+def _load_user_session(user_id):
+    """Carrega (UserSession, session_version) para o cache de identidade; usuários inativos não logam"""
+    from app.db_operations import User
     
-    from app.database import init_db
+    user_row = User.get_by_id(user_id)
+    if not user_row or user_row['is_active'] == 0:
+        return None
+    return UserSession(user_row), user_row['session_version']
+
+def seed_defaults():
+    """Cria admin, configurações, categorias e produtos de exemplo em um banco vazio"""
     from app.db_operations import User, Settings, Category, Product
     
-    init_db()
-    
     if User.count() == 0:
         default_password = os.getenv('ADMIN_DEFAULT_PASSWORD', 'admin123')
         User.create(username='admin', email='admin@meatz.com', password=default_password, role='admin')
@@ -190,6 +183,37 @@ def create_app():
         
         print('✅ 12 produtos criados')
         print('🎉 Dados de exemplo carregados com sucesso!')
+
+def create_app():
+    app = Flask(__name__)
+    
+    app.config['SECRET_KEY'] = os.environ.get('SESSION_SECRET')
+    
+    app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 31536000
+    app.config['TEMPLATES_AUTO_RELOAD'] = False
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+    
+    from app.boot_profile import boot_phase
+    
+    with boot_phase('extensões'):
+        from app import http_cache, assets, images, fragments, jobs, query_stats, metrics
+        query_stats.init_app(app)
+        metrics.init_app(app)
+        http_cache.init_app(app)
+        assets.init_app(app)
+        images.init_app(app)
+        fragments.init_app(app)
+        jobs.init_app(app)
+    
+    from app.database import init_db
+    
+    # Com o esquema em dia o boot faz uma única consulta; os dados padrão só são
+    # conferidos quando o banco acabou de ser criado ou migrado
+    with boot_phase('init_db'):
+        schema_changed = init_db()
+    if schema_changed:
+        with boot_phase('seed'):
+            seed_defaults()
     
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'  # type: ignore
@@ -197,42 +221,152 @@ def create_app():
     
     @login_manager.user_loader
     def load_user(user_id):
-        from app.db_operations import User
-        user_row = User.get_by_id(int(user_id))
-        if user_row:
-            return UserSession(user_row)
-        return None
+        from app.cache import user_cache
+        
+        return user_cache.get(int(user_id), _load_user_session)
+    
+    with boot_phase('blueprints'):
+        from app.routes import main
+        from app.auth import auth
+        from app.admin import admin
+        from app.pdv import pdv
+        from app.chatbot import chatbot
+        
+        app.register_blueprint(main)
+        app.register_blueprint(auth, url_prefix='/auth')
+        app.register_blueprint(admin, url_prefix='/admin')
+        app.register_blueprint(pdv, url_prefix='/pdv')
+        app.register_blueprint(chatbot, url_prefix='/chatbot')
+    
+    @app.cli.command('db-version')
+    def db_version():
+        """Mostra a versão do esquema e o histórico de migrações aplicadas"""
+        from app.database import SCHEMA_VERSION, get_schema_version, get_applied_migrations
+        
+        for row in get_applied_migrations():
+            print(f"  {row['version']:>3}  {row['applied_at']}  {row['duration_ms'] or 0:>8.1f} ms  {row['description']}")
+        print(f'🗄️  Esquema na versão {get_schema_version()} (última: {SCHEMA_VERSION})')
+    
+    @app.cli.command('boot-profile')
+    @click.option('--runs', default=3, show_default=True, help='Quantidade de boots a frio medidos')
+    @click.option('--top', default=15, show_default=True, help='Quantidade de importações listadas')
+    def boot_profile(runs, top):
+        """Mede o boot a frio (importações, init_db, seed, blueprints) em processos novos"""
+        from app.boot_profile import run_profile, print_report
+        
+        profiles = []
+        for _ in range(max(1, runs)):
+            try:
+                profiles.append(run_profile())
+            except RuntimeError as e:
+                raise click.ClickException(f'Falha ao medir o boot: {e}')
+        print_report(profiles, top=top)
+    
+    @app.cli.command('slow-queries')
+    @click.option('--top', default=10, show_default=True, help='Quantidade de rotas listadas')
+    def slow_queries(top):
+        """Resume o log de consultas lentas por rota (tempo de banco e padrões N+1)"""
+        from app.query_stats import SLOW_QUERY_LOG, read_log, summarize_log
+        
+        routes = summarize_log(read_log())
+        if not routes:
+            print(f'✅ Nenhuma requisição lenta registrada em {SLOW_QUERY_LOG}')
+            return
+        ranked = sorted(routes.items(), key=lambda item: item[1]['db_ms'], reverse=True)
+        for endpoint, route in ranked[:top]:
+            print(f"🐢 {endpoint}: {route['requests']} requisições lentas | "
+                  f"{route['queries'] / route['requests']:.0f} consultas e {route['db_ms'] / route['requests']:.1f} ms de banco em média | "
+                  f"pior {route['max_db_ms']:.1f} ms")
+            for sql, count in route['repeated'].most_common(3):
+                print(f'     N+1 ({count}x): {sql[:150]}')
+    
+    @app.cli.command('index-advisor')
+    @click.option('--verbose', is_flag=True, help='Mostra também as consultas que já usam índice')
+    @click.option('--strict', is_flag=True, help='Retorna código de erro se alguma consulta fizer SCAN')
+    def index_advisor(verbose, strict):
+        """Analisa com EXPLAIN QUERY PLAN as consultas da camada de dados"""
+        from app.query_advisor import analyze, print_report
+        
+        scans = print_report(analyze(), verbose=verbose)
+        if strict and scans:
+            raise SystemExit(1)
+    
+    @app.cli.command('images-ingest')
+    @click.option('--force', is_flag=True, help='Reprocessa também as imagens já ingeridas')
+    def images_ingest(force):
+        """Baixa as imagens de produtos e categorias e gera as miniaturas responsivas"""
+        from app.db_operations import Product, Category
+        from app.db_operations_extended import ImageAsset
+        from app.images import ingest
+        
+        if force:
+            urls = sorted({row['image_url'] for row in Product.get_all() + Category.get_all()
+                           if (row['image_url'] or '').startswith('http')})
+        else:
+            urls = ImageAsset.get_pending_urls()
+        
+        done = 0
+        for url in urls:
+            if ingest(url, force=force):
+                done += 1
+        print(f'🖼️  {done}/{len(urls)} imagens processadas')
     
-    from app.routes import main
-    from app.auth import auth
-    from app.admin import admin
-    from app.pdv import pdv
-    from app.chatbot import chatbot
+    @app.cli.command('sales-rollup-backfill')
+    def sales_rollup_backfill():
+        """Reconstrói os consolidados diários de vendas (daily_sales) a partir dos pedidos pagos"""
+        from app.database import transaction
+        from app.db_operations import SalesRollup
+        
+        with transaction():
+            days = SalesRollup.backfill()
+        print(f'📊 Consolidado de vendas reconstruído: {days} dias com vendas')
+    
+    @app.cli.command('exports-run')
+    def exports_run():
+        """Gera os arquivos das exportações de relatório pendentes"""
+        from app.db_operations_extended import ReportExport
+        from app.exports import run_export
+        
+        pending = ReportExport.get_pending_ids()
+        done = 0
+        for export_id in pending:
+            try:
+                if run_export(export_id):
+                    done += 1
+            except Exception as e:
+                print(f'⚠️  Erro na exportação {export_id}: {e}')
+        print(f'📄 {done}/{len(pending)} exportações geradas')
     
-    app.register_blueprint(main)
-    app.register_blueprint(auth, url_prefix='/auth')
-    app.register_blueprint(admin, url_prefix='/admin')
-    app.register_blueprint(pdv, url_prefix='/pdv')
-    app.register_blueprint(chatbot, url_prefix='/chatbot')
+    @app.cli.command('jobs-worker')
+    @click.option('--threads', default=None, type=int, help='Quantidade de threads (padrão: JOB_WORKERS)')
+    @click.option('--once', is_flag=True, help='Processa as tarefas vencidas e encerra')
+    def jobs_worker(threads, once):
+        """Processa a fila de tarefas em segundo plano em um processo separado do gunicorn"""
+        import signal
+        from app.jobs import worker_pool, load_handlers
+        from app.db_operations_extended import Job
+        
+        if once:
+            load_handlers()
+            worker_pool.app = app
+            while worker_pool.run_once(f'cli:{os.getpid()}'):
+                pass
+            print(f'⚙️  Tarefas processadas: {worker_pool.processed} | com falha: {worker_pool.failed} | fila: {Job.count_by_status()}')
+            return
+        
+        signal.signal(signal.SIGTERM, lambda *args: worker_pool.stop())
+        worker_pool.start(app, size=threads)
+        print(f'⚙️  Workers de tarefas em execução ({threads or worker_pool.size} threads, pid {os.getpid()})')
+        try:
+            worker_pool.join()
+        except KeyboardInterrupt:
+            worker_pool.stop()
+            worker_pool.join()
     
     @app.context_processor
     def inject_settings():
         from app.db_operations import Settings
-        from flask import g
-        
-        if not hasattr(g, 'site_settings'):
-            settings_row = Settings.get()
-            if settings_row:
-                g.site_settings = dict(settings_row)
-            else:
-                g.site_settings = {
-                    'store_name': 'BurgerLoft',
-                    'phone': '',
-                    'email': '',
-                    'address': '',
-                    'opening_hours': ''
-                }
-        
-        return dict(site_settings=g.site_settings)
+        
+        return dict(site_settings=Settings.get_cached())
     
     return app
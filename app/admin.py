@@ -1,9 +1,11 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort, send_from_directory
 from flask_login import login_required, current_user
-from app.db_operations import Product, Category, Order, Table, User, OrderItem, Settings, Inventory, Customer, ProductSuggestion
+from app.db_operations import Product, Category, Order, Table, User, OrderItem, Settings, Inventory, Customer, ProductSuggestion, SalesRollup
 from app.db_operations_extended import (ProductModifierGroup, ProductModifierOption, ServiceChargePolicy, 
                                         DeliveryDriver, Reservation, WaitlistEntry, CashOperation, 
-                                        CashierSession, AuditLog)
+                                        CashierSession, AuditLog, ReportExport)
+from app.images import ingest_in_background
+from app.dashboard_metrics import dashboard_snapshot
 from functools import wraps
 from datetime import datetime, timedelta
 
@@ -22,133 +24,33 @@ def admin_required(f):
 @login_required
 @admin_required
 def dashboard():
-    # Estatísticas gerais
-    total_orders = Order.count()
-    total_products = Product.count()
-    total_revenue = Order.get_total_revenue_by_status('pago')
-    pending_orders = Order.count_by_status('pendente')
-    
-    # Estatísticas da cozinha
-    preparing_orders = Order.count_by_status('preparando')
-    ready_orders = Order.count_by_status('pronto')
-    delivered_orders = Order.count_by_status('entregue')
-    
-    # Pedidos recentes
-    recent_orders = Order.get_recent(10)
-    
-    # Pedidos ativos com detalhes
-    active_orders = Order.get_by_statuses(['pendente', 'preparando', 'pronto'])
-    kitchen_orders = []
-    total_items_pending = 0
-    total_items_preparing = 0
-    total_items_ready = 0
-    
-    for order in active_orders:
-        items = OrderItem.get_by_order(order['id'])
-        
-        # Calcular tempo de espera
-        order_age_minutes = 0
-        if order['created_at']:
-            try:
-                created_time = datetime.strptime(order['created_at'], '%Y-%m-%d %H:%M:%S')
-                order_age_minutes = (datetime.now() - created_time).total_seconds() / 60
-            except:
-                pass
-        
-        # Contar items por status
-        for item in items:
-            if item['status'] == 'novo':
-                total_items_pending += 1
-            elif item['status'] == 'preparando':
-                total_items_preparing += 1
-            elif item['status'] == 'pronto':
-                total_items_ready += 1
-        
-        kitchen_orders.append({
-            'order': dict(order),
-            'items': items,
-            'age_minutes': int(order_age_minutes)
-        })
+    metrics = dashboard_snapshot.get()
     
-    # Ordenar por tempo (mais antigos primeiro)
-    kitchen_orders.sort(key=lambda x: x['age_minutes'], reverse=True)
+    # Pedidos ativos, mais antigos primeiro
+    kitchen_orders = sorted(metrics['kitchen_orders'], key=lambda x: x['age_minutes'], reverse=True)
     
     return render_template('admin/dashboard.html', 
-                         total_orders=total_orders,
-                         total_products=total_products,
-                         total_revenue=total_revenue,
-                         pending_orders=pending_orders,
-                         preparing_orders=preparing_orders,
-                         ready_orders=ready_orders,
-                         delivered_orders=delivered_orders,
-                         recent_orders=recent_orders,
+                         total_orders=metrics['total_orders'],
+                         total_products=Product.count(),
+                         total_revenue=metrics['total_revenue'],
+                         pending_orders=metrics['pending_orders'],
+                         preparing_orders=metrics['preparing_orders'],
+                         ready_orders=metrics['ready_orders'],
+                         delivered_orders=metrics['delivered_orders'],
+                         recent_orders=Order.get_recent(10),
                          kitchen_orders=kitchen_orders,
-                         total_items_pending=total_items_pending,
-                         total_items_preparing=total_items_preparing,
-                         total_items_ready=total_items_ready)
+                         total_items_pending=metrics['total_items_pending'],
+                         total_items_preparing=metrics['total_items_preparing'],
+                         total_items_ready=metrics['total_items_ready'])
 
 @admin.route('/api/metrics')
 @login_required
 @admin_required
 def api_metrics():
-    """Endpoint JSON para métricas em tempo real do dashboard"""
-    # Estatísticas gerais
-    total_orders = Order.count()
-    total_revenue = Order.get_total_revenue_by_status('pago')
-    pending_orders = Order.count_by_status('pendente')
-    
-    # Estatísticas da cozinha
-    preparing_orders = Order.count_by_status('preparando')
-    ready_orders = Order.count_by_status('pronto')
-    delivered_orders = Order.count_by_status('entregue')
-    
-    # Pedidos ativos
-    active_orders = Order.get_by_statuses(['pendente', 'preparando', 'pronto'])
-    total_items_pending = 0
-    total_items_preparing = 0
-    total_items_ready = 0
-    
-    kitchen_orders_data = []
-    for order in active_orders:
-        items = OrderItem.get_by_order(order['id'])
-        
-        # Calcular tempo de espera
-        order_age_minutes = 0
-        if order['created_at']:
-            try:
-                created_time = datetime.strptime(order['created_at'], '%Y-%m-%d %H:%M:%S')
-                order_age_minutes = (datetime.now() - created_time).total_seconds() / 60
-            except:
-                pass
-        
-        # Contar items por status
-        for item in items:
-            if item['status'] == 'novo':
-                total_items_pending += 1
-            elif item['status'] == 'preparando':
-                total_items_preparing += 1
-            elif item['status'] == 'pronto':
-                total_items_ready += 1
-        
-        kitchen_orders_data.append({
-            'id': order['id'],
-            'table_number': order.get('table_number', 'N/A'),
-            'status': order['status'],
-            'age_minutes': int(order_age_minutes),
-            'items_count': len(items)
-        })
-    
+    """Endpoint JSON para métricas em tempo real do dashboard (snapshot compartilhado, ver METRICS_SNAPSHOT_TTL)"""
+    metrics = dashboard_snapshot.get()
     return jsonify({
-        'total_orders': total_orders,
-        'total_revenue': float(total_revenue) if total_revenue else 0,
-        'pending_orders': pending_orders,
-        'preparing_orders': preparing_orders,
-        'ready_orders': ready_orders,
-        'delivered_orders': delivered_orders,
-        'total_items_pending': total_items_pending,
-        'total_items_preparing': total_items_preparing,
-        'total_items_ready': total_items_ready,
-        'kitchen_orders': kitchen_orders_data,
+        **metrics,
         'timestamp': datetime.now().isoformat()
     })
 
@@ -194,6 +96,7 @@ def add_product():
             category_id=category_id,
             image_url=image_url
         )
+        ingest_in_background(image_url)
         
         flash('Produto adicionado com sucesso!', 'success')
         return redirect(url_for('admin.products'))
@@ -237,6 +140,7 @@ def edit_product(id):
             image_url=request.form.get('image_url', ''),
             available=request.form.get('available') == 'on'
         )
+        ingest_in_background(request.form.get('image_url', ''))
         
         flash('Produto atualizado com sucesso!', 'success')
         return redirect(url_for('admin.products'))
@@ -274,6 +178,7 @@ def add_category():
         image_url = request.form.get('image_url', '')
         
         Category.create(name=name, description=description, image_url=image_url)
+        ingest_in_background(image_url)
         
         flash('Categoria adicionada com sucesso!', 'success')
         return redirect(url_for('admin.categories'))
@@ -455,40 +360,23 @@ def inventory():
 def reports():
     period = request.args.get('period', 'today')
     
-    if period == 'today':
-        start_date = datetime.now().date()
-        orders = Order.get_by_date_and_status(start_date, 'pago')
-    elif period == 'week':
-        start_date = datetime.now().date() - timedelta(days=7)
-        orders = []
-        for i in range(8):
-            date = start_date + timedelta(days=i)
-            orders.extend(Order.get_by_date_and_status(date, 'pago'))
-    elif period == 'month':
-        start_date = datetime.now().date() - timedelta(days=30)
-        orders = []
-        for i in range(31):
-            date = start_date + timedelta(days=i)
-            orders.extend(Order.get_by_date_and_status(date, 'pago'))
+    end_date = datetime.now().date()
+    days_back = {'today': 0, 'week': 7, 'month': 30}.get(period)
+    
+    if days_back is not None:
+        start_date = end_date - timedelta(days=days_back)
+        totals = SalesRollup.get_totals(start_date, end_date)
+        total_revenue = totals['revenue']
+        total_orders = totals['orders_count']
+        top_products = [(row['product_name'], {'quantity': row['quantity'], 'revenue': row['revenue']})
+                        for row in SalesRollup.get_top_products(start_date, end_date, 10)]
     else:
-        orders = []
+        total_revenue = 0
+        total_orders = 0
+        top_products = []
     
-    total_revenue = sum(o['total'] for o in orders)
-    total_orders = len(orders)
     average_order = total_revenue / total_orders if total_orders > 0 else 0
     
-    product_stats = {}
-    for order in orders:
-        items = OrderItem.get_by_order(order['id'])
-        for item in items:
-            product_name = item['product_name']
-            if product_name not in product_stats:
-                product_stats[product_name] = {'quantity': 0, 'revenue': 0}
-            product_stats[product_name]['quantity'] += item['quantity']
-            product_stats[product_name]['revenue'] += item['price'] * item['quantity']
-    
-    top_products = sorted(product_stats.items(), key=lambda x: x[1]['revenue'], reverse=True)[:10]
-    
     return render_template('admin/reports.html', 
                          period=period,
                          total_revenue=total_revenue,
@@ -737,5 +625,71 @@ def add_cash_operation():
 @login_required
 @admin_required
 def audit():
+    from app.audit import audit_buffer, AUDIT_FLUSH_INTERVAL
+    
+    # Grava o que ainda está no buffer deste worker antes de listar; os buffers dos outros
+    # workers do gunicorn chegam ao banco em até AUDIT_FLUSH_INTERVAL (aviso na página)
+    audit_buffer.flush()
     logs = AuditLog.get_recent(100)
-    return render_template('admin/audit.html', logs=logs)
+    return render_template('admin/audit.html', logs=logs, buffer_stats=audit_buffer.stats(),
+                         flush_interval=AUDIT_FLUSH_INTERVAL)
+
+@admin.route('/exportacoes')
+@login_required
+@admin_required
+def exports():
+    from app.exports import REPORTS, FORMATS, default_period, export_progress
+    
+    recent = ReportExport.get_recent(20)
+    start_date, end_date = default_period()
+    return render_template('admin/exports.html',
+                         exports=recent,
+                         progress={e['id']: export_progress(e) for e in recent},
+                         reports=REPORTS,
+                         formats=FORMATS,
+                         start_date=start_date,
+                         end_date=end_date)
+
+@admin.route('/exportacao/nova', methods=['POST'])
+@login_required
+@admin_required
+def create_export():
+    from app.exports import REPORTS, FORMATS, queue_export
+    
+    report_type = request.form.get('report_type')
+    format = request.form.get('format', 'csv')
+    if report_type not in REPORTS or format not in FORMATS:
+        flash('Relatório ou formato inválido', 'danger')
+        return redirect(url_for('admin.exports'))
+    
+    parameters = {
+        'start_date': request.form.get('start_date') or None,
+        'end_date': request.form.get('end_date') or None,
+        'status': request.form.get('status') or None
+    }
+    queue_export(report_type, format, parameters, generated_by=current_user.id)
+    flash('Exportação iniciada. O arquivo ficará disponível nesta página.', 'success')
+    return redirect(url_for('admin.exports'))
+
+@admin.route('/api/exportacao/<int:id>')
+@login_required
+@admin_required
+def export_status(id):
+    from app.exports import export_progress
+    
+    export = ReportExport.get_by_id(id)
+    if not export:
+        abort(404)
+    return jsonify(export_progress(export))
+
+@admin.route('/exportacao/<int:id>/download')
+@login_required
+@admin_required
+def download_export(id):
+    from app.exports import EXPORTS_DIR, FORMATS
+    
+    export = ReportExport.get_by_id(id)
+    if not export or export['status'] != 'completed' or not export['file_path']:
+        abort(404)
+    return send_from_directory(EXPORTS_DIR, export['file_path'], as_attachment=True,
+                               mimetype=FORMATS.get(export['format']))
@@ -0,0 +1,188 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import tempfile
+
+from flask import Blueprint, current_app, request, send_from_directory, url_for, abort
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_FOLDER = os.path.join(os.path.dirname(__file__), 'static')
+DIST_DIRNAME = 'dist'
+MANIFEST_NAME = 'assets-manifest.json'
+ASSETS_MAX_AGE = 31536000
+
+# Precisam de URL estável: o service worker define o escopo pelo caminho em que é registrado
+UNVERSIONED = {'service-worker.js'}
+COMPRESSIBLE = {'.css', '.js', '.json', '.svg', '.txt', '.html', '.map'}
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+_STRINGS = re.compile(r'''("(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`)''')
+_BLOCK_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+
+def _minify_code(source, minify_segment):
+    # Strings ficam intactas; só o código fora delas é reduzido
+    parts = _STRINGS.split(source)
+    return ''.join(part if i % 2 else minify_segment(part) for i, part in enumerate(parts))
+
+def _minify_css_segment(css):
+    css = _BLOCK_COMMENT.sub('', css)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}')
+
+def _minify_js_segment(js):
+    js = _BLOCK_COMMENT.sub('', js)
+    lines = []
+    for line in js.split('\n'):
+        line = line.strip()
+        if line and not line.startswith('//'):
+            lines.append(line)
+    return '\n'.join(lines)
+
+def minify_css(css):
+    return _minify_code(css, _minify_css_segment).strip()
+
+def minify_js(js):
+    """Minificação conservadora: remove comentários, indentação e linhas vazias, preservando
+    as quebras de linha (a inserção automática de ponto e vírgula continua valendo)"""
+    return _minify_code(js, _minify_js_segment).strip() + '\n'
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+def _compressed_variants(data):
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    return variants
+
+def iter_sources(static_folder=STATIC_FOLDER):
+    for root, dirs, files in os.walk(static_folder):
+        if os.path.abspath(root) == os.path.abspath(static_folder):
+            dirs[:] = [d for d in dirs if d != DIST_DIRNAME]
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, static_folder).replace(os.sep, '/'), path
+
+def build_assets(static_folder=STATIC_FOLDER, verbose=False):
+    """Gera em static/dist as versões com hash no nome, minificadas e pré-comprimidas"""
+    dist_folder = os.path.join(static_folder, DIST_DIRNAME)
+    manifest = {}
+    for logical, path in iter_sources(static_folder):
+        if logical in UNVERSIONED:
+            continue
+        
+        with open(path, 'rb') as f:
+            data = f.read()
+        base, ext = os.path.splitext(logical)
+        minifier = MINIFIERS.get(ext)
+        if minifier:
+            data = minifier(data.decode('utf-8')).encode('utf-8')
+        
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        hashed = f'{base}.{digest}{ext}'
+        target = os.path.join(dist_folder, hashed)
+        encodings = []
+        if ext in COMPRESSIBLE:
+            for encoding, compressed in _compressed_variants(data).items():
+                # Só vale a pena servir a variante se ela for menor que o original
+                if len(compressed) < len(data):
+                    suffix = dict(ENCODINGS)[encoding]
+                    if not os.path.exists(target + suffix):
+                        _write_atomic(target + suffix, compressed)
+                    encodings.append(encoding)
+        if not os.path.exists(target):
+            _write_atomic(target, data)
+        
+        manifest[logical] = {'path': hashed, 'size': len(data), 'encodings': encodings,
+                             'source_mtime': int(os.path.getmtime(path))}
+        if verbose:
+            print(f'📦 {logical} -> {DIST_DIRNAME}/{hashed} ({len(data)} bytes, {", ".join(encodings) or "sem compressão"})')
+    
+    _write_atomic(os.path.join(dist_folder, MANIFEST_NAME),
+                  json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+def load_manifest(static_folder=STATIC_FOLDER):
+    try:
+        with open(os.path.join(static_folder, DIST_DIRNAME, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def manifest_is_stale(manifest, static_folder=STATIC_FOLDER):
+    sources = {logical: path for logical, path in iter_sources(static_folder) if logical not in UNVERSIONED}
+    if manifest is None or set(manifest) != set(sources):
+        return True
+    return any(int(os.path.getmtime(path)) != manifest[logical]['source_mtime']
+               for logical, path in sources.items())
+
+assets = Blueprint('assets', __name__)
+
+@assets.route('/assets/<path:filename>')
+def serve(filename):
+    """Serve o arquivo com hash no nome, escolhendo a variante pré-comprimida aceita pelo cliente"""
+    entry = current_app.extensions['assets_by_path'].get(filename)
+    if entry is None:
+        abort(404)
+    
+    dist_folder = os.path.join(current_app.static_folder, DIST_DIRNAME)
+    encoding = None
+    served = filename
+    for candidate, suffix in ENCODINGS:
+        if candidate in entry['encodings'] and candidate in request.accept_encodings:
+            encoding = candidate
+            served = filename + suffix
+            break
+    
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = send_from_directory(dist_folder, served, mimetype=mimetype, max_age=ASSETS_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.max_age = ASSETS_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+def static_url(filename):
+    """URL do asset com hash no nome (cache imutável); cai para o /static/ comum se não houver build"""
+    entry = current_app.extensions['assets_manifest'].get(filename)
+    if entry is None:
+        return url_for('static', filename=filename)
+    return url_for('assets.serve', filename=entry['path'])
+
+def init_app(app):
+    """Carrega o manifesto (gerando o build se estiver ausente ou desatualizado) e registra o helper"""
+    manifest = load_manifest(app.static_folder)
+    if os.getenv('ASSETS_BUILD_ON_STARTUP', '1') == '1' and manifest_is_stale(manifest, app.static_folder):
+        try:
+            manifest = build_assets(app.static_folder)
+            print(f'📦 Assets estáticos gerados ({len(manifest)} arquivos)')
+        except OSError as e:
+            print(f'⚠️  Não foi possível gerar os assets estáticos: {e}')
+    
+    manifest = manifest or {}
+    app.extensions['assets_manifest'] = manifest
+    app.extensions['assets_by_path'] = {entry['path']: entry for entry in manifest.values()}
+    app.register_blueprint(assets)
+    app.jinja_env.globals['static_url'] = static_url
+
+if __name__ == '__main__':
+    result = build_assets(verbose=True)
+    print(f'✅ {len(result)} assets gerados em {os.path.join(STATIC_FOLDER, DIST_DIRNAME)}')
@@ -0,0 +1,146 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from app.database import after_commit
+from app.db_operations_extended import AuditLog
+
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', '1'))
+AUDIT_FLUSH_BATCH = int(os.getenv('AUDIT_FLUSH_BATCH', '100'))
+AUDIT_BUFFER_SIZE = int(os.getenv('AUDIT_BUFFER_SIZE', '10000'))
+
+class AuditBuffer:
+    """Registros de auditoria acumulados em memória e gravados em lote por uma thread.
+    
+    As ações do salão não esperam pelo fsync do log: record() só enfileira (após o commit
+    da transação da ação) e a thread grava com executemany a cada AUDIT_FLUSH_INTERVAL
+    segundos ou quando o lote atinge AUDIT_FLUSH_BATCH. Com o buffer cheio, os registros
+    novos são descartados e contados em 'dropped'.
+    """
+    
+    def __init__(self, flush_interval=AUDIT_FLUSH_INTERVAL, batch_size=AUDIT_FLUSH_BATCH,
+                 max_size=AUDIT_BUFFER_SIZE):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+        self._entries = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+    
+    def record(self, action, entity_type, entity_id=None, user_id=None, old_values=None, new_values=None,
+               ip_address=None, user_agent=None):
+        # created_at é fixado agora (UTC, mesmo formato do CURRENT_TIMESTAMP), não na gravação
+        created_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        entry = (user_id, action, entity_type, entity_id,
+                 json.dumps(old_values) if old_values else None,
+                 json.dumps(new_values) if new_values else None,
+                 ip_address, user_agent, created_at)
+        # Só registra ações cuja transação foi de fato confirmada
+        after_commit(lambda: self._append(entry))
+    
+    def _append(self, entry):
+        self._ensure_thread()
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                self.dropped += 1
+                return
+            self._entries.append(entry)
+            pending = len(self._entries)
+        if pending >= self.batch_size:
+            self._wakeup.set()
+    
+    def _ensure_thread(self):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # Registros herdados do processo pai pertencem a ele
+                self._entries.clear()
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='audit-flusher', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+    
+    def flush(self):
+        """Grava tudo o que está no buffer; retorna a quantidade de registros gravados"""
+        with self._flush_lock:
+            total = 0
+            while True:
+                with self._lock:
+                    batch = [self._entries.popleft() for _ in range(min(len(self._entries), self.batch_size * 10))]
+                if not batch:
+                    return total
+                
+                started = time.perf_counter()
+                try:
+                    AuditLog.create_many(batch)
+                except Exception as e:
+                    self.flush_errors += 1
+                    with self._lock:
+                        # Devolve o lote à frente da fila para a próxima tentativa (sem passar do limite)
+                        room = max(0, self.max_size - len(self._entries))
+                        self._entries.extendleft(reversed(batch[:room]))
+                        self.dropped += len(batch) - min(room, len(batch))
+                    print(f'⚠️  Erro ao gravar log de auditoria ({len(batch)} registros): {e}')
+                    return total
+                
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self.flushes += 1
+                self.written += len(batch)
+                self.last_flush_ms = elapsed_ms
+                self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+                self.total_flush_ms += elapsed_ms
+                total += len(batch)
+    
+    def stats(self):
+        with self._lock:
+            pending = len(self._entries)
+        return {
+            'pending': pending,
+            'written': self.written,
+            'dropped': self.dropped,
+            'flushes': self.flushes,
+            'flush_errors': self.flush_errors,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'max_flush_ms': round(self.max_flush_ms, 2),
+            'avg_flush_ms': round(self.total_flush_ms / self.flushes, 2) if self.flushes else 0
+        }
+
+audit_buffer = AuditBuffer()
+
+def record(*args, **kwargs):
+    audit_buffer.record(*args, **kwargs)
+
+def flush_on_shutdown():
+    """Gancho de encerramento (atexit / worker_exit do gunicorn): não perde o que está no buffer"""
+    if audit_buffer._pid != os.getpid():
+        return
+    try:
+        written = audit_buffer.flush()
+        if written:
+            print(f'📝 {written} registros de auditoria gravados no encerramento')
+    except Exception as e:
+        print(f'⚠️  Erro ao gravar log de auditoria no encerramento: {e}')
+
+atexit.register(flush_on_shutdown)
@@ -0,0 +1,88 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+_phases = []
+
+# Script executado em um interpretador novo: mede a importação e o create_app a frio
+PROFILE_SCRIPT = '''
+import json, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app()
+finished = time.perf_counter()
+from app import boot_profile
+print('BOOT_PROFILE ' + json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (finished - imported) * 1000,
+    'total_ms': (finished - started) * 1000,
+    'phases': boot_profile.phases()
+}))
+'''
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+@contextmanager
+def boot_phase(name):
+    """Registra quanto tempo uma etapa do create_app levou (lido pelo 'flask boot-profile')"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append((name, (time.perf_counter() - started) * 1000))
+
+def phases():
+    return list(_phases)
+
+def parse_importtime(output):
+    """Linhas do 'python -X importtime' -> [(módulo, self_ms, cumulativo_ms, profundidade)]"""
+    modules = []
+    for line in output.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us) / 1000, int(cumulative_us) / 1000, len(indent) // 2))
+    return modules
+
+def run_profile():
+    """Sobe o app em um processo novo com -X importtime e devolve os tempos coletados"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROFILE_SCRIPT],
+                            capture_output=True, text=True, cwd=root, env=os.environ.copy())
+    marker = [line for line in result.stdout.splitlines() if line.startswith('BOOT_PROFILE ')]
+    if result.returncode != 0 or not marker:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'boot falhou')
+    profile = json.loads(marker[-1][len('BOOT_PROFILE '):])
+    profile['imports'] = parse_importtime(result.stderr)
+    return profile
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+def print_report(profiles, top=15):
+    """Resumo de várias execuções: medianas das etapas e importações mais caras"""
+    print(f'🚀 Boot a frio ({len(profiles)} execuções, mediana)')
+    for key, label in [('import_ms', 'import app'), ('create_app_ms', 'create_app'), ('total_ms', 'total')]:
+        print(f'   {label:<22} {_median([p[key] for p in profiles]):>8.1f} ms')
+    
+    print('\n⏱️  Etapas do create_app')
+    names = [name for name, _ in profiles[0]['phases']]
+    for name in names:
+        values = [ms for p in profiles for phase, ms in p['phases'] if phase == name]
+        print(f'   {name:<22} {_median(values):>8.1f} ms')
+    
+    # Dois primeiros níveis: os módulos do app e o que cada um puxa diretamente
+    imports = [m for m in profiles[-1]['imports'] if m[3] <= 1]
+    imports.sort(key=lambda m: m[2], reverse=True)
+    print(f'\n📦 Importações mais caras (cumulativo, última execução)')
+    for name, self_ms, cumulative_ms, depth in imports[:top]:
+        print(f"   {'  ' * depth}{name:<{40 - 2 * depth}} {cumulative_ms:>8.1f} ms  (próprio {self_ms:.1f} ms)")
+    app_modules = [m for m in profiles[-1]['imports'] if m[0] == 'app' or m[0].startswith('app.')]
+    print(f"\n   Módulos do app: {len(app_modules)} | total de módulos importados: {len(profiles[-1]['imports'])}")
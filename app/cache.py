@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app.database import get_db_connection, after_commit, in_transaction
+
+CACHE_VERSION_CHECK_INTERVAL = float(os.getenv('CACHE_VERSION_CHECK_INTERVAL', '2'))
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '256'))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '300'))
+
+def get_version(name):
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT version FROM cache_version WHERE name = ?', (name,))
+        row = cursor.fetchone()
+        return row['version'] if row else 0
+
+def bump_version(name):
+    """Incrementa a versão na transação corrente - os outros workers percebem na próxima verificação"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO cache_version (name, version) VALUES (?, 1)
+            ON CONFLICT(name) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        ''', (name,))
+
+class VersionedCache:
+    """Cache em memória do processo invalidado por um número de versão guardado no banco.
+    
+    As leituras vêm de um dicionário local; a versão no banco (tabela cache_version) é
+    consultada no máximo a cada check_interval segundos, o que mantém os workers do
+    gunicorn coerentes sem custo por leitura. Escritas chamam invalidate() dentro da
+    própria transação.
+    """
+    
+    def __init__(self, name, check_interval=CACHE_VERSION_CHECK_INTERVAL):
+        self.name = name
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self._values = {}
+        self._version = None
+        self._generation = 0
+        self._checked_at = 0
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+    
+    def get(self, key, loader):
+        # Dentro de uma transação de escrita a leitura pode enxergar dados não confirmados
+        if in_transaction():
+            return loader()
+        
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval or self._pid != os.getpid():
+            self._sync(now)
+        
+        try:
+            value = self._values[key]
+            self.hits += 1
+            return value
+        except KeyError:
+            pass
+        
+        generation = self._generation
+        value = loader()
+        self.misses += 1
+        with self._lock:
+            # Não guarda o valor se o cache foi invalidado enquanto ele era carregado
+            if generation == self._generation:
+                self._values[key] = value
+        return value
+    
+    def _sync(self, now):
+        version = get_version(self.name)
+        with self._lock:
+            if version != self._version or self._pid != os.getpid():
+                self._values = {}
+                self._version = version
+                self._generation += 1
+                self._pid = os.getpid()
+            self._checked_at = now
+    
+    def version(self):
+        """Versão corrente (verificada no banco no máximo a cada check_interval), usada em chaves derivadas"""
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval or self._pid != os.getpid():
+            self._sync(now)
+        return self._version
+    
+    def invalidate(self):
+        """Marca o cache como desatualizado em todos os processos após o commit da escrita"""
+        bump_version(self.name)
+        after_commit(self.clear)
+    
+    def clear(self):
+        with self._lock:
+            self._values = {}
+            self._generation += 1
+            self._checked_at = 0
+    
+    def stats(self):
+        return {'name': self.name, 'version': self._version, 'entries': len(self._values),
+                'hits': self.hits, 'misses': self.misses}
+
+class IdentityCache:
+    """Mapa de identidade LRU com TTL para objetos de sessão (um por usuário).
+    
+    Cada entrada guarda a versão do registro (ex.: user.session_version). Quando a versão
+    global do cache muda - algum registro foi alterado em qualquer worker - só as
+    entradas cuja versão no banco ficou diferente são descartadas.
+    """
+    
+    def __init__(self, name, version_loader, max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL,
+                 check_interval=CACHE_VERSION_CHECK_INTERVAL):
+        self.name = name
+        self.version_loader = version_loader
+        self.max_size = max_size
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._version = None
+        self._checked_at = 0
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+    
+    def get(self, key, loader):
+        """Retorna o objeto em cache ou chama loader(key), que devolve (objeto, versão) ou None"""
+        if in_transaction():
+            loaded = loader(key)
+            return loaded[0] if loaded else None
+        
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval or self._pid != os.getpid():
+            self._sync(now)
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        
+        loaded = loader(key)
+        self.misses += 1
+        if loaded is None:
+            self.discard(key)
+            return None
+        
+        value, version = loaded
+        with self._lock:
+            self._entries[key] = (value, version, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+    
+    def _sync(self, now):
+        version = get_version(self.name)
+        with self._lock:
+            if self._pid != os.getpid():
+                self._entries.clear()
+                self._pid = os.getpid()
+            changed = version != self._version
+            self._version = version
+            self._checked_at = now
+            cached = {key: entry[1] for key, entry in self._entries.items()}
+        if not changed or not cached:
+            return
+        
+        current = self.version_loader(list(cached))
+        with self._lock:
+            for key, cached_version in cached.items():
+                if current.get(key) != cached_version:
+                    self._entries.pop(key, None)
+    
+    def invalidate(self, key):
+        """Chamado na transação que altera o registro: avisa os outros workers e descarta a entrada local"""
+        bump_version(self.name)
+        after_commit(lambda: self.discard(key))
+    
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def stats(self):
+        return {'name': self.name, 'version': self._version, 'entries': len(self._entries),
+                'hits': self.hits, 'misses': self.misses}
+
+catalog_cache = VersionedCache('catalog')
+settings_cache = VersionedCache('settings')
+images_cache = VersionedCache('images')
+
+def _user_session_versions(user_ids):
+    from app.db_operations import User
+    return User.get_session_versions(user_ids)
+
+user_cache = IdentityCache('users', _user_session_versions)
@@ -1,31 +1,50 @@
 from flask import Blueprint, request, jsonify, render_template
 import os
 import re
+import threading
 
 chatbot = Blueprint('chatbot', __name__)
 
-try:
-    import google.generativeai as genai
-    GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-    if GEMINI_API_KEY:
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel('gemini-pro')
-    else:
-        model = None
-except ImportError:
-    model = None
+GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+
+_model = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+def get_model():
+    """Cliente Gemini criado na primeira mensagem, não na importação do blueprint.
+    
+    O SDK é pesado e a maioria dos workers nunca atende o chatbot; sem chave ou sem
+    o pacote instalado retorna None (respostas simples).
+    """
+    global _model, _model_loaded
+    if _model_loaded:
+        return _model
+    with _model_lock:
+        if not _model_loaded:
+            if GEMINI_API_KEY:
+                try:
+                    import google.generativeai as genai
+                    genai.configure(api_key=GEMINI_API_KEY)
+                    _model = genai.GenerativeModel('gemini-pro')
+                except ImportError:
+                    _model = None
+            _model_loaded = True
+    return _model
 
 def get_simple_response(message):
     from app.db_operations import Product, Settings
     
     message_lower = message.lower()
     
-    settings = Settings.get()
-    store_info = dict(settings) if settings else {}
-    store_name = store_info.get('store_name', 'Meatz Burger')
-    phone = store_info.get('phone', '(11) 99999-9999')
-    address = store_info.get('address', 'Rua Exemplo, 123')
-    hours = store_info.get('opening_hours', 'Seg-Dom: 11h-23h')
+    settings = Settings.get_cached()
+    if settings.id is not None:
+        store_name = settings.store_name
+        phone = settings.phone
+        address = settings.address
+        hours = settings.opening_hours
+    else:
+        store_name, phone, address, hours = 'Meatz Burger', '(11) 99999-9999', 'Rua Exemplo, 123', 'Seg-Dom: 11h-23h'
     
     if any(word in message_lower for word in ['oi', 'olá', 'ola', 'bom dia', 'boa tarde', 'boa noite', 'hey', 'hi']):
         return f"Olá! Bem-vindo ao {store_name}! 🍔 Como posso ajudar você hoje? Posso mostrar nosso cardápio, dar sugestões ou tirar dúvidas!"
@@ -113,6 +132,7 @@ def send_message():
     if not user_message:
         return jsonify({'success': False, 'error': 'Mensagem vazia'}), 400
     
+    model = get_model()
     if model:
         try:
             SYSTEM_PROMPT = """
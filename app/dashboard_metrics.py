@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+from app.db_operations import Order
+
+METRICS_SNAPSHOT_TTL = float(os.getenv('METRICS_SNAPSHOT_TTL', '5'))
+ACTIVE_STATUSES = ['pendente', 'preparando', 'pronto']
+
+def _age_minutes(created_at):
+    if not created_at:
+        return 0
+    try:
+        created_time = datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S')
+        return int((datetime.now() - created_time).total_seconds() / 60)
+    except (TypeError, ValueError):
+        return 0
+
+def build_snapshot():
+    """Métricas do dashboard com duas consultas: uma agregação sobre order e outra sobre order_item"""
+    by_status = {row['status']: row for row in Order.get_status_summary()}
+    
+    def count(status):
+        return by_status[status]['count'] if status in by_status else 0
+    
+    paid = by_status.get('pago')
+    kitchen_orders = []
+    totals = {'novo': 0, 'preparando': 0, 'pronto': 0}
+    for order in Order.get_active_summary(ACTIVE_STATUSES):
+        totals['novo'] += order['items_pending']
+        totals['preparando'] += order['items_preparing']
+        totals['pronto'] += order['items_ready']
+        kitchen_orders.append({
+            'id': order['id'],
+            'table_number': order['table_number'] if order['table_number'] is not None else 'N/A',
+            'status': order['status'],
+            'order_type': order['order_type'],
+            'created_at': order['created_at'],
+            'total': order['total'],
+            'age_minutes': _age_minutes(order['created_at']),
+            'items_count': order['items_count']
+        })
+    
+    return {
+        'total_orders': sum(row['count'] for row in by_status.values()),
+        'total_revenue': float(paid['revenue']) if paid and paid['revenue'] else 0,
+        'pending_orders': count('pendente'),
+        'preparing_orders': count('preparando'),
+        'ready_orders': count('pronto'),
+        'delivered_orders': count('entregue'),
+        'total_items_pending': totals['novo'],
+        'total_items_preparing': totals['preparando'],
+        'total_items_ready': totals['pronto'],
+        'kitchen_orders': kitchen_orders,
+        'generated_at': datetime.now().isoformat()
+    }
+
+class MetricsSnapshot:
+    """Snapshot das métricas memorizado por alguns segundos.
+    
+    Quando expira, só uma thread recalcula; as requisições concorrentes esperam por ela
+    e recebem o mesmo resultado. O dicionário devolvido é compartilhado: não modifique.
+    """
+    
+    def __init__(self, builder, ttl=METRICS_SNAPSHOT_TTL):
+        self.builder = builder
+        self.ttl = ttl
+        self.builds = 0
+        self._value = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+    
+    def get(self):
+        if self._value is not None and time.monotonic() < self._expires_at:
+            return self._value
+        with self._lock:
+            if self._value is None or time.monotonic() >= self._expires_at:
+                self._value = self.builder()
+                self._expires_at = time.monotonic() + self.ttl
+                self.builds += 1
+            return self._value
+    
+    def clear(self):
+        with self._lock:
+            self._value = None
+            self._expires_at = 0
+
+dashboard_snapshot = MetricsSnapshot(build_snapshot)
@@ -1,644 +1,1153 @@
 import sqlite3
 import os
+import queue
+import random
+import threading
+import time
 from datetime import datetime
 from contextlib import contextmanager
 
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'meatz.db')
+DB_PATH = os.getenv('DATABASE_PATH', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'meatz.db'))
+
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+POOL_HEALTHCHECK_INTERVAL = float(os.getenv('DB_POOL_HEALTHCHECK_INTERVAL', '30'))
+
+# Configurações do engine SQLite (todas ajustáveis por variável de ambiente)
+JOURNAL_MODE = os.getenv('DB_JOURNAL_MODE', 'WAL')
+SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')
+MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(128 * 1024 * 1024)))
+CACHE_SIZE = int(os.getenv('DB_CACHE_SIZE', '-16000'))
+TEMP_STORE = os.getenv('DB_TEMP_STORE', 'MEMORY')
+BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+LOCK_RETRIES = int(os.getenv('DB_LOCK_RETRIES', '5'))
+LOCK_BACKOFF_MS = int(os.getenv('DB_LOCK_BACKOFF_MS', '25'))
+WAL_AUTOCHECKPOINT = int(os.getenv('DB_WAL_AUTOCHECKPOINT', '1000'))
+CHECKPOINT_INTERVAL = float(os.getenv('DB_CHECKPOINT_INTERVAL', '300'))
 
 def get_db_path():
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     return DB_PATH
 
+def is_locked_error(error):
+    message = str(error).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+def run_with_lock_retry(operation):
+    """Executa a operação repetindo com backoff exponencial enquanto o banco estiver bloqueado"""
+    for attempt in range(LOCK_RETRIES + 1):
+        try:
+            return operation()
+        except sqlite3.OperationalError as e:
+            if not is_locked_error(e) or attempt == LOCK_RETRIES:
+                raise
+            delay = (LOCK_BACKOFF_MS / 1000) * (2 ** attempt)
+            time.sleep(delay * random.uniform(0.5, 1.5))
+
+def configure_connection(conn):
+    """Aplica os pragmas de desempenho em uma conexão recém-aberta"""
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    if JOURNAL_MODE:
+        run_with_lock_retry(lambda: conn.execute(f'PRAGMA journal_mode = {JOURNAL_MODE}').fetchone())
+    conn.execute(f'PRAGMA synchronous = {SYNCHRONOUS}')
+    conn.execute(f'PRAGMA cache_size = {CACHE_SIZE}')
+    conn.execute(f'PRAGMA temp_store = {TEMP_STORE}')
+    conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    conn.execute(f'PRAGMA wal_autocheckpoint = {WAL_AUTOCHECKPOINT}')
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor que informa SQL, parâmetros e duração ao gravador ativo na thread (se houver).
+    
+    Sem gravador o custo é um getattr por consulta. O tempo dos fetch* é somado ao da
+    consulta que os originou (o SQLite só percorre o resultado na leitura).
+    """
+    
+    _entry = None
+    
+    def execute(self, sql, parameters=()):
+        recorder = getattr(_local, 'query_recorder', None)
+        if recorder is None:
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._entry = recorder.record(sql, parameters, (time.perf_counter() - started) * 1000)
+    
+    def executemany(self, sql, seq_of_parameters):
+        recorder = getattr(_local, 'query_recorder', None)
+        if recorder is None:
+            return super().executemany(sql, seq_of_parameters)
+        seq_of_parameters = list(seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._entry = recorder.record(sql, seq_of_parameters, (time.perf_counter() - started) * 1000, many=True)
+    
+    def _timed_fetch(self, fetch, *args):
+        recorder = getattr(_local, 'query_recorder', None)
+        if recorder is None or self._entry is None:
+            return fetch(*args)
+        started = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            recorder.add_time(self._entry, (time.perf_counter() - started) * 1000)
+    
+    def fetchone(self):
+        return self._timed_fetch(super().fetchone)
+    
+    def fetchmany(self, *args):
+        return self._timed_fetch(super().fetchmany, *args)
+    
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall)
+
+class InstrumentedConnection(sqlite3.Connection):
+    # Connection.execute não passa pelo cursor(); os atalhos são refeitos aqui
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def set_query_recorder(recorder):
+    """Ativa (ou desativa, com None) o registro das consultas feitas pela thread atual"""
+    _local.query_recorder = recorder
+
+class ConnectionPool:
+    """Pool de conexões SQLite reaproveitadas dentro de um processo (worker)"""
+    
+    def __init__(self, db_path, size=POOL_SIZE, healthcheck_interval=POOL_HEALTHCHECK_INTERVAL):
+        self.db_path = db_path
+        self.size = size
+        self.healthcheck_interval = healthcheck_interval
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self._last_checkpoint = time.monotonic()
+        self.created = 0
+        self.reused = 0
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                               factory=InstrumentedConnection)
+        conn.row_factory = sqlite3.Row
+        configure_connection(conn)
+        with self._lock:
+            self.created += 1
+        return conn
+    
+    def _is_healthy(self, conn):
+        last_used = self._last_used.get(id(conn), 0)
+        if time.monotonic() - last_used < self.healthcheck_interval:
+            return True
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+    
+    def acquire(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            
+            if self._is_healthy(conn):
+                with self._lock:
+                    self.reused += 1
+                return conn
+            self._discard(conn)
+    
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._maybe_checkpoint(conn)
+        self._last_used[id(conn)] = time.monotonic()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            self._discard(conn)
+    
+    def _maybe_checkpoint(self, conn):
+        # Checkpoint periódico e não bloqueante para evitar que o arquivo -wal cresça sem limite
+        if not CHECKPOINT_INTERVAL or JOURNAL_MODE.upper() != 'WAL':
+            return
+        now = time.monotonic()
+        if now - self._last_checkpoint < CHECKPOINT_INTERVAL:
+            return
+        self._last_checkpoint = now
+        try:
+            conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()
+        except sqlite3.OperationalError:
+            pass
+    
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    
+    def close_all(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+_pool = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+def get_pool():
+    """Retorna o pool do processo atual, recriando-o após um fork do gunicorn"""
+    global _pool
+    db_path = get_db_path()
+    pool = _pool
+    if pool is None or pool.pid != os.getpid() or pool.db_path != db_path:
+        with _pool_lock:
+            pool = _pool
+            if pool is None or pool.pid != os.getpid() or pool.db_path != db_path:
+                # Conexões herdadas do processo pai não podem ser usadas nem fechadas aqui
+                if pool is not None and pool.pid == os.getpid():
+                    pool.close_all()
+                pool = ConnectionPool(db_path, POOL_SIZE, POOL_HEALTHCHECK_INTERVAL)
+                _pool = pool
+    return pool
+
 @contextmanager
 def get_db_connection():
-    conn = sqlite3.connect(get_db_path())
-    conn.row_factory = sqlite3.Row
+    """Conexão do pool para a thread atual.
+    
+    Chamadas aninhadas na mesma thread reutilizam a conexão já retirada do pool e o commit
+    acontece apenas na saída do bloco mais externo. Cada bloco aninhado roda num SAVEPOINT:
+    se ele falhar, só as escritas dele (e os after_commit agendados nele) são desfeitas,
+    mesmo que o bloco externo capture a exceção e siga até o commit.
+    """
+    held = getattr(_local, 'conn', None)
+    if held is not None and getattr(_local, 'pid', None) == os.getpid():
+        _local.depth += 1
+        savepoint = f'nested_{_local.depth}' if held.in_transaction else None
+        pending_callbacks = len(_local.after_commit)
+        if savepoint:
+            held.execute(f'SAVEPOINT {savepoint}')
+        try:
+            yield held
+        except Exception:
+            # Alguns erros do SQLite já desfazem a transação inteira: aí o savepoint não existe mais
+            if savepoint and held.in_transaction:
+                held.execute(f'ROLLBACK TO {savepoint}')
+                held.execute(f'RELEASE {savepoint}')
+            elif held.in_transaction:
+                # Sem transação aberta na entrada, tudo o que está pendente é deste bloco
+                held.rollback()
+            del _local.after_commit[pending_callbacks:]
+            raise
+        else:
+            if savepoint:
+                held.execute(f'RELEASE {savepoint}')
+        finally:
+            _local.depth -= 1
+        return
+    
+    pool = get_pool()
+    conn = pool.acquire()
+    _local.conn = conn
+    _local.pid = os.getpid()
+    _local.depth = 1
+    _local.after_commit = []
     try:
         yield conn
-        conn.commit()
+        run_with_lock_retry(conn.commit)
     except Exception as e:
         conn.rollback()
         raise e
+    finally:
+        callbacks = _local.after_commit
+        _local.conn = None
+        _local.depth = 0
+        _local.after_commit = []
+        pool.release(conn)
+    
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception as e:
+            print(f'⚠️  Erro em callback pós-commit: {e}')
+
+def after_commit(callback):
+    """Agenda o callback para depois do commit da transação corrente (ou executa já, se não houver)"""
+    if getattr(_local, 'conn', None) is not None and getattr(_local, 'pid', None) == os.getpid():
+        _local.after_commit.append(callback)
+    else:
+        callback()
+
+def in_transaction():
+    """Indica se a thread atual tem uma transação aberta (escritas ainda não confirmadas)"""
+    conn = getattr(_local, 'conn', None)
+    return conn is not None and getattr(_local, 'pid', None) == os.getpid() and conn.in_transaction
+
+@contextmanager
+def transaction():
+    """Unidade de trabalho: as operações de db_operations executadas dentro do bloco
+    compartilham a mesma conexão e são confirmadas (ou desfeitas) em um único commit.
+    
+    Uma operação que falha dentro do bloco desfaz só as próprias escritas (SAVEPOINT);
+    se a exceção for capturada, o restante da unidade ainda é confirmado.
+    """
+    with get_db_connection() as conn:
+        if not conn.in_transaction:
+            run_with_lock_retry(lambda: conn.execute('BEGIN IMMEDIATE'))
+        yield conn
+
+@contextmanager
+def read_connection():
+    """Conexão somente leitura fora do pool, para leituras longas em streaming (exportações).
+    
+    Não ocupa uma vaga do pool nem entra na transação da thread; no modo WAL a leitura
+    não bloqueia as escritas dos outros workers.
+    """
+    conn = sqlite3.connect(f'file:{get_db_path()}?mode=ro', uri=True, timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA cache_size = {CACHE_SIZE}')
+    conn.execute(f'PRAGMA temp_store = {TEMP_STORE}')
+    conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    try:
+        yield conn
     finally:
         conn.close()
 
-def apply_migrations():
-    """Aplica migrações de esquema de forma idempotente"""
+def _add_legacy_columns(cursor):
+    """Migração 2: colunas acrescentadas depois da criação das tabelas (bancos antigos)"""
+    def column_exists(table_name, column_name):
+        cursor.execute(f"PRAGMA table_info({table_name})")
+        columns = [col[1] for col in cursor.fetchall()]
+        return column_name in columns
+    
+    migrations = [
+        ('"order"', 'order_type', 'ALTER TABLE "order" ADD COLUMN order_type TEXT DEFAULT "mesa"'),
+        ('"order"', 'customer_id', 'ALTER TABLE "order" ADD COLUMN customer_id INTEGER'),
+        ('"order"', 'delivery_address', 'ALTER TABLE "order" ADD COLUMN delivery_address TEXT'),
+        ('"order"', 'delivery_fee', 'ALTER TABLE "order" ADD COLUMN delivery_fee REAL DEFAULT 0'),
+        ('"order"', 'tip_amount', 'ALTER TABLE "order" ADD COLUMN tip_amount REAL DEFAULT 0'),
+        ('"order"', 'tip_percentage', 'ALTER TABLE "order" ADD COLUMN tip_percentage REAL DEFAULT 0'),
+        ('"order"', 'source_channel', 'ALTER TABLE "order" ADD COLUMN source_channel TEXT DEFAULT "mesa"'),
+        ('"order"', 'change_seq', 'ALTER TABLE "order" ADD COLUMN change_seq INTEGER DEFAULT 0'),
+        ('product', 'prep_time_minutes', 'ALTER TABLE product ADD COLUMN prep_time_minutes INTEGER DEFAULT 15'),
+        ('product', 'prep_section', 'ALTER TABLE product ADD COLUMN prep_section TEXT DEFAULT "geral"'),
+        ('product', 'allows_modifiers', 'ALTER TABLE product ADD COLUMN allows_modifiers INTEGER DEFAULT 1'),
+        ('order_item', 'status', 'ALTER TABLE order_item ADD COLUMN status TEXT DEFAULT "novo"'),
+        ('order_item', 'prep_started_at', 'ALTER TABLE order_item ADD COLUMN prep_started_at TIMESTAMP'),
+        ('order_item', 'prep_completed_at', 'ALTER TABLE order_item ADD COLUMN prep_completed_at TIMESTAMP'),
+        ('order_item', 'delivered_at', 'ALTER TABLE order_item ADD COLUMN delivered_at TIMESTAMP'),
+        ('order_item', 'group_priority', 'ALTER TABLE order_item ADD COLUMN group_priority INTEGER DEFAULT 0'),
+        ('order_item', 'change_seq', 'ALTER TABLE order_item ADD COLUMN change_seq INTEGER DEFAULT 0'),
+        ('"table"', 'layout_x', 'ALTER TABLE "table" ADD COLUMN layout_x INTEGER DEFAULT 0'),
+        ('"table"', 'layout_y', 'ALTER TABLE "table" ADD COLUMN layout_y INTEGER DEFAULT 0'),
+        ('"table"', 'shape', 'ALTER TABLE "table" ADD COLUMN shape TEXT DEFAULT "square"'),
+        ('payment', 'external_reference', 'ALTER TABLE payment ADD COLUMN external_reference TEXT'),
+        ('payment', 'split_id', 'ALTER TABLE payment ADD COLUMN split_id INTEGER'),
+        ('inventory', 'expiry_alert_days', 'ALTER TABLE inventory ADD COLUMN expiry_alert_days INTEGER DEFAULT 7'),
+        ('user', 'commission_percentage', 'ALTER TABLE user ADD COLUMN commission_percentage REAL DEFAULT 0'),
+        ('user', 'is_active', 'ALTER TABLE user ADD COLUMN is_active INTEGER DEFAULT 1'),
+        ('user', 'last_login', 'ALTER TABLE user ADD COLUMN last_login TIMESTAMP'),
+        ('user', 'session_version', 'ALTER TABLE user ADD COLUMN session_version INTEGER DEFAULT 0'),
+        ('settings', 'tip_percentage', 'ALTER TABLE settings ADD COLUMN tip_percentage REAL DEFAULT 10'),
+        ('settings', 'enable_auto_tip', 'ALTER TABLE settings ADD COLUMN enable_auto_tip INTEGER DEFAULT 0'),
+        ('settings', 'store_zipcode', 'ALTER TABLE settings ADD COLUMN store_zipcode TEXT DEFAULT ""'),
+        ('settings', 'delivery_radius_km', 'ALTER TABLE settings ADD COLUMN delivery_radius_km REAL DEFAULT 5.0'),
+        ('settings', 'enable_delivery', 'ALTER TABLE settings ADD COLUMN enable_delivery INTEGER DEFAULT 1'),
+        ('settings', 'delivery_fee', 'ALTER TABLE settings ADD COLUMN delivery_fee REAL DEFAULT 5.0'),
+        ('settings', 'store_latitude', 'ALTER TABLE settings ADD COLUMN store_latitude REAL'),
+        ('settings', 'store_longitude', 'ALTER TABLE settings ADD COLUMN store_longitude REAL'),
+        ('settings', 'store_city', 'ALTER TABLE settings ADD COLUMN store_city TEXT'),
+        ('settings', 'store_state', 'ALTER TABLE settings ADD COLUMN store_state TEXT'),
+        ('customer', 'address', 'ALTER TABLE customer ADD COLUMN address TEXT'),
+        ('customer', 'zipcode', 'ALTER TABLE customer ADD COLUMN zipcode TEXT'),
+        ('customer', 'city', 'ALTER TABLE customer ADD COLUMN city TEXT'),
+        ('customer', 'state', 'ALTER TABLE customer ADD COLUMN state TEXT'),
+        ('customer', 'latitude', 'ALTER TABLE customer ADD COLUMN latitude REAL'),
+        ('customer', 'longitude', 'ALTER TABLE customer ADD COLUMN longitude REAL'),
+        ('report_export', 'rows_written', 'ALTER TABLE report_export ADD COLUMN rows_written INTEGER DEFAULT 0'),
+        ('report_export', 'total_rows', 'ALTER TABLE report_export ADD COLUMN total_rows INTEGER'),
+        ('report_export', 'started_at', 'ALTER TABLE report_export ADD COLUMN started_at TIMESTAMP'),
+        ('report_export', 'error', 'ALTER TABLE report_export ADD COLUMN error TEXT'),
+    ]
+    
+    for table, column, sql in migrations:
+        if not column_exists(table, column):
+            try:
+                cursor.execute(sql)
+                print(f'✅ Migração aplicada: {table}.{column}')
+            except sqlite3.OperationalError as e:
+                print(f'⚠️  Erro ao aplicar migração {table}.{column}: {e}')
+
+# Índices secundários dos caminhos de consulta mais usados (nome, tabela, colunas/expressões)
+INDEXES = [
+    ('idx_order_status_created', '"order"', 'status, created_at'),
+    ('idx_order_status_total', '"order"', 'status, total'),
+    ('idx_order_created_date_status', '"order"', 'DATE(created_at), status, created_at'),
+    ('idx_order_created', '"order"', 'created_at'),
+    ('idx_order_table', '"order"', 'table_id, created_at'),
+    ('idx_order_change_seq', '"order"', 'change_seq'),
+    ('idx_order_item_order', 'order_item', 'order_id'),
+    ('idx_order_item_change_seq', 'order_item', 'change_seq'),
+    ('idx_order_item_modifier_item', 'order_item_modifier', 'order_item_id'),
+    ('idx_payment_order', 'payment', 'order_id, status'),
+    ('idx_payment_split_order', 'payment_split', 'order_id, split_number'),
+    ('idx_order_service_charge_order', 'order_service_charge', 'order_id'),
+    ('idx_order_transfer_order', 'order_transfer', 'order_id, transferred_at'),
+    ('idx_product_category', 'product', 'category_id, created_at'),
+    ('idx_product_available', 'product', 'available, created_at'),
+    ('idx_product_created', 'product', 'created_at'),
+    ('idx_product_suggestion_product', 'product_suggestion', 'product_id, priority'),
+    ('idx_product_modifier_group_product', 'product_modifier_group', 'product_id'),
+    ('idx_product_modifier_option_group', 'product_modifier_option', 'modifier_group_id, available'),
+    ('idx_service_message_role', 'service_message', 'to_role, created_at'),
+    ('idx_service_message_receipt_message', 'service_message_receipt', 'message_id, user_id'),
+    ('idx_audit_log_entity', 'audit_log', 'entity_type, entity_id, created_at'),
+    ('idx_audit_log_created', 'audit_log', 'created_at'),
+    ('idx_delivery_order_status', 'delivery_order', 'status, created_at'),
+    ('idx_delivery_route_event_delivery', 'delivery_route_event', 'delivery_order_id, created_at'),
+    ('idx_reservation_date', 'reservation', 'reservation_date, reservation_time'),
+    ('idx_waitlist_entry_status', 'waitlist_entry', 'status, created_at'),
+    ('idx_cash_operation_date', 'cash_operation', 'DATE(created_at), created_at'),
+    ('idx_cashier_session_user', 'cashier_session', 'user_id, status, opened_at'),
+    ('idx_shift_assignment_date', 'shift_assignment', 'shift_date, start_time'),
+    ('idx_inventory_transaction_ingredient', 'inventory_transaction', 'ingredient_name, created_at'),
+    ('idx_inventory_batch_expiry', 'inventory_batch', 'expiry_date'),
+    ('idx_order_template_user', 'order_template', 'user_id, created_at'),
+    ('idx_order_template_table', 'order_template', 'table_id, created_at'),
+    ('idx_table_grouping_active', 'table_grouping', 'dissolved_at'),
+    ('idx_kds_event_created', 'kds_event', 'created_at'),
+    ('idx_report_export_status', 'report_export', 'status, created_at'),
+    ('idx_job_next', 'job', 'status, priority DESC, run_at'),
+    ('idx_job_locked', 'job', 'status, locked_at'),
+]
+
+def _create_indexes(cursor):
+    """Migração 3: índices secundários"""
+    for name, table, columns in INDEXES:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})')
+
+def _create_tables(cursor):
+    """Migração 1: tabelas do sistema (CREATE TABLE IF NOT EXISTS)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT,
+            role TEXT DEFAULT 'garcom',
+            phone TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS category (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            image_url TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            price REAL NOT NULL,
+            image_url TEXT,
+            category_id INTEGER,
+            available INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (category_id) REFERENCES category (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS "table" (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            number INTEGER UNIQUE NOT NULL,
+            capacity INTEGER DEFAULT 4,
+            status TEXT DEFAULT 'livre',
+            pin TEXT,
+            current_order_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (current_order_id) REFERENCES "order" (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS "order" (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_id INTEGER,
+            user_id INTEGER,
+            status TEXT DEFAULT 'pendente',
+            total REAL DEFAULT 0.0,
+            payment_method TEXT,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (table_id) REFERENCES "table" (id),
+            FOREIGN KEY (user_id) REFERENCES user (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_item (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER DEFAULT 1,
+            price REAL NOT NULL,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (order_id) REFERENCES "order" (id) ON DELETE CASCADE,
+            FOREIGN KEY (product_id) REFERENCES product (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS payment (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            method TEXT NOT NULL,
+            status TEXT DEFAULT 'pendente',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (order_id) REFERENCES "order" (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS settings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            store_name TEXT DEFAULT 'MEATZ',
+            logo_url TEXT DEFAULT '',
+            phone TEXT DEFAULT '(61) 9 9999-9999',
+            email TEXT DEFAULT 'contato@meatzburger.com',
+            address TEXT DEFAULT 'Av. Principal, 175 - Centro, Cidade - UF',
+            opening_hours TEXT DEFAULT '11:00 - 23:00 (Todos os dias)',
+            whatsapp TEXT DEFAULT '5561999999999',
+            instagram TEXT DEFAULT '',
+            facebook TEXT DEFAULT '',
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_ingredient (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            ingredient_name TEXT NOT NULL,
+            quantity_per_unit REAL DEFAULT 1.0,
+            unit TEXT DEFAULT 'un',
+            FOREIGN KEY (product_id) REFERENCES product (id) ON DELETE CASCADE
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS inventory (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ingredient_name TEXT UNIQUE NOT NULL,
+            current_stock REAL DEFAULT 0,
+            min_stock REAL DEFAULT 10,
+            unit TEXT DEFAULT 'un',
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS customer (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            phone TEXT UNIQUE,
+            email TEXT,
+            loyalty_points INTEGER DEFAULT 0,
+            total_spent REAL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS loyalty_transaction (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id INTEGER NOT NULL,
+            order_id INTEGER,
+            points INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (customer_id) REFERENCES customer (id),
+            FOREIGN KEY (order_id) REFERENCES "order" (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_split (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            split_type TEXT NOT NULL,
+            number_of_splits INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (order_id) REFERENCES "order" (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_split_item (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            split_id INTEGER NOT NULL,
+            order_item_id INTEGER NOT NULL,
+            split_number INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            paid INTEGER DEFAULT 0,
+            FOREIGN KEY (split_id) REFERENCES order_split (id) ON DELETE CASCADE,
+            FOREIGN KEY (order_item_id) REFERENCES order_item (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_suggestion (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            suggested_product_id INTEGER NOT NULL,
+            suggestion_type TEXT DEFAULT 'upsell',
+            priority INTEGER DEFAULT 1,
+            FOREIGN KEY (product_id) REFERENCES product (id) ON DELETE CASCADE,
+            FOREIGN KEY (suggested_product_id) REFERENCES product (id) ON DELETE CASCADE
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_modifier_group (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            product_id INTEGER,
+            min_selection INTEGER DEFAULT 0,
+            max_selection INTEGER DEFAULT 1,
+            required INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (product_id) REFERENCES product (id) ON DELETE CASCADE
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_modifier_option (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            modifier_group_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            price_adjustment REAL DEFAULT 0,
+            available INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (modifier_group_id) REFERENCES product_modifier_group (id) ON DELETE CASCADE
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_item_modifier (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_item_id INTEGER NOT NULL,
+            modifier_option_id INTEGER NOT NULL,
+            price_adjustment REAL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (order_item_id) REFERENCES order_item (id) ON DELETE CASCADE,
+            FOREIGN KEY (modifier_option_id) REFERENCES product_modifier_option (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS table_grouping (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            table_ids TEXT NOT NULL,
+            merged_order_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            dissolved_at TIMESTAMP,
+            FOREIGN KEY (merged_order_id) REFERENCES "order" (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS table_merge_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            group_id INTEGER NOT NULL,
+            source_table_id INTEGER NOT NULL,
+            destination_table_id INTEGER,
+            action TEXT NOT NULL,
+            performed_by INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (group_id) REFERENCES table_grouping (id),
+            FOREIGN KEY (source_table_id) REFERENCES "table" (id),
+            FOREIGN KEY (destination_table_id) REFERENCES "table" (id),
+            FOREIGN KEY (performed_by) REFERENCES user (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_transfer (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            from_user_id INTEGER NOT NULL,
+            to_user_id INTEGER NOT NULL,
+            reason TEXT,
+            transferred_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (order_id) REFERENCES "order" (id),
+            FOREIGN KEY (from_user_id) REFERENCES user (id),
+            FOREIGN KEY (to_user_id) REFERENCES user (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS service_message (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER,
+            table_id INTEGER,
+            from_user_id INTEGER NOT NULL,
+            to_role TEXT NOT NULL,
+            message TEXT NOT NULL,
+            priority TEXT DEFAULT 'normal',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (order_id) REFERENCES "order" (id),
+            FOREIGN KEY (table_id) REFERENCES "table" (id),
+            FOREIGN KEY (from_user_id) REFERENCES user (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS service_message_receipt (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            message_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            read_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (message_id) REFERENCES service_message (id) ON DELETE CASCADE,
+            FOREIGN KEY (user_id) REFERENCES user (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_template (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            user_id INTEGER,
+            table_id INTEGER,
+            items_data TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES user (id),
+            FOREIGN KEY (table_id) REFERENCES "table" (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS service_charge_policy (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            percentage REAL DEFAULT 10.0,
+            is_automatic INTEGER DEFAULT 0,
+            active INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_service_charge (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            policy_id INTEGER,
+            amount REAL NOT NULL,
+            percentage REAL,
+            type TEXT DEFAULT 'manual',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (order_id) REFERENCES "order" (id),
+            FOREIGN KEY (policy_id) REFERENCES service_charge_policy (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS payment_split (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            split_number INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            payment_method TEXT,
+            paid INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (order_id) REFERENCES "order" (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS audit_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            action TEXT NOT NULL,
+            entity_type TEXT NOT NULL,
+            entity_id INTEGER,
+            old_values TEXT,
+            new_values TEXT,
+            ip_address TEXT,
+            user_agent TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES user (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS delivery_driver (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            vehicle_type TEXT,
+            license_plate TEXT,
+            active INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS delivery_order (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            driver_id INTEGER,
+            customer_name TEXT NOT NULL,
+            customer_phone TEXT NOT NULL,
+            delivery_address TEXT NOT NULL,
+            delivery_fee REAL DEFAULT 0,
+            status TEXT DEFAULT 'pending',
+            estimated_time INTEGER,
+            picked_up_at TIMESTAMP,
+            delivered_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (order_id) REFERENCES "order" (id),
+            FOREIGN KEY (driver_id) REFERENCES delivery_driver (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS delivery_route_event (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            delivery_order_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            latitude REAL,
+            longitude REAL,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (delivery_order_id) REFERENCES delivery_order (id) ON DELETE CASCADE
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reservation (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_name TEXT NOT NULL,
+            customer_phone TEXT NOT NULL,
+            customer_email TEXT,
+            party_size INTEGER NOT NULL,
+            reservation_date DATE NOT NULL,
+            reservation_time TIME NOT NULL,
+            table_id INTEGER,
+            status TEXT DEFAULT 'pending',
+            notes TEXT,
+            confirmed_at TIMESTAMP,
+            cancelled_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (table_id) REFERENCES "table" (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS waitlist_entry (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_name TEXT NOT NULL,
+            customer_phone TEXT NOT NULL,
+            party_size INTEGER NOT NULL,
+            status TEXT DEFAULT 'waiting',
+            notified_at TIMESTAMP,
+            seated_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cash_operation (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL,
+            amount REAL NOT NULL,
+            reason TEXT,
+            performed_by INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (performed_by) REFERENCES user (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cashier_session (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            opening_balance REAL DEFAULT 0,
+            closing_balance REAL,
+            status TEXT DEFAULT 'open',
+            opened_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            closed_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES user (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS shift_assignment (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            shift_date DATE NOT NULL,
+            start_time TIME NOT NULL,
+            end_time TIME NOT NULL,
+            actual_start TIMESTAMP,
+            actual_end TIMESTAMP,
+            status TEXT DEFAULT 'scheduled',
+            FOREIGN KEY (user_id) REFERENCES user (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS inventory_batch (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ingredient_name TEXT NOT NULL,
+            batch_number TEXT,
+            quantity REAL NOT NULL,
+            unit TEXT NOT NULL,
+            expiry_date DATE,
+            supplier TEXT,
+            purchase_price REAL,
+            received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS inventory_transaction (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ingredient_name TEXT NOT NULL,
+            transaction_type TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            unit TEXT NOT NULL,
+            order_id INTEGER,
+            batch_id INTEGER,
+            performed_by INTEGER,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (order_id) REFERENCES "order" (id),
+            FOREIGN KEY (batch_id) REFERENCES inventory_batch (id),
+            FOREIGN KEY (performed_by) REFERENCES user (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notification_subscription (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            notification_type TEXT NOT NULL,
+            enabled INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES user (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS print_job (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            printer_type TEXT NOT NULL,
+            content_type TEXT NOT NULL,
+            content_data TEXT NOT NULL,
+            status TEXT DEFAULT 'pending',
+            printed_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS report_export (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            report_type TEXT NOT NULL,
+            format TEXT NOT NULL,
+            parameters TEXT,
+            file_path TEXT,
+            status TEXT DEFAULT 'pending',
+            generated_by INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP,
+            FOREIGN KEY (generated_by) REFERENCES user (id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS kds_event (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT NOT NULL,
+            order_id INTEGER,
+            item_id INTEGER,
+            status TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS image_asset (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source_url TEXT NOT NULL UNIQUE,
+            status TEXT DEFAULT 'pendente',
+            content_hash TEXT,
+            original_name TEXT,
+            width INTEGER,
+            height INTEGER,
+            variants TEXT,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Fila de tarefas em segundo plano (app/jobs.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            payload TEXT,
+            priority INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            run_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            locked_by TEXT,
+            locked_at TIMESTAMP,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cache_version (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Consolidados de vendas pagas por dia (mantidos por SalesRollup ao pagar/alterar pedidos)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_sales (
+            sale_date TEXT PRIMARY KEY,
+            orders_count INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_product_sales (
+            sale_date TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (sale_date, product_id)
+        )
+    ''')
+
+# Migrações versionadas, em ordem. Cada passo recebe o cursor e roda na mesma transação
+# que registra a versão em schema_version. Passos já publicados não devem ser editados:
+# mudanças de esquema (colunas, tabelas, índices novos em INDEXES) entram como um passo novo.
+MIGRATIONS = [
+    (1, 'Tabelas do sistema', _create_tables),
+    (2, 'Colunas de bancos antigos', _add_legacy_columns),
+    (3, 'Índices secundários', _create_indexes),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+MIGRATION_LOCK_PATH = os.getenv('MIGRATION_LOCK_PATH')
+
+def get_schema_version():
+    """Versão do esquema gravada no banco (0 se ainda não há schema_version)"""
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        
-        def column_exists(table_name, column_name):
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = [col[1] for col in cursor.fetchall()]
-            return column_name in columns
-        
-        migrations = [
-            ('"order"', 'order_type', 'ALTER TABLE "order" ADD COLUMN order_type TEXT DEFAULT "mesa"'),
-            ('"order"', 'customer_id', 'ALTER TABLE "order" ADD COLUMN customer_id INTEGER'),
-            ('"order"', 'delivery_address', 'ALTER TABLE "order" ADD COLUMN delivery_address TEXT'),
-            ('"order"', 'delivery_fee', 'ALTER TABLE "order" ADD COLUMN delivery_fee REAL DEFAULT 0'),
-            ('"order"', 'tip_amount', 'ALTER TABLE "order" ADD COLUMN tip_amount REAL DEFAULT 0'),
-            ('"order"', 'tip_percentage', 'ALTER TABLE "order" ADD COLUMN tip_percentage REAL DEFAULT 0'),
-            ('"order"', 'source_channel', 'ALTER TABLE "order" ADD COLUMN source_channel TEXT DEFAULT "mesa"'),
-            ('product', 'prep_time_minutes', 'ALTER TABLE product ADD COLUMN prep_time_minutes INTEGER DEFAULT 15'),
-            ('product', 'prep_section', 'ALTER TABLE product ADD COLUMN prep_section TEXT DEFAULT "geral"'),
-            ('product', 'allows_modifiers', 'ALTER TABLE product ADD COLUMN allows_modifiers INTEGER DEFAULT 1'),
-            ('order_item', 'status', 'ALTER TABLE order_item ADD COLUMN status TEXT DEFAULT "novo"'),
-            ('order_item', 'prep_started_at', 'ALTER TABLE order_item ADD COLUMN prep_started_at TIMESTAMP'),
-            ('order_item', 'prep_completed_at', 'ALTER TABLE order_item ADD COLUMN prep_completed_at TIMESTAMP'),
-            ('order_item', 'delivered_at', 'ALTER TABLE order_item ADD COLUMN delivered_at TIMESTAMP'),
-            ('order_item', 'group_priority', 'ALTER TABLE order_item ADD COLUMN group_priority INTEGER DEFAULT 0'),
-            ('"table"', 'layout_x', 'ALTER TABLE "table" ADD COLUMN layout_x INTEGER DEFAULT 0'),
-            ('"table"', 'layout_y', 'ALTER TABLE "table" ADD COLUMN layout_y INTEGER DEFAULT 0'),
-            ('"table"', 'shape', 'ALTER TABLE "table" ADD COLUMN shape TEXT DEFAULT "square"'),
-            ('payment', 'external_reference', 'ALTER TABLE payment ADD COLUMN external_reference TEXT'),
-            ('payment', 'split_id', 'ALTER TABLE payment ADD COLUMN split_id INTEGER'),
-            ('inventory', 'expiry_alert_days', 'ALTER TABLE inventory ADD COLUMN expiry_alert_days INTEGER DEFAULT 7'),
-            ('user', 'commission_percentage', 'ALTER TABLE user ADD COLUMN commission_percentage REAL DEFAULT 0'),
-            ('user', 'is_active', 'ALTER TABLE user ADD COLUMN is_active INTEGER DEFAULT 1'),
-            ('user', 'last_login', 'ALTER TABLE user ADD COLUMN last_login TIMESTAMP'),
-            ('settings', 'tip_percentage', 'ALTER TABLE settings ADD COLUMN tip_percentage REAL DEFAULT 10'),
-            ('settings', 'enable_auto_tip', 'ALTER TABLE settings ADD COLUMN enable_auto_tip INTEGER DEFAULT 0'),
-            ('settings', 'store_zipcode', 'ALTER TABLE settings ADD COLUMN store_zipcode TEXT DEFAULT ""'),
-            ('settings', 'delivery_radius_km', 'ALTER TABLE settings ADD COLUMN delivery_radius_km REAL DEFAULT 5.0'),
-            ('settings', 'enable_delivery', 'ALTER TABLE settings ADD COLUMN enable_delivery INTEGER DEFAULT 1'),
-            ('settings', 'delivery_fee', 'ALTER TABLE settings ADD COLUMN delivery_fee REAL DEFAULT 5.0'),
-            ('settings', 'store_latitude', 'ALTER TABLE settings ADD COLUMN store_latitude REAL'),
-            ('settings', 'store_longitude', 'ALTER TABLE settings ADD COLUMN store_longitude REAL'),
-            ('settings', 'store_city', 'ALTER TABLE settings ADD COLUMN store_city TEXT'),
-            ('settings', 'store_state', 'ALTER TABLE settings ADD COLUMN store_state TEXT'),
-            ('customer', 'address', 'ALTER TABLE customer ADD COLUMN address TEXT'),
-            ('customer', 'zipcode', 'ALTER TABLE customer ADD COLUMN zipcode TEXT'),
-            ('customer', 'city', 'ALTER TABLE customer ADD COLUMN city TEXT'),
-            ('customer', 'state', 'ALTER TABLE customer ADD COLUMN state TEXT'),
-            ('customer', 'latitude', 'ALTER TABLE customer ADD COLUMN latitude REAL'),
-            ('customer', 'longitude', 'ALTER TABLE customer ADD COLUMN longitude REAL'),
-        ]
-        
-        for table, column, sql in migrations:
-            if not column_exists(table, column):
-                try:
-                    cursor.execute(sql)
-                    print(f'✅ Migração aplicada: {table}.{column}')
-                except sqlite3.OperationalError as e:
-                    print(f'⚠️  Erro ao aplicar migração {table}.{column}: {e}')
-        
-        conn.commit()
+        try:
+            row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+        except sqlite3.OperationalError:
+            return 0
+    return row[0] or 0
 
-def init_db():
+def get_applied_migrations():
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT,
-                role TEXT DEFAULT 'garcom',
-                phone TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS category (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                description TEXT,
-                image_url TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS product (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                description TEXT,
-                price REAL NOT NULL,
-                image_url TEXT,
-                category_id INTEGER,
-                available INTEGER DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (category_id) REFERENCES category (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS "table" (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                number INTEGER UNIQUE NOT NULL,
-                capacity INTEGER DEFAULT 4,
-                status TEXT DEFAULT 'livre',
-                pin TEXT,
-                current_order_id INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (current_order_id) REFERENCES "order" (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS "order" (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                table_id INTEGER,
-                user_id INTEGER,
-                status TEXT DEFAULT 'pendente',
-                total REAL DEFAULT 0.0,
-                payment_method TEXT,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (table_id) REFERENCES "table" (id),
-                FOREIGN KEY (user_id) REFERENCES user (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS order_item (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER NOT NULL,
-                product_id INTEGER NOT NULL,
-                quantity INTEGER DEFAULT 1,
-                price REAL NOT NULL,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (order_id) REFERENCES "order" (id) ON DELETE CASCADE,
-                FOREIGN KEY (product_id) REFERENCES product (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS payment (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER NOT NULL,
-                amount REAL NOT NULL,
-                method TEXT NOT NULL,
-                status TEXT DEFAULT 'pendente',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (order_id) REFERENCES "order" (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS settings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                store_name TEXT DEFAULT 'MEATZ',
-                logo_url TEXT DEFAULT '',
-                phone TEXT DEFAULT '(61) 9 9999-9999',
-                email TEXT DEFAULT 'contato@meatzburger.com',
-                address TEXT DEFAULT 'Av. Principal, 175 - Centro, Cidade - UF',
-                opening_hours TEXT DEFAULT '11:00 - 23:00 (Todos os dias)',
-                whatsapp TEXT DEFAULT '5561999999999',
-                instagram TEXT DEFAULT '',
-                facebook TEXT DEFAULT '',
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS product_ingredient (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER NOT NULL,
-                ingredient_name TEXT NOT NULL,
-                quantity_per_unit REAL DEFAULT 1.0,
-                unit TEXT DEFAULT 'un',
-                FOREIGN KEY (product_id) REFERENCES product (id) ON DELETE CASCADE
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS inventory (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ingredient_name TEXT UNIQUE NOT NULL,
-                current_stock REAL DEFAULT 0,
-                min_stock REAL DEFAULT 10,
-                unit TEXT DEFAULT 'un',
-                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS customer (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                phone TEXT UNIQUE,
-                email TEXT,
-                loyalty_points INTEGER DEFAULT 0,
-                total_spent REAL DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS loyalty_transaction (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                customer_id INTEGER NOT NULL,
-                order_id INTEGER,
-                points INTEGER NOT NULL,
-                type TEXT NOT NULL,
-                description TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (customer_id) REFERENCES customer (id),
-                FOREIGN KEY (order_id) REFERENCES "order" (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS order_split (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER NOT NULL,
-                split_type TEXT NOT NULL,
-                number_of_splits INTEGER DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (order_id) REFERENCES "order" (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS order_split_item (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                split_id INTEGER NOT NULL,
-                order_item_id INTEGER NOT NULL,
-                split_number INTEGER NOT NULL,
-                amount REAL NOT NULL,
-                paid INTEGER DEFAULT 0,
-                FOREIGN KEY (split_id) REFERENCES order_split (id) ON DELETE CASCADE,
-                FOREIGN KEY (order_item_id) REFERENCES order_item (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS product_suggestion (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER NOT NULL,
-                suggested_product_id INTEGER NOT NULL,
-                suggestion_type TEXT DEFAULT 'upsell',
-                priority INTEGER DEFAULT 1,
-                FOREIGN KEY (product_id) REFERENCES product (id) ON DELETE CASCADE,
-                FOREIGN KEY (suggested_product_id) REFERENCES product (id) ON DELETE CASCADE
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS product_modifier_group (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                product_id INTEGER,
-                min_selection INTEGER DEFAULT 0,
-                max_selection INTEGER DEFAULT 1,
-                required INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (product_id) REFERENCES product (id) ON DELETE CASCADE
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS product_modifier_option (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                modifier_group_id INTEGER NOT NULL,
-                name TEXT NOT NULL,
-                price_adjustment REAL DEFAULT 0,
-                available INTEGER DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (modifier_group_id) REFERENCES product_modifier_group (id) ON DELETE CASCADE
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS order_item_modifier (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_item_id INTEGER NOT NULL,
-                modifier_option_id INTEGER NOT NULL,
-                price_adjustment REAL DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (order_item_id) REFERENCES order_item (id) ON DELETE CASCADE,
-                FOREIGN KEY (modifier_option_id) REFERENCES product_modifier_option (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS table_grouping (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                table_ids TEXT NOT NULL,
-                merged_order_id INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                dissolved_at TIMESTAMP,
-                FOREIGN KEY (merged_order_id) REFERENCES "order" (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS table_merge_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                group_id INTEGER NOT NULL,
-                source_table_id INTEGER NOT NULL,
-                destination_table_id INTEGER,
-                action TEXT NOT NULL,
-                performed_by INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (group_id) REFERENCES table_grouping (id),
-                FOREIGN KEY (source_table_id) REFERENCES "table" (id),
-                FOREIGN KEY (destination_table_id) REFERENCES "table" (id),
-                FOREIGN KEY (performed_by) REFERENCES user (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS order_transfer (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER NOT NULL,
-                from_user_id INTEGER NOT NULL,
-                to_user_id INTEGER NOT NULL,
-                reason TEXT,
-                transferred_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (order_id) REFERENCES "order" (id),
-                FOREIGN KEY (from_user_id) REFERENCES user (id),
-                FOREIGN KEY (to_user_id) REFERENCES user (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS service_message (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER,
-                table_id INTEGER,
-                from_user_id INTEGER NOT NULL,
-                to_role TEXT NOT NULL,
-                message TEXT NOT NULL,
-                priority TEXT DEFAULT 'normal',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (order_id) REFERENCES "order" (id),
-                FOREIGN KEY (table_id) REFERENCES "table" (id),
-                FOREIGN KEY (from_user_id) REFERENCES user (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS service_message_receipt (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                message_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                read_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (message_id) REFERENCES service_message (id) ON DELETE CASCADE,
-                FOREIGN KEY (user_id) REFERENCES user (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS order_template (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                user_id INTEGER,
-                table_id INTEGER,
-                items_data TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES user (id),
-                FOREIGN KEY (table_id) REFERENCES "table" (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS service_charge_policy (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                percentage REAL DEFAULT 10.0,
-                is_automatic INTEGER DEFAULT 0,
-                active INTEGER DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS order_service_charge (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER NOT NULL,
-                policy_id INTEGER,
-                amount REAL NOT NULL,
-                percentage REAL,
-                type TEXT DEFAULT 'manual',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (order_id) REFERENCES "order" (id),
-                FOREIGN KEY (policy_id) REFERENCES service_charge_policy (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS payment_split (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER NOT NULL,
-                split_number INTEGER NOT NULL,
-                amount REAL NOT NULL,
-                payment_method TEXT,
-                paid INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (order_id) REFERENCES "order" (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS audit_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                action TEXT NOT NULL,
-                entity_type TEXT NOT NULL,
-                entity_id INTEGER,
-                old_values TEXT,
-                new_values TEXT,
-                ip_address TEXT,
-                user_agent TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES user (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS delivery_driver (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                phone TEXT NOT NULL,
-                vehicle_type TEXT,
-                license_plate TEXT,
-                active INTEGER DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS delivery_order (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER NOT NULL,
-                driver_id INTEGER,
-                customer_name TEXT NOT NULL,
-                customer_phone TEXT NOT NULL,
-                delivery_address TEXT NOT NULL,
-                delivery_fee REAL DEFAULT 0,
-                status TEXT DEFAULT 'pending',
-                estimated_time INTEGER,
-                picked_up_at TIMESTAMP,
-                delivered_at TIMESTAMP,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (order_id) REFERENCES "order" (id),
-                FOREIGN KEY (driver_id) REFERENCES delivery_driver (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS delivery_route_event (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                delivery_order_id INTEGER NOT NULL,
-                status TEXT NOT NULL,
-                latitude REAL,
-                longitude REAL,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (delivery_order_id) REFERENCES delivery_order (id) ON DELETE CASCADE
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS reservation (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                customer_name TEXT NOT NULL,
-                customer_phone TEXT NOT NULL,
-                customer_email TEXT,
-                party_size INTEGER NOT NULL,
-                reservation_date DATE NOT NULL,
-                reservation_time TIME NOT NULL,
-                table_id INTEGER,
-                status TEXT DEFAULT 'pending',
-                notes TEXT,
-                confirmed_at TIMESTAMP,
-                cancelled_at TIMESTAMP,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (table_id) REFERENCES "table" (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS waitlist_entry (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                customer_name TEXT NOT NULL,
-                customer_phone TEXT NOT NULL,
-                party_size INTEGER NOT NULL,
-                status TEXT DEFAULT 'waiting',
-                notified_at TIMESTAMP,
-                seated_at TIMESTAMP,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS cash_operation (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                type TEXT NOT NULL,
-                amount REAL NOT NULL,
-                reason TEXT,
-                performed_by INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (performed_by) REFERENCES user (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS cashier_session (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                opening_balance REAL DEFAULT 0,
-                closing_balance REAL,
-                status TEXT DEFAULT 'open',
-                opened_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                closed_at TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES user (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS shift_assignment (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                shift_date DATE NOT NULL,
-                start_time TIME NOT NULL,
-                end_time TIME NOT NULL,
-                actual_start TIMESTAMP,
-                actual_end TIMESTAMP,
-                status TEXT DEFAULT 'scheduled',
-                FOREIGN KEY (user_id) REFERENCES user (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS inventory_batch (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ingredient_name TEXT NOT NULL,
-                batch_number TEXT,
-                quantity REAL NOT NULL,
-                unit TEXT NOT NULL,
-                expiry_date DATE,
-                supplier TEXT,
-                purchase_price REAL,
-                received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS inventory_transaction (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ingredient_name TEXT NOT NULL,
-                transaction_type TEXT NOT NULL,
-                quantity REAL NOT NULL,
-                unit TEXT NOT NULL,
-                order_id INTEGER,
-                batch_id INTEGER,
-                performed_by INTEGER,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (order_id) REFERENCES "order" (id),
-                FOREIGN KEY (batch_id) REFERENCES inventory_batch (id),
-                FOREIGN KEY (performed_by) REFERENCES user (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS notification_subscription (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                notification_type TEXT NOT NULL,
-                enabled INTEGER DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES user (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS print_job (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                printer_type TEXT NOT NULL,
-                content_type TEXT NOT NULL,
-                content_data TEXT NOT NULL,
-                status TEXT DEFAULT 'pending',
-                printed_at TIMESTAMP,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS report_export (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                report_type TEXT NOT NULL,
-                format TEXT NOT NULL,
-                parameters TEXT,
-                file_path TEXT,
-                status TEXT DEFAULT 'pending',
-                generated_by INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                completed_at TIMESTAMP,
-                FOREIGN KEY (generated_by) REFERENCES user (id)
-            )
-        ''')
+        try:
+            return conn.execute('SELECT * FROM schema_version ORDER BY version').fetchall()
+        except sqlite3.OperationalError:
+            return []
+
+@contextmanager
+def migration_lock():
+    """Trava entre processos (arquivo ao lado do banco) enquanto as migrações rodam.
+    
+    Os workers que chegam depois esperam aqui sem limite de tempo, em vez de estourar o
+    busy_timeout do SQLite durante uma migração longa.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        # Sem fcntl (Windows) a serialização fica só por conta do BEGIN IMMEDIATE
+        yield
+        return
+    
+    with open(MIGRATION_LOCK_PATH or f'{get_db_path()}.migrate.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def migrate():
+    """Aplica as migrações pendentes sob trava; retorna as versões aplicadas"""
+    applied = []
+    with migration_lock():
+        with transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    duration_ms REAL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            # Confere de novo já com a trava: outro worker pode ter migrado enquanto esperávamos
+            current = cursor.execute('SELECT MAX(version) FROM schema_version').fetchone()[0] or 0
+            for version, description, step in MIGRATIONS:
+                if version <= current:
+                    continue
+                started = time.perf_counter()
+                step(cursor)
+                cursor.execute('INSERT INTO schema_version (version, description, duration_ms) VALUES (?, ?, ?)',
+                               (version, description, round((time.perf_counter() - started) * 1000, 2)))
+                applied.append(version)
+                print(f'✅ Migração {version} aplicada: {description}')
         
-        conn.commit()
-        print('✅ Todas as tabelas criadas com sucesso!')
+        if applied:
+            with get_db_connection() as conn:
+                conn.execute('PRAGMA optimize')
+    return applied
+
+def init_db():
+    """Deixa o esquema na versão atual; retorna True se alguma migração foi aplicada.
     
-    apply_migrations()
+    Caminho rápido: com o banco em dia, o boot faz uma única consulta (MAX(version)).
+    """
+    if get_schema_version() >= SCHEMA_VERSION:
+        return False
+    return bool(migrate())
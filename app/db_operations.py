@@ -1,8 +1,16 @@
-from app.database import get_db_connection
+from app.database import get_db_connection, after_commit
+from app.events import kds_events
+from app.cache import catalog_cache, settings_cache, user_cache
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+import dataclasses
+import json
+from typing import Optional
 
 class User:
+    # Campos que mudam a identidade/permissões da sessão (UserSession) e invalidam o cache
+    SESSION_FIELDS = ('username', 'email', 'role', 'phone', 'is_active', 'password', 'password_hash')
+    
     @staticmethod
     def create(username, email, password, role='garcom', phone=None):
         password_hash = generate_password_hash(password)
@@ -65,16 +73,37 @@ class User:
                 fields.append(f'{key} = ?')
                 values.append(value)
         
+        session_changed = any(key in User.SESSION_FIELDS for key in kwargs)
+        if session_changed:
+            fields.append('session_version = session_version + 1')
+        
         values.append(user_id)
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(f'UPDATE user SET {", ".join(fields)} WHERE id = ?', values)
+            if session_changed:
+                user_cache.invalidate(user_id)
             return cursor.rowcount > 0
     
+    @staticmethod
+    def get_session_versions(user_ids):
+        """Versão de sessão dos usuários ativos informados ({id: session_version})"""
+        if not user_ids:
+            return {}
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            placeholders = ','.join(['?' for _ in user_ids])
+            cursor.execute(f'''
+                SELECT id, session_version FROM user
+                WHERE id IN ({placeholders}) AND COALESCE(is_active, 1) = 1
+            ''', list(user_ids))
+            return {row['id']: row['session_version'] for row in cursor.fetchall()}
+    
     @staticmethod
     def delete(user_id):
         with get_db_connection() as conn:
             cursor = conn.cursor()
+            user_cache.invalidate(user_id)
             cursor.execute('DELETE FROM user WHERE id = ?', (user_id,))
             return cursor.rowcount > 0
 
@@ -87,6 +116,7 @@ class Category:
                 INSERT INTO category (name, description, image_url)
                 VALUES (?, ?, ?)
             ''', (name, description, image_url))
+            catalog_cache.invalidate()
             return cursor.lastrowid
     
     @staticmethod
@@ -98,10 +128,15 @@ class Category:
     
     @staticmethod
     def get_all():
+        """Categorias servidas do cache do cardápio"""
+        return list(catalog_cache.get('categories', Category._load_all))
+    
+    @staticmethod
+    def _load_all():
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM category ORDER BY created_at DESC')
-            return cursor.fetchall()
+            return tuple(cursor.fetchall())
     
     @staticmethod
     def update(category_id, **kwargs):
@@ -110,6 +145,7 @@ class Category:
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(f'UPDATE category SET {", ".join(fields)} WHERE id = ?', values)
+            catalog_cache.invalidate()
             return cursor.rowcount > 0
     
     @staticmethod
@@ -117,6 +153,7 @@ class Category:
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM category WHERE id = ?', (category_id,))
+            catalog_cache.invalidate()
             return cursor.rowcount > 0
     
     @staticmethod
@@ -135,6 +172,7 @@ class Product:
                 INSERT INTO product (name, description, price, image_url, category_id, available)
                 VALUES (?, ?, ?, ?, ?, ?)
             ''', (name, description, price, image_url, category_id, 1 if available else 0))
+            catalog_cache.invalidate()
             return cursor.lastrowid
     
     @staticmethod
@@ -144,15 +182,32 @@ class Product:
             cursor.execute('SELECT * FROM product WHERE id = ?', (product_id,))
             return cursor.fetchone()
     
+    @staticmethod
+    def get_many(product_ids):
+        """Busca vários produtos numa única consulta; retorna {id: produto} (ids inexistentes ficam de fora)"""
+        ids = sorted({int(product_id) for product_id in product_ids})
+        if not ids:
+            return {}
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM product WHERE id IN (SELECT value FROM json_each(?))', (json.dumps(ids),))
+            return {row['id']: row for row in cursor.fetchall()}
+    
     @staticmethod
     def get_all(available_only=False):
+        """Produtos servidos do cache do cardápio"""
+        return list(catalog_cache.get(('products', bool(available_only)),
+                                      lambda: Product._load_all(available_only)))
+    
+    @staticmethod
+    def _load_all(available_only):
         with get_db_connection() as conn:
             cursor = conn.cursor()
             if available_only:
                 cursor.execute('SELECT * FROM product WHERE available = 1 ORDER BY created_at DESC')
             else:
                 cursor.execute('SELECT * FROM product ORDER BY created_at DESC')
-            return cursor.fetchall()
+            return tuple(cursor.fetchall())
     
     @staticmethod
     def get_by_category(category_id, available_only=False):
@@ -166,10 +221,14 @@ class Product:
     
     @staticmethod
     def get_featured(limit=4):
+        return list(catalog_cache.get(('featured', limit), lambda: Product._load_featured(limit)))
+    
+    @staticmethod
+    def _load_featured(limit):
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM product WHERE available = 1 LIMIT ?', (limit,))
-            return cursor.fetchall()
+            return tuple(cursor.fetchall())
     
     @staticmethod
     def update(product_id, **kwargs):
@@ -180,6 +239,7 @@ class Product:
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(f'UPDATE product SET {", ".join(fields)} WHERE id = ?', values)
+            catalog_cache.invalidate()
             return cursor.rowcount > 0
     
     @staticmethod
@@ -187,6 +247,7 @@ class Product:
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM product WHERE id = ?', (product_id,))
+            catalog_cache.invalidate()
             return cursor.rowcount > 0
     
     @staticmethod
@@ -263,7 +324,9 @@ class Order:
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (table_id, user_id, customer_id, status, total, payment_method, notes, 
                  order_type, delivery_address, delivery_fee))
-            return cursor.lastrowid
+            order_id = cursor.lastrowid
+            KdsEvent.create('order_created', order_id=order_id, status=status)
+            return order_id
     
     @staticmethod
     def get_by_id(order_id):
@@ -301,15 +364,34 @@ class Order:
         values = list(kwargs.values()) + [order_id]
         with get_db_connection() as conn:
             cursor = conn.cursor()
+            # Só status e total mexem no consolidado de vendas
+            previous = None
+            if 'status' in kwargs or 'total' in kwargs:
+                cursor.execute('SELECT status, total, DATE(created_at) as sale_date FROM "order" WHERE id = ?', (order_id,))
+                previous = cursor.fetchone()
             cursor.execute(f'UPDATE "order" SET {", ".join(fields)} WHERE id = ?', values)
-            return cursor.rowcount > 0
+            updated = cursor.rowcount > 0
+            if updated:
+                KdsEvent.create('order_updated', order_id=order_id, status=kwargs.get('status'))
+                if previous is not None:
+                    SalesRollup.apply_order_change(order_id, previous, kwargs.get('status', previous['status']),
+                                                   kwargs.get('total', previous['total']))
+            return updated
     
     @staticmethod
     def delete(order_id):
         with get_db_connection() as conn:
             cursor = conn.cursor()
+            cursor.execute('SELECT status, total, DATE(created_at) as sale_date FROM "order" WHERE id = ?', (order_id,))
+            previous = cursor.fetchone()
+            # Desconta do consolidado antes de o pedido e os itens sumirem
+            if previous is not None and previous['status'] == 'pago':
+                SalesRollup.remove_order(order_id, previous['sale_date'], previous['total'])
             cursor.execute('DELETE FROM "order" WHERE id = ?', (order_id,))
-            return cursor.rowcount > 0
+            deleted = cursor.rowcount > 0
+            if deleted:
+                KdsEvent.create('order_deleted', order_id=order_id)
+            return deleted
     
     @staticmethod
     def count():
@@ -340,6 +422,52 @@ class Order:
             result = cursor.fetchone()
             return result['revenue'] if result['revenue'] is not None else 0
     
+    @staticmethod
+    def get_status_summary():
+        """Quantidade e soma dos totais por status, numa única agregação (índice status, total)"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT status, COUNT(*) as count, SUM(total) as revenue FROM "order" GROUP BY status')
+            return cursor.fetchall()
+    
+    @staticmethod
+    def get_active_summary(statuses):
+        """Pedidos nos status informados com as contagens de itens por status, agregadas numa só consulta"""
+        if not statuses:
+            return []
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            placeholders = ','.join(['?' for _ in statuses])
+            cursor.execute(f'''
+                SELECT o.id, o.status, o.created_at, o.total, o.order_type, t.number as table_number,
+                       COUNT(oi.id) as items_count,
+                       COALESCE(SUM(oi.status = 'novo'), 0) as items_pending,
+                       COALESCE(SUM(oi.status = 'preparando'), 0) as items_preparing,
+                       COALESCE(SUM(oi.status = 'pronto'), 0) as items_ready
+                FROM "order" o
+                LEFT JOIN "table" t ON o.table_id = t.id
+                LEFT JOIN order_item oi ON oi.order_id = o.id
+                WHERE o.status IN ({placeholders})
+                GROUP BY o.id
+                ORDER BY o.created_at ASC
+            ''', statuses)
+            return cursor.fetchall()
+    
+    @staticmethod
+    def get_ages_by_status(statuses):
+        """Idade em segundos de cada pedido nos status informados (coberta por idx_order_status_created)"""
+        if not statuses:
+            return []
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            placeholders = ','.join(['?' for _ in statuses])
+            cursor.execute(f'''
+                SELECT status, (julianday('now') - julianday(created_at)) * 86400 as age_seconds
+                FROM "order"
+                WHERE status IN ({placeholders})
+            ''', statuses)
+            return cursor.fetchall()
+    
     @staticmethod
     def get_by_date_and_status(date, status):
         with get_db_connection() as conn:
@@ -364,6 +492,161 @@ class Order:
                 ORDER BY created_at ASC
             ''', statuses)
             return cursor.fetchall()
+    
+    @staticmethod
+    def get_left_board_since(statuses, since):
+        """Ids dos pedidos alterados depois do cursor que não estão mais nos status informados"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            placeholders = ','.join(['?' for _ in statuses])
+            cursor.execute(f'''
+                SELECT id FROM "order"
+                WHERE change_seq > ? AND +status NOT IN ({placeholders})
+            ''', [since, *statuses])
+            return [row['id'] for row in cursor.fetchall()]
+    
+    @staticmethod
+    def get_board(statuses, since=None):
+        """Pedidos ativos com número da mesa, idade em minutos e prioridade calculados no SQL.
+        
+        Com since, retorna só os pedidos cujo change_seq é maior que o cursor.
+        """
+        if not statuses:
+            return []
+        if since is None:
+            where, params = f"o.status IN ({','.join(['?' for _ in statuses])})", list(statuses)
+        else:
+            # "+o.status" impede o uso do índice de status: o filtro parte de idx_order_change_seq
+            where, params = f"o.change_seq > ? AND +o.status IN ({','.join(['?' for _ in statuses])})", [since, *statuses]
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT board.*,
+                       CASE
+                           WHEN age_minutes > 30 THEN 'critical'
+                           WHEN age_minutes > 20 THEN 'high'
+                           WHEN age_minutes > 10 THEN 'medium'
+                           ELSE 'low'
+                       END as priority_class
+                FROM (
+                    SELECT o.*, t.number as table_number,
+                           CAST(COALESCE((julianday('now') - julianday(o.created_at)) * 24 * 60, 0) AS INTEGER) as age_minutes
+                    FROM "order" o
+                    LEFT JOIN "table" t ON o.table_id = t.id
+                    WHERE {where}
+                ) board
+                ORDER BY created_at ASC, id ASC
+            ''', params)
+            return cursor.fetchall()
+
+class SalesRollup:
+    """Consolidado diário de vendas pagas (daily_sales / daily_product_sales) usado nos relatórios.
+    
+    Mantido por deltas: quando um pedido entra ou sai de 'pago' (ou muda de total já pago),
+    o dia dele recebe +/- o total, a contagem e a quantidade/receita dos itens, via UPSERT
+    pela chave primária; o custo não depende do movimento do dia. backfill() reconstrói
+    tudo a partir dos pedidos.
+    """
+    
+    @staticmethod
+    def apply_order_change(order_id, previous, status, total):
+        """Aplica a mudança de um pedido aos consolidados; previous traz status, total e sale_date anteriores"""
+        was_paid = previous['status'] == 'pago'
+        is_paid = status == 'pago'
+        if was_paid and not is_paid:
+            SalesRollup.remove_order(order_id, previous['sale_date'], previous['total'])
+        elif is_paid and not was_paid:
+            SalesRollup.add_order(order_id, previous['sale_date'], total)
+        elif is_paid and (total or 0) != (previous['total'] or 0):
+            with get_db_connection() as conn:
+                conn.execute('''
+                    UPDATE daily_sales SET revenue = revenue + ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE sale_date = ?
+                ''', ((total or 0) - (previous['total'] or 0), previous['sale_date']))
+    
+    @staticmethod
+    def add_order(order_id, sale_date, total):
+        SalesRollup._apply_order(order_id, sale_date, total, 1)
+    
+    @staticmethod
+    def remove_order(order_id, sale_date, total):
+        SalesRollup._apply_order(order_id, sale_date, total, -1)
+    
+    @staticmethod
+    def _apply_order(order_id, sale_date, total, sign):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO daily_sales (sale_date, orders_count, revenue) VALUES (?, ?, ?)
+                ON CONFLICT(sale_date) DO UPDATE SET
+                    orders_count = orders_count + excluded.orders_count,
+                    revenue = revenue + excluded.revenue,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', (sale_date, sign, sign * (total or 0)))
+            cursor.execute('''
+                INSERT INTO daily_product_sales (sale_date, product_id, quantity, revenue)
+                SELECT ?, product_id, ? * SUM(quantity), ? * SUM(price * quantity)
+                FROM order_item
+                WHERE order_id = ?
+                GROUP BY product_id
+                ON CONFLICT(sale_date, product_id) DO UPDATE SET
+                    quantity = quantity + excluded.quantity,
+                    revenue = revenue + excluded.revenue
+            ''', (sale_date, sign, sign, order_id))
+            if sign < 0:
+                cursor.execute('DELETE FROM daily_sales WHERE sale_date = ? AND orders_count <= 0', (sale_date,))
+                cursor.execute('DELETE FROM daily_product_sales WHERE sale_date = ? AND quantity <= 0', (sale_date,))
+    
+    @staticmethod
+    def backfill():
+        """Reconstrói os consolidados de todos os dias; retorna a quantidade de dias com vendas"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM daily_sales')
+            cursor.execute('DELETE FROM daily_product_sales')
+            cursor.execute('''
+                INSERT INTO daily_sales (sale_date, orders_count, revenue)
+                SELECT DATE(created_at), COUNT(*), COALESCE(SUM(total), 0)
+                FROM "order"
+                WHERE status = 'pago'
+                GROUP BY DATE(created_at)
+            ''')
+            days = cursor.rowcount
+            cursor.execute('''
+                INSERT INTO daily_product_sales (sale_date, product_id, quantity, revenue)
+                SELECT DATE(o.created_at), oi.product_id, SUM(oi.quantity), SUM(oi.price * oi.quantity)
+                FROM "order" o
+                JOIN order_item oi ON oi.order_id = o.id
+                WHERE o.status = 'pago'
+                GROUP BY DATE(o.created_at), oi.product_id
+            ''')
+            return days
+    
+    @staticmethod
+    def get_totals(start_date, end_date):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT COALESCE(SUM(orders_count), 0) as orders_count, COALESCE(SUM(revenue), 0) as revenue
+                FROM daily_sales
+                WHERE sale_date BETWEEN DATE(?) AND DATE(?)
+            ''', (start_date, end_date))
+            return cursor.fetchone()
+    
+    @staticmethod
+    def get_top_products(start_date, end_date, limit=10):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT p.name as product_name, SUM(d.quantity) as quantity, SUM(d.revenue) as revenue
+                FROM daily_product_sales d
+                JOIN product p ON d.product_id = p.id
+                WHERE d.sale_date BETWEEN DATE(?) AND DATE(?)
+                GROUP BY p.name
+                ORDER BY revenue DESC
+                LIMIT ?
+            ''', (start_date, end_date, limit))
+            return cursor.fetchall()
 
 class OrderItem:
     @staticmethod
@@ -374,7 +657,9 @@ class OrderItem:
                 INSERT INTO order_item (order_id, product_id, quantity, price, notes, status)
                 VALUES (?, ?, ?, ?, ?, 'novo')
             ''', (order_id, product_id, quantity, price, notes))
-            return cursor.lastrowid
+            item_id = cursor.lastrowid
+            KdsEvent.create('item_created', order_id=order_id, item_id=item_id, status='novo')
+            return item_id
     
     @staticmethod
     def get_by_id(item_id):
@@ -395,6 +680,45 @@ class OrderItem:
             ''', (order_id,))
             return cursor.fetchall()
     
+    @staticmethod
+    def get_by_order_statuses(statuses, since=None):
+        """Itens (com dados do produto) de todos os pedidos nos status informados, em uma consulta.
+        
+        Com since, retorna os itens alterados depois do cursor e todos os itens dos pedidos
+        alterados depois dele.
+        """
+        if not statuses:
+            return []
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            placeholders = ','.join(['?' for _ in statuses])
+            if since is None:
+                cursor.execute(f'''
+                    SELECT oi.*, p.name as product_name, p.image_url as product_image, p.prep_section
+                    FROM "order" o
+                    JOIN order_item oi ON oi.order_id = o.id
+                    JOIN product p ON oi.product_id = p.id
+                    WHERE o.status IN ({placeholders})
+                    ORDER BY oi.order_id, oi.id
+                ''', statuses)
+            else:
+                cursor.execute(f'''
+                    SELECT oi.*, p.name as product_name, p.image_url as product_image, p.prep_section
+                    FROM order_item oi
+                    JOIN "order" o ON oi.order_id = o.id
+                    JOIN product p ON oi.product_id = p.id
+                    WHERE oi.change_seq > ? AND +o.status IN ({placeholders})
+                    UNION
+                    SELECT oi.*, p.name as product_name, p.image_url as product_image, p.prep_section
+                    FROM order_item oi
+                    JOIN product p ON oi.product_id = p.id
+                    WHERE oi.order_id IN (
+                        SELECT id FROM "order" WHERE change_seq > ? AND +status IN ({placeholders})
+                    )
+                    ORDER BY order_id, id
+                ''', [since, *statuses, since, *statuses])
+            return cursor.fetchall()
+    
     @staticmethod
     def update_status(item_id, status):
         timestamp_field = None
@@ -415,7 +739,11 @@ class OrderItem:
                 ''', (status, item_id))
             else:
                 cursor.execute('UPDATE order_item SET status = ? WHERE id = ?', (status, item_id))
-            return cursor.rowcount > 0
+            if cursor.rowcount == 0:
+                return False
+            cursor.execute('SELECT order_id FROM order_item WHERE id = ?', (item_id,))
+            KdsEvent.create('item_status', order_id=cursor.fetchone()['order_id'], item_id=item_id, status=status)
+            return True
     
     @staticmethod
     def get_prep_time(item_id):
@@ -434,8 +762,13 @@ class OrderItem:
     def delete(item_id):
         with get_db_connection() as conn:
             cursor = conn.cursor()
+            cursor.execute('SELECT order_id FROM order_item WHERE id = ?', (item_id,))
+            item = cursor.fetchone()
+            if not item:
+                return False
             cursor.execute('DELETE FROM order_item WHERE id = ?', (item_id,))
-            return cursor.rowcount > 0
+            KdsEvent.create('item_deleted', order_id=item['order_id'], item_id=item_id)
+            return True
 
 class Payment:
     @staticmethod
@@ -471,6 +804,49 @@ class Payment:
             cursor.execute(f'UPDATE payment SET {", ".join(fields)} WHERE id = ?', values)
             return cursor.rowcount > 0
 
+@dataclasses.dataclass(frozen=True)
+class SiteSettings:
+    """Configurações da loja com tipos já convertidos - instância imutável compartilhada pelo cache"""
+    id: Optional[int] = None
+    store_name: str = 'BurgerLoft'
+    logo_url: str = ''
+    phone: str = '(61) 9 9999-9999'
+    email: str = 'contato@meatzburger.com'
+    address: str = 'Av. Principal, 175 - Centro, Cidade - UF'
+    opening_hours: str = '11:00 - 23:00 (Todos os dias)'
+    whatsapp: str = '5561999999999'
+    instagram: str = ''
+    facebook: str = ''
+    tip_percentage: float = 10.0
+    enable_auto_tip: bool = False
+    store_zipcode: str = ''
+    delivery_radius_km: float = 5.0
+    enable_delivery: bool = True
+    delivery_fee: float = 5.0
+    store_latitude: Optional[float] = None
+    store_longitude: Optional[float] = None
+    store_city: Optional[str] = None
+    store_state: Optional[str] = None
+    updated_at: Optional[str] = None
+    
+    @classmethod
+    def from_row(cls, row):
+        keys = row.keys()
+        values = {}
+        for field in dataclasses.fields(cls):
+            if field.name not in keys or row[field.name] is None:
+                continue
+            value = row[field.name]
+            if isinstance(field.default, bool):
+                value = bool(value)
+            elif isinstance(field.default, float):
+                value = float(value)
+            values[field.name] = value
+        return cls(**values)
+    
+    def as_dict(self):
+        return dataclasses.asdict(self)
+
 class Settings:
     @staticmethod
     def create(**kwargs):
@@ -492,6 +868,7 @@ class Settings:
             fields = ', '.join(defaults.keys())
             placeholders = ', '.join(['?' for _ in defaults])
             cursor.execute(f'INSERT INTO settings ({fields}) VALUES ({placeholders})', list(defaults.values()))
+            settings_cache.invalidate()
             return cursor.lastrowid
     
     @staticmethod
@@ -501,6 +878,19 @@ class Settings:
             cursor.execute('SELECT * FROM settings LIMIT 1')
             return cursor.fetchone()
     
+    @staticmethod
+    def get_cached():
+        """Configurações tipadas (SiteSettings) servidas do cache do processo"""
+        return settings_cache.get('settings', Settings._load_typed)
+    
+    @staticmethod
+    def _load_typed():
+        row = Settings.get()
+        if row:
+            return SiteSettings.from_row(row)
+        # Sem linha de configurações: mesmo fallback que as páginas usavam antes do cache
+        return SiteSettings(phone='', email='', address='', opening_hours='')
+    
     @staticmethod
     def update(**kwargs):
         if 'updated_at' not in kwargs:
@@ -511,6 +901,7 @@ class Settings:
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(f'UPDATE settings SET {", ".join(fields)}', values)
+            settings_cache.invalidate()
             return cursor.rowcount > 0
     
     @staticmethod
@@ -661,3 +1052,67 @@ class Inventory:
                 WHERE ingredient_name = ?
             ''', (quantity_delta, ingredient_name))
             return cursor.rowcount > 0
+
+class KdsEvent:
+    TOMBSTONE_TYPES = ('order_deleted', 'item_deleted')
+    
+    @staticmethod
+    def create(event_type, order_id=None, item_id=None, status=None):
+        """Registra o evento e marca a linha alterada com o id dele (change_seq) na mesma transação"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO kds_event (event_type, order_id, item_id, status)
+                VALUES (?, ?, ?, ?)
+            ''', (event_type, order_id, item_id, status))
+            event_id = cursor.lastrowid
+            if item_id is not None:
+                cursor.execute('UPDATE order_item SET change_seq = ? WHERE id = ?', (event_id, item_id))
+            elif order_id is not None:
+                cursor.execute('UPDATE "order" SET change_seq = ? WHERE id = ?', (event_id, order_id))
+        # Os streams SSE só são acordados depois que a transação do pedido for confirmada
+        after_commit(lambda: kds_events.publish(event_id))
+        return event_id
+    
+    @staticmethod
+    def get_since(last_id, limit=500):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM kds_event WHERE id > ? ORDER BY id LIMIT ?', (last_id, limit))
+            return cursor.fetchall()
+    
+    @staticmethod
+    def get_last_id():
+        """Último id emitido - lido de sqlite_sequence para continuar crescente mesmo após o prune"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'kds_event'), 0) as last_id
+            ''')
+            return cursor.fetchone()['last_id']
+    
+    @staticmethod
+    def get_first_id():
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COALESCE(MIN(id), 0) as first_id FROM kds_event')
+            return cursor.fetchone()['first_id']
+    
+    @staticmethod
+    def get_tombstones_since(last_id):
+        """Pedidos e itens excluídos depois do cursor last_id"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            placeholders = ','.join(['?' for _ in KdsEvent.TOMBSTONE_TYPES])
+            cursor.execute(f'''
+                SELECT DISTINCT event_type, order_id, item_id FROM kds_event
+                WHERE id > ? AND event_type IN ({placeholders})
+            ''', [last_id, *KdsEvent.TOMBSTONE_TYPES])
+            return cursor.fetchall()
+    
+    @staticmethod
+    def prune(max_age_hours=24):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM kds_event WHERE created_at < datetime('now', ?)", (f'-{max_age_hours} hours',))
+            return cursor.rowcount
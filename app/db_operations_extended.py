@@ -1,4 +1,5 @@
-from app.database import get_db_connection
+from app.database import get_db_connection, transaction
+from app.cache import images_cache
 from datetime import datetime
 import json
 
@@ -288,6 +289,18 @@ class AuditLog:
             ''', (user_id, action, entity_type, entity_id, old_json, new_json, ip_address, user_agent))
             return cursor.lastrowid
     
+    @staticmethod
+    def create_many(entries):
+        """Grava um lote de registros (tuplas na ordem das colunas abaixo) com um único executemany"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT INTO audit_log (user_id, action, entity_type, entity_id, old_values, new_values,
+                                       ip_address, user_agent, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', entries)
+            return cursor.rowcount
+    
     @staticmethod
     def get_recent(limit=100):
         with get_db_connection() as conn:
@@ -640,3 +653,239 @@ class ReportExport:
             cursor = conn.cursor()
             cursor.execute('UPDATE report_export SET status = "completed", file_path = ?, completed_at = CURRENT_TIMESTAMP WHERE id = ?', (file_path, export_id))
             return cursor.rowcount > 0
+    
+    @staticmethod
+    def get_by_id(export_id):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM report_export WHERE id = ?', (export_id,))
+            return cursor.fetchone()
+    
+    @staticmethod
+    def get_recent(limit=20):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT re.*, u.username
+                FROM report_export re
+                LEFT JOIN user u ON re.generated_by = u.id
+                ORDER BY re.id DESC
+                LIMIT ?
+            ''', (limit,))
+            return cursor.fetchall()
+    
+    @staticmethod
+    def get_pending_ids():
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM report_export WHERE status = 'pending' ORDER BY created_at")
+            return [row['id'] for row in cursor.fetchall()]
+    
+    @staticmethod
+    def claim(export_id, stale_seconds):
+        """Marca a exportação como em processamento; retorna False se ela já foi concluída
+        ou se outro worker a processa há menos de stale_seconds.
+        
+        Exportações que falharam ou ficaram em 'processing' (worker morto no meio) são retomadas.
+        """
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE report_export SET status = 'processing', started_at = CURRENT_TIMESTAMP, rows_written = 0,
+                    error = NULL, completed_at = NULL
+                WHERE id = ? AND (status IN ('pending', 'failed')
+                                  OR (status = 'processing' AND started_at < DATETIME('now', ?)))
+            ''', (export_id, f'-{int(stale_seconds)} seconds'))
+            return cursor.rowcount > 0
+    
+    @staticmethod
+    def update_progress(export_id, rows_written, total_rows=None):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE report_export SET rows_written = ?, total_rows = COALESCE(?, total_rows)
+                WHERE id = ?
+            ''', (rows_written, total_rows, export_id))
+    
+    @staticmethod
+    def fail(export_id, error):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE report_export SET status = 'failed', error = ?, completed_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (error, export_id))
+
+class ImageAsset:
+    @staticmethod
+    def get_by_url(source_url):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM image_asset WHERE source_url = ?', (source_url,))
+            return cursor.fetchone()
+    
+    @staticmethod
+    def get_ready_map():
+        """Mapa source_url -> dados das variantes locais, para as imagens já processadas"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM image_asset WHERE status = 'pronto'")
+            return {row['source_url']: {'content_hash': row['content_hash'],
+                                        'original_name': row['original_name'],
+                                        'variants': json.loads(row['variants'] or '{}')}
+                    for row in cursor.fetchall()}
+    
+    @staticmethod
+    def save(source_url, **kwargs):
+        fields = list(kwargs.keys())
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                INSERT INTO image_asset (source_url, {", ".join(fields)})
+                VALUES (?, {", ".join(["?" for _ in fields])})
+                ON CONFLICT(source_url) DO UPDATE SET
+                    {", ".join(f"{key} = excluded.{key}" for key in fields)},
+                    updated_at = CURRENT_TIMESTAMP
+            ''', [source_url] + list(kwargs.values()))
+            images_cache.invalidate()
+            return cursor.rowcount > 0
+    
+    @staticmethod
+    def get_pending_urls():
+        """URLs de imagens de produtos e categorias que ainda não foram processadas"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT image_url FROM product WHERE image_url LIKE 'http%'
+                UNION
+                SELECT image_url FROM category WHERE image_url LIKE 'http%'
+                EXCEPT
+                SELECT source_url FROM image_asset WHERE status = 'pronto'
+            ''')
+            return [row['image_url'] for row in cursor.fetchall()]
+
+class Job:
+    @staticmethod
+    def create(name, payload=None, priority=0, delay=0, max_attempts=3):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO job (name, payload, priority, max_attempts, run_at)
+                VALUES (?, ?, ?, ?, DATETIME('now', ?))
+            ''', (name, json.dumps(payload) if payload is not None else None, priority, max_attempts,
+                  f'+{int(delay)} seconds'))
+            return cursor.lastrowid
+    
+    @staticmethod
+    def get_by_id(job_id):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM job WHERE id = ?', (job_id,))
+            return cursor.fetchone()
+    
+    @staticmethod
+    def has_due():
+        """Leitura barata usada pelos workers ociosos antes de abrir a transação de reserva"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM job WHERE status = 'pending' AND run_at <= CURRENT_TIMESTAMP LIMIT 1")
+            return cursor.fetchone() is not None
+    
+    @staticmethod
+    def claim_next(worker_id):
+        """Reserva a próxima tarefa vencida (maior prioridade primeiro) para este worker"""
+        with transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id FROM job
+                WHERE status = 'pending' AND run_at <= CURRENT_TIMESTAMP
+                ORDER BY priority DESC, run_at, id
+                LIMIT 1
+            ''')
+            row = cursor.fetchone()
+            if not row:
+                return None
+            cursor.execute('''
+                UPDATE job SET status = 'running', attempts = attempts + 1,
+                    locked_by = ?, locked_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (worker_id, row['id']))
+            cursor.execute('SELECT * FROM job WHERE id = ?', (row['id'],))
+            return cursor.fetchone()
+    
+    @staticmethod
+    def complete(job_id):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE job SET status = 'completed', locked_by = NULL, finished_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (job_id,))
+    
+    @staticmethod
+    def retry(job_id, delay, error):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE job SET status = 'pending', locked_by = NULL, last_error = ?,
+                    run_at = DATETIME('now', ?)
+                WHERE id = ?
+            ''', (error, f'+{int(delay)} seconds', job_id))
+    
+    @staticmethod
+    def fail(job_id, error):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE job SET status = 'failed', locked_by = NULL, last_error = ?, finished_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (error, job_id))
+    
+    @staticmethod
+    def touch(job_id, worker_id):
+        """Heartbeat: renova locked_at enquanto o mesmo worker ainda detém a tarefa"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE job SET locked_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'running' AND locked_by = ?
+            ''', (job_id, worker_id))
+            return cursor.rowcount > 0
+    
+    @staticmethod
+    def requeue_stale(timeout_seconds):
+        """Tarefas em 'running' sem heartbeat há timeout_seconds (worker encerrado no meio da execução).
+        
+        Voltam para a fila se ainda têm tentativas; as que já usaram max_attempts viram 'failed'.
+        Retorna (devolvidas, falhas).
+        """
+        cutoff = f'-{int(timeout_seconds)} seconds'
+        error = 'Worker encerrado durante a execução (sem heartbeat)'
+        with transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE job SET status = 'failed', locked_by = NULL, last_error = ?, finished_at = CURRENT_TIMESTAMP
+                WHERE status = 'running' AND locked_at < DATETIME('now', ?) AND attempts >= max_attempts
+            ''', (error, cutoff))
+            failed = cursor.rowcount
+            cursor.execute('''
+                UPDATE job SET status = 'pending', locked_by = NULL, last_error = ?
+                WHERE status = 'running' AND locked_at < DATETIME('now', ?)
+            ''', (error, cutoff))
+            return cursor.rowcount, failed
+    
+    @staticmethod
+    def prune(retention_hours):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                DELETE FROM job WHERE status = 'completed' AND finished_at < DATETIME('now', ?)
+            ''', (f'-{int(retention_hours)} hours',))
+            return cursor.rowcount
+    
+    @staticmethod
+    def count_by_status():
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT status, COUNT(*) as count FROM job GROUP BY status')
+            return {row['status']: row['count'] for row in cursor.fetchall()}
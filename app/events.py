@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+import time
+
+STREAM_POLL_INTERVAL = float(os.getenv('KDS_STREAM_POLL_INTERVAL', '0.5'))
+# Heartbeat curto: uma conexão abandonada só é percebida na próxima escrita e até lá prende uma thread
+STREAM_HEARTBEAT = float(os.getenv('KDS_STREAM_HEARTBEAT', '5'))
+STREAM_MAX_SECONDS = float(os.getenv('KDS_STREAM_MAX_SECONDS', '300'))
+STREAM_RETRY_MS = int(os.getenv('KDS_STREAM_RETRY_MS', '2000'))
+# Streams abertos por processo; acima disso o KDS volta ao polling e as threads ficam para o PDV e o site
+STREAM_MAX_PER_WORKER = int(os.getenv('KDS_STREAM_MAX_PER_WORKER', '3'))
+# Expurgo do log feito pela manutenção dos workers de tarefas (app.jobs), com ou sem streams abertos
+EVENT_RETENTION_HOURS = int(os.getenv('KDS_EVENT_RETENTION_HOURS', '24'))
+
+class EventBroadcaster:
+    """Acorda os streams SSE do KDS quando surgem novos eventos no log kds_event.
+    
+    Commits feitos neste processo publicam o evento na hora; commits de outros
+    workers do gunicorn são percebidos por uma única thread por processo, que
+    consulta o último id do log enquanto houver streams conectados.
+    """
+    
+    def __init__(self, poll_interval=STREAM_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.last_id = 0
+        self.subscribers = 0
+        self._cond = threading.Condition()
+        self._poller = None
+        self._pid = None
+    
+    def publish(self, event_id):
+        with self._cond:
+            if event_id > self.last_id:
+                self.last_id = event_id
+                self._cond.notify_all()
+    
+    def wait_for(self, after_id, timeout):
+        """Bloqueia até existir evento com id maior que after_id ou até o timeout"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.last_id <= after_id:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self.last_id
+    
+    def reserve(self, limit=STREAM_MAX_PER_WORKER):
+        """Ocupa uma vaga de stream neste processo; False se já há 'limit' streams abertos"""
+        self._ensure_poller()
+        with self._cond:
+            if self.subscribers >= limit:
+                return False
+            self.subscribers += 1
+            return True
+    
+    def release(self):
+        with self._cond:
+            self.subscribers = max(0, self.subscribers - 1)
+    
+    def _ensure_poller(self):
+        with self._cond:
+            if self._poller is not None and self._poller.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._poller = threading.Thread(target=self._poll_loop, name='kds-event-poller', daemon=True)
+            self._poller.start()
+    
+    def _poll_loop(self):
+        from app.db_operations import KdsEvent
+        
+        while True:
+            if self.subscribers:
+                try:
+                    self.publish(KdsEvent.get_last_id())
+                except Exception as e:
+                    print(f'⚠️  Erro ao consultar eventos do KDS: {e}')
+            time.sleep(self.poll_interval)
+
+kds_events = EventBroadcaster()
+
+def format_sse(event):
+    data = {
+        'id': event['id'],
+        'type': event['event_type'],
+        'order_id': event['order_id'],
+        'item_id': event['item_id'],
+        'status': event['status'],
+        'created_at': event['created_at']
+    }
+    return f"id: {event['id']}\nevent: {event['event_type']}\ndata: {json.dumps(data)}\n\n"
+
+def stream_kds_events(last_id):
+    """Gerador SSE: envia os eventos posteriores a last_id e mantém a conexão com heartbeats.
+    
+    A conexão é encerrada após STREAM_MAX_SECONDS; o EventSource reconecta sozinho
+    enviando o Last-Event-ID, sem perder eventos. A vaga do stream (kds_events.reserve)
+    é reservada e liberada pela rota.
+    """
+    from app.db_operations import KdsEvent
+    
+    started = time.monotonic()
+    last_sent = started
+    yield f'retry: {STREAM_RETRY_MS}\n\n'
+    
+    check_log = True
+    while time.monotonic() - started < STREAM_MAX_SECONDS:
+        if check_log:
+            events = KdsEvent.get_since(last_id)
+            for event in events:
+                last_id = event['id']
+                yield format_sse(event)
+            if events:
+                last_sent = time.monotonic()
+                continue
+        
+        if time.monotonic() - last_sent >= STREAM_HEARTBEAT:
+            last_sent = time.monotonic()
+            yield ': ping\n\n'
+        
+        remaining = STREAM_MAX_SECONDS - (time.monotonic() - started)
+        timeout = max(0.0, min(STREAM_HEARTBEAT - (time.monotonic() - last_sent), remaining))
+        check_log = kds_events.wait_for(last_id, timeout) > last_id
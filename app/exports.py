@@ -0,0 +1,219 @@
+import csv
+import json
+import os
+import re
+import zipfile
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+
+from app.database import get_db_path, read_connection
+from app.db_operations_extended import ReportExport
+from app.jobs import JOB_LOCK_TIMEOUT, enqueue, job_handler
+
+EXPORTS_DIR = os.getenv('EXPORTS_DIR') or os.path.join(os.path.dirname(get_db_path()), 'exports')
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+EXPORT_PROGRESS_EVERY = int(os.getenv('EXPORT_PROGRESS_EVERY', '5000'))
+# Exportação em 'processing' há mais que isso é de um worker que morreu: a tarefa reenfileirada a retoma
+EXPORT_STALE_SECONDS = int(os.getenv('EXPORT_STALE_SECONDS', str(JOB_LOCK_TIMEOUT)))
+
+FORMATS = {'csv': 'text/csv', 'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'}
+
+# Relatórios exportáveis: colunas do arquivo e a consulta (FROM/WHERE com intervalo de datas)
+REPORTS = {
+    'orders': {
+        'label': 'Pedidos',
+        'columns': ['Pedido', 'Data', 'Status', 'Tipo', 'Mesa', 'Cliente', 'Pagamento', 'Total', 'Taxa de entrega', 'Gorjeta'],
+        'select': '''o.id, o.created_at, o.status, o.order_type, t.number, c.name, o.payment_method,
+                     o.total, o.delivery_fee, o.tip_amount''',
+        'from': '''"order" o
+                   LEFT JOIN "table" t ON o.table_id = t.id
+                   LEFT JOIN customer c ON o.customer_id = c.id''',
+        'date_column': 'o.created_at',
+        'status_column': 'o.status',
+        'order_by': 'o.created_at, o.id'
+    },
+    'order_items': {
+        'label': 'Itens vendidos',
+        'columns': ['Pedido', 'Data', 'Status do pedido', 'Produto', 'Quantidade', 'Preço unitário', 'Subtotal'],
+        'select': 'o.id, o.created_at, o.status, p.name, oi.quantity, oi.price, oi.quantity * oi.price',
+        'from': '''"order" o
+                   JOIN order_item oi ON oi.order_id = o.id
+                   LEFT JOIN product p ON oi.product_id = p.id''',
+        'date_column': 'o.created_at',
+        'status_column': 'o.status',
+        'order_by': 'o.created_at, o.id, oi.id'
+    },
+    'daily_sales': {
+        'label': 'Vendas por dia',
+        'columns': ['Dia', 'Pedidos pagos', 'Faturamento'],
+        'select': 'sale_date, orders_count, revenue',
+        'from': 'daily_sales',
+        'date_column': 'sale_date',
+        'status_column': None,
+        'order_by': 'sale_date'
+    }
+}
+
+def build_query(report_type, parameters):
+    """Monta (sql, sql de contagem, argumentos) do relatório para o intervalo informado"""
+    report = REPORTS[report_type]
+    where = []
+    args = []
+    if parameters.get('start_date'):
+        where.append(f"{report['date_column']} >= DATE(?)")
+        args.append(parameters['start_date'])
+    if parameters.get('end_date'):
+        where.append(f"{report['date_column']} < DATE(?, '+1 day')")
+        args.append(parameters['end_date'])
+    if parameters.get('status') and report['status_column']:
+        where.append(f"{report['status_column']} = ?")
+        args.append(parameters['status'])
+    
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ''
+    sql = f"SELECT {report['select']} FROM {report['from']} {where_sql} ORDER BY {report['order_by']}"
+    count_sql = f"SELECT COUNT(*) FROM {report['from']} {where_sql}"
+    return sql, count_sql, args
+
+def _stream_rows(cursor, export_id, total_rows):
+    """Percorre o cursor em lotes (memória constante) registrando o progresso periodicamente"""
+    written = 0
+    while True:
+        batch = cursor.fetchmany(EXPORT_BATCH_SIZE)
+        if not batch:
+            break
+        for row in batch:
+            yield tuple(row)
+            written += 1
+            if written % EXPORT_PROGRESS_EVERY == 0:
+                ReportExport.update_progress(export_id, written)
+    ReportExport.update_progress(export_id, written, total_rows=max(written, total_rows))
+
+def write_csv(path, columns, rows):
+    # utf-8-sig: o Excel reconhece a acentuação ao abrir o CSV
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_INVALID_XML_CHARS.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Relatorio" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>')
+}
+
+def write_xlsx(path, columns, rows):
+    """XLSX mínimo (uma planilha, strings inline) gravado em streaming direto no zip"""
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, content in XLSX_STATIC_PARTS.items():
+            zf.writestr(name, content)
+        with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            sheet.write(('<row>' + ''.join(_xlsx_cell(c) for c in columns) + '</row>').encode('utf-8'))
+            for row in rows:
+                sheet.write(('<row>' + ''.join(_xlsx_cell(v) for v in row) + '</row>').encode('utf-8'))
+            sheet.write(b'</sheetData></worksheet>')
+
+WRITERS = {'csv': write_csv, 'xlsx': write_xlsx}
+
+# Duas tentativas: a segunda retoma a exportação se o worker morrer ou a primeira falhar
+@job_handler('report_export', max_attempts=2)
+def run_export(export_id):
+    """Gera o arquivo de uma exportação; retorna o nome do arquivo ou None se não havia o que fazer.
+    
+    Erros marcam a exportação como falha e são propagados para a tarefa registrar a falha.
+    """
+    if not ReportExport.claim(export_id, EXPORT_STALE_SECONDS):
+        return None
+    export = ReportExport.get_by_id(export_id)
+    tmp_path = None
+    try:
+        if export['report_type'] not in REPORTS or export['format'] not in WRITERS:
+            raise ValueError(f"Relatório ou formato inválido: {export['report_type']}/{export['format']}")
+        
+        parameters = json.loads(export['parameters'] or '{}')
+        sql, count_sql, args = build_query(export['report_type'], parameters)
+        filename = f"{export['report_type']}-{export_id}-{datetime.now():%Y%m%d-%H%M%S}.{export['format']}"
+        path = os.path.join(EXPORTS_DIR, filename)
+        os.makedirs(EXPORTS_DIR, exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        
+        with read_connection() as conn:
+            total_rows = conn.execute(count_sql, args).fetchone()[0]
+            ReportExport.update_progress(export_id, 0, total_rows=total_rows)
+            cursor = conn.execute(sql, args)
+            WRITERS[export['format']](tmp_path, REPORTS[export['report_type']]['columns'],
+                                      _stream_rows(cursor, export_id, total_rows))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        ReportExport.fail(export_id, str(e)[:500])
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    
+    ReportExport.complete(export_id, filename)
+    return filename
+
+def queue_export(report_type, format, parameters, generated_by=None):
+    """Registra a exportação e enfileira a geração do arquivo na fila de tarefas"""
+    export_id = ReportExport.create(report_type, format, parameters, generated_by)
+    enqueue('report_export', {'export_id': export_id})
+    return export_id
+
+def default_period(days=30):
+    end_date = datetime.now().date()
+    return (end_date - timedelta(days=days)).isoformat(), end_date.isoformat()
+
+def export_progress(export):
+    """Dados de progresso para a tela de exportações (JSON)"""
+    total = export['total_rows']
+    written = export['rows_written'] or 0
+    if export['status'] == 'completed':
+        percent = 100
+    elif total:
+        percent = min(99, int(written * 100 / total))
+    else:
+        percent = 0
+    return {
+        'id': export['id'],
+        'status': export['status'],
+        'rows_written': written,
+        'total_rows': total,
+        'percent': percent,
+        'error': export['error'],
+        'file_path': export['file_path']
+    }
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from markupsafe import Markup
+
+from app.database import get_db_path
+from app.cache import catalog_cache, settings_cache, images_cache
+
+FRAGMENT_CACHE_PATH = os.getenv('FRAGMENT_CACHE_PATH') or os.path.join(os.path.dirname(get_db_path()), 'fragment_cache.db')
+FRAGMENT_CACHE_SIZE = int(os.getenv('FRAGMENT_CACHE_SIZE', '2048'))
+FRAGMENT_MAX_AGE_DAYS = int(os.getenv('FRAGMENT_MAX_AGE_DAYS', '7'))
+FRAGMENT_CACHE_ENABLED = os.getenv('FRAGMENT_CACHE_ENABLED', '1') == '1'
+PRUNE_INTERVAL = 3600
+
+# Versões que um fragmento pode declarar como dependência, além do conteúdo passado em deps
+VERSIONED_CACHES = {'catalog': catalog_cache, 'settings': settings_cache, 'images': images_cache}
+
+def _dep_key(dep):
+    """Representação estável de uma dependência (sqlite3.Row, dict, lista ou valor simples)"""
+    if isinstance(dep, sqlite3.Row):
+        return repr(tuple(zip(dep.keys(), tuple(dep))))
+    if isinstance(dep, dict):
+        return repr(sorted(dep.items()))
+    if isinstance(dep, (list, tuple)):
+        return '[' + ','.join(_dep_key(d) for d in dep) + ']'
+    return repr(dep)
+
+class FragmentCache:
+    """Cache de HTML renderizado em duas camadas: LRU em memória na frente e um arquivo
+    SQLite compartilhado entre os workers atrás.
+    
+    As chaves são endereçadas pelo conteúdo (nome + dependências + versões + fingerprint
+    dos templates), então nunca é preciso invalidar: quando um produto muda, só a chave
+    do card dele muda. Entradas antigas são removidas do disco periodicamente.
+    """
+    
+    def __init__(self, path=FRAGMENT_CACHE_PATH, max_size=FRAGMENT_CACHE_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self.fingerprint = ''
+        self.counters = {}
+        self._entries = OrderedDict()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pruned_at = 0
+    
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS fragment (
+                key TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                html TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_fragment_created ON fragment(created_at)')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+    
+    def _count(self, name, kind):
+        with self._lock:
+            counter = self.counters.setdefault(name, {'memory': 0, 'disk': 0, 'miss': 0})
+            counter[kind] += 1
+    
+    def make_key(self, name, deps, versions):
+        parts = [name, self.fingerprint, _dep_key(list(deps))]
+        parts += [f'{v}={VERSIONED_CACHES[v].version()}' for v in sorted(set(versions) | {'images'})]
+        return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+    
+    def get(self, key, name):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+        if html is not None:
+            self._count(name, 'memory')
+            return html
+        
+        try:
+            row = self._connect().execute('SELECT html FROM fragment WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error as e:
+            print(f'⚠️  Erro ao ler o cache de fragmentos: {e}')
+            row = None
+        if row is None:
+            return None
+        self._count(name, 'disk')
+        self._remember(key, row[0])
+        return row[0]
+    
+    def set(self, key, name, html):
+        self._remember(key, html)
+        try:
+            conn = self._connect()
+            conn.execute('INSERT OR REPLACE INTO fragment (key, name, html, created_at) VALUES (?, ?, ?, ?)',
+                         (key, name, html, time.time()))
+            self._maybe_prune(conn)
+        except sqlite3.Error as e:
+            print(f'⚠️  Erro ao gravar o cache de fragmentos: {e}')
+    
+    def _remember(self, key, html):
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def _maybe_prune(self, conn):
+        now = time.monotonic()
+        if now - self._pruned_at < PRUNE_INTERVAL:
+            return
+        self._pruned_at = now
+        conn.execute('DELETE FROM fragment WHERE created_at < ?', (time.time() - FRAGMENT_MAX_AGE_DAYS * 86400,))
+    
+    def render(self, name, deps, versions, caller):
+        if not FRAGMENT_CACHE_ENABLED:
+            return caller()
+        key = self.make_key(name, deps, versions)
+        html = self.get(key, name)
+        if html is None:
+            self._count(name, 'miss')
+            html = str(caller())
+            self.set(key, name, html)
+        return Markup(html)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self._connect().execute('DELETE FROM fragment')
+    
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'fragments': {name: dict(c) for name, c in self.counters.items()}}
+
+fragment_cache = FragmentCache()
+
+def cached_fragment(name, *deps, versions=(), caller=None):
+    """Uso no template: {% call cached_fragment('product_card', product) %}...{% endcall %}
+    
+    deps são os dados que o trecho usa (ex.: a linha do produto); versions lista caches
+    versionados ('catalog', 'settings') dos quais o trecho depende como um todo.
+    """
+    return fragment_cache.render(name, deps, versions, caller)
+
+def templates_fingerprint(template_folder):
+    """Hash do código de todos os templates: um deploy com templates novos não reaproveita HTML antigo"""
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(template_folder):
+        dirs.sort()
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            digest.update(os.path.relpath(path, template_folder).encode('utf-8'))
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+def init_app(app):
+    fragment_cache.fingerprint = templates_fingerprint(os.path.join(app.root_path, app.template_folder))
+    app.jinja_env.globals['cached_fragment'] = cached_fragment
@@ -1,4 +1,3 @@
-import requests
 from math import radians, cos, sin, asin, sqrt
 
 def get_coordinates_from_zipcode(zipcode):
@@ -6,6 +5,9 @@ def get_coordinates_from_zipcode(zipcode):
     Busca coordenadas (latitude, longitude) a partir de um CEP brasileiro usando ViaCEP e Nominatim
     Retorna: {'lat': float, 'lng': float, 'address': str, 'city': str, 'state': str} ou None
     """
+    # requests só é importado quando há consulta de CEP (não pesa no boot dos workers)
+    import requests
+    
     zipcode_clean = zipcode.replace('-', '').replace('.', '').strip()
     
     if len(zipcode_clean) != 8:
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+from functools import wraps
+
+from flask import request, make_response
+
+# Respostas dinâmicas sem política explícita continuam sem cache (carrinho, sessão, admin)
+DEFAULT_POLICY = 'no-cache, no-store, must-revalidate, private, max-age=0'
+# Revalida sempre, mas permite 304: o corpo só trafega quando muda
+REVALIDATE_POLICY = 'private, no-cache'
+
+def cache_control(policy=REVALIDATE_POLICY, etag=True):
+    """Decorator de rota: aplica o Cache-Control informado e, com etag=True, gera um
+    ETag forte do corpo (se a rota não definiu um) e responde 304 a If-None-Match"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response = make_response(view(*args, **kwargs))
+            response.headers['Cache-Control'] = policy
+            if etag and request.method in ('GET', 'HEAD') and response.status_code == 200:
+                if not response.get_etag()[0]:
+                    response.add_etag()
+                response.make_conditional(request)
+            return response
+        return wrapper
+    return decorator
+
+def payload_etag(payload):
+    """ETag de um payload JSON - para rotas que incluem campos voláteis (ex.: timestamp) na resposta"""
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+_static_versions = {}
+
+def static_version(static_folder, filename):
+    """Versão (mtime) do arquivo estático, usada como ?v= para permitir cache imutável"""
+    version = _static_versions.get(filename)
+    if version is None:
+        try:
+            version = int(os.stat(os.path.join(static_folder, filename)).st_mtime)
+        except OSError:
+            version = 0
+        _static_versions[filename] = version
+    return version
+
+def init_app(app):
+    static_max_age = app.config.get('SEND_FILE_MAX_AGE_DEFAULT') or 31536000
+    
+    @app.url_defaults
+    def add_static_version(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            values['v'] = static_version(app.static_folder, values['filename'])
+    
+    @app.after_request
+    def apply_cache_policy(response):
+        if request.endpoint == 'static' and response.status_code in (200, 304):
+            response.cache_control.public = True
+            response.cache_control.max_age = static_max_age
+            # A URL muda junto com o arquivo (?v=), então o conteúdo de uma URL nunca muda
+            if request.args.get('v'):
+                response.cache_control.immutable = True
+        elif 'Cache-Control' not in response.headers:
+            response.headers['Cache-Control'] = DEFAULT_POLICY
+            response.headers['Pragma'] = 'no-cache'
+            response.headers['Expires'] = '0'
+        return response
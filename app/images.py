@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Blueprint, request, send_from_directory, url_for, abort
+from markupsafe import Markup, escape
+
+from app.database import get_db_path
+from app.cache import images_cache
+from app.db_operations_extended import ImageAsset
+from app.jobs import enqueue, job_handler, PRIORITY_LOW
+
+IMAGES_DIR = os.getenv('IMAGES_DIR') or os.path.join(os.path.dirname(get_db_path()), 'images')
+THUMB_WIDTHS = [int(w) for w in os.getenv('IMAGE_THUMB_WIDTHS', '160,320,480,800').split(',')]
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', '2'))
+DOWNLOAD_TIMEOUT = float(os.getenv('IMAGE_DOWNLOAD_TIMEOUT', '15'))
+MAX_DOWNLOAD_BYTES = 10 * 1024 * 1024
+IMAGE_MAX_AGE = 31536000
+
+# Ordem de preferência na negociação com o header Accept
+FORMATS = [('avif', 'image/avif', {'quality': 50}), ('webp', 'image/webp', {'quality': 80, 'method': 6})]
+ORIGINAL_EXTENSIONS = {'image/jpeg': '.jpg', 'image/png': '.png', 'image/webp': '.webp', 'image/gif': '.gif'}
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """Pool de threads para gerar miniaturas (o encoder do Pillow libera o GIL)"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix='image-worker')
+            _executor_pid = os.getpid()
+        return _executor
+
+def supported_formats():
+    # Pillow é importado só quando há imagem para processar, não no boot
+    try:
+        from PIL import features
+    except ImportError:
+        return []
+    return [fmt for fmt in FORMATS if features.check(fmt[0])]
+
+def _download(url):
+    import requests
+    
+    if not url.startswith(('http://', 'https://')):
+        raise ValueError('URL de imagem deve ser http(s)')
+    response = requests.get(url, timeout=DOWNLOAD_TIMEOUT, stream=True)
+    response.raise_for_status()
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+    if content_type not in ORIGINAL_EXTENSIONS:
+        raise ValueError(f'Tipo de conteúdo não suportado: {content_type or "desconhecido"}')
+    data = b''
+    for chunk in response.iter_content(64 * 1024):
+        data += chunk
+        if len(data) > MAX_DOWNLOAD_BYTES:
+            raise ValueError('Imagem maior que o limite de 10 MB')
+    return data, ORIGINAL_EXTENSIONS[content_type]
+
+def _write_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp-{os.getpid()}-{threading.get_ident()}'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _make_thumbnail(original_path, content_hash, width, fmt, options):
+    target = os.path.join(IMAGES_DIR, 'thumbs', f'{content_hash}-{width}.{fmt}')
+    if os.path.exists(target):
+        return
+    from PIL import Image
+    
+    with Image.open(original_path) as img:
+        img = img.convert('RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        height = round(img.height * width / img.width)
+        img = img.resize((width, height), Image.LANCZOS)
+        tmp_path = f'{target}.tmp-{os.getpid()}-{threading.get_ident()}'
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        img.save(tmp_path, format=fmt.upper(), **options)
+    os.replace(tmp_path, target)
+
+def _build_variants(original_path, content_hash):
+    """Gera as miniaturas (larguras x formatos) em paralelo; retorna dimensões e variantes"""
+    formats = supported_formats()
+    if not formats:
+        return None, None, {}
+    
+    from PIL import Image
+    
+    with Image.open(original_path) as img:
+        width, height = img.size
+    widths = [w for w in THUMB_WIDTHS if w < width] + [min(width, max(THUMB_WIDTHS))]
+    widths = sorted(set(widths))
+    
+    executor = get_executor()
+    futures = [executor.submit(_make_thumbnail, original_path, content_hash, w, fmt, options)
+               for w in widths for fmt, _, options in formats]
+    for future in futures:
+        future.result()
+    return width, height, {fmt: widths for fmt, _, _ in formats}
+
+def ingest(url, force=False):
+    """Baixa a imagem uma única vez, guarda no disco local e gera as miniaturas responsivas"""
+    asset = ImageAsset.get_by_url(url)
+    if asset and asset['status'] == 'pronto' and not force:
+        return asset
+    
+    try:
+        data, ext = _download(url)
+        content_hash = hashlib.sha256(data).hexdigest()[:20]
+        original_name = f'{content_hash}{ext}'
+        original_path = os.path.join(IMAGES_DIR, 'originals', original_name)
+        if not os.path.exists(original_path):
+            _write_file(original_path, data)
+        width, height, variants = _build_variants(original_path, content_hash)
+    except Exception as e:
+        ImageAsset.save(url, status='erro', error=str(e)[:500])
+        print(f'⚠️  Erro ao processar imagem {url}: {e}')
+        return None
+    
+    ImageAsset.save(url, status='pronto', content_hash=content_hash, original_name=original_name,
+                    width=width, height=height, variants=json.dumps(variants), error=None)
+    return ImageAsset.get_by_url(url)
+
+@job_handler('image_ingest')
+def ingest_job(url, force=False):
+    # Falhas (rede, servidor de origem) voltam para a fila com backoff
+    if ingest(url, force=force) is None:
+        raise RuntimeError(f'Não foi possível processar a imagem {url}')
+
+def ingest_in_background(url):
+    """Enfileira a ingestão na fila de tarefas, sem atrasar a requisição do admin"""
+    if not url or not url.startswith(('http://', 'https://')):
+        return
+    enqueue('image_ingest', {'url': url}, priority=PRIORITY_LOW)
+
+def get_ready_assets():
+    """Mapa source_url -> asset pronto, servido do cache (invalidado a cada ingestão)"""
+    return images_cache.get('assets', ImageAsset.get_ready_map)
+
+def image_attrs(url, sizes='100vw'):
+    """Atributos src/srcset/sizes para um <img>: versão local quando a imagem já foi ingerida,
+    URL original enquanto isso"""
+    if not url:
+        return Markup('')
+    asset = get_ready_assets().get(url)
+    if asset is None:
+        return Markup(f'src="{escape(url)}"')
+    
+    widths = sorted({w for ws in asset['variants'].values() for w in ws})
+    if not widths:
+        src = url_for('images.original', filename=asset['original_name'])
+        return Markup(f'src="{escape(src)}"')
+    
+    srcset = ', '.join(f"{url_for('images.thumbnail', content_hash=asset['content_hash'], width=w)} {w}w"
+                       for w in widths)
+    default_width = max(w for w in widths if w <= 480) if widths[0] <= 480 else widths[0]
+    src = url_for('images.thumbnail', content_hash=asset['content_hash'], width=default_width)
+    return Markup(f'src="{escape(src)}" srcset="{escape(srcset)}" sizes="{escape(sizes)}"')
+
+images = Blueprint('images', __name__)
+
+def _immutable(response, vary=None):
+    response.cache_control.public = True
+    response.cache_control.max_age = IMAGE_MAX_AGE
+    response.cache_control.immutable = True
+    if vary:
+        response.vary.add(vary)
+    return response
+
+@images.route('/imagens/<content_hash>/<int:width>')
+def thumbnail(content_hash, width):
+    """Miniatura no melhor formato aceito pelo navegador (AVIF, WebP ou o original)"""
+    if not content_hash.isalnum():
+        abort(404)
+    # Só formatos anunciados explicitamente: "*/*" não garante suporte a AVIF/WebP
+    accepted = {value for value, quality in request.accept_mimetypes if quality > 0}
+    thumbs_dir = os.path.join(IMAGES_DIR, 'thumbs')
+    for fmt, mimetype, _ in FORMATS:
+        filename = f'{content_hash}-{width}.{fmt}'
+        if mimetype in accepted and os.path.exists(os.path.join(thumbs_dir, filename)):
+            return _immutable(send_from_directory(thumbs_dir, filename, mimetype=mimetype), vary='Accept')
+    
+    originals_dir = os.path.join(IMAGES_DIR, 'originals')
+    for ext in ORIGINAL_EXTENSIONS.values():
+        if os.path.exists(os.path.join(originals_dir, content_hash + ext)):
+            return _immutable(send_from_directory(originals_dir, content_hash + ext), vary='Accept')
+    abort(404)
+
+@images.route('/imagens/original/<filename>')
+def original(filename):
+    return _immutable(send_from_directory(os.path.join(IMAGES_DIR, 'originals'), filename))
+
+def init_app(app):
+    app.register_blueprint(images)
+    app.jinja_env.globals['image_attrs'] = image_attrs
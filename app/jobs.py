@@ -0,0 +1,208 @@
+import importlib
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from app.database import after_commit
+from app.db_operations_extended import Job
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+# 0 desliga os workers dentro do gunicorn (tarefas processadas por 'flask jobs-worker')
+JOB_WORKERS_IN_PROCESS = os.getenv('JOB_WORKERS_IN_PROCESS', '1') == '1'
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+JOB_BACKOFF_BASE = float(os.getenv('JOB_BACKOFF_BASE', '5'))
+JOB_BACKOFF_MAX = float(os.getenv('JOB_BACKOFF_MAX', '600'))
+# Tarefa sem heartbeat há JOB_LOCK_TIMEOUT segundos é de um worker que morreu
+JOB_LOCK_TIMEOUT = int(os.getenv('JOB_LOCK_TIMEOUT', '900'))
+JOB_HEARTBEAT_INTERVAL = float(os.getenv('JOB_HEARTBEAT_INTERVAL', '60'))
+JOB_RETENTION_HOURS = int(os.getenv('JOB_RETENTION_HOURS', '72'))
+MAINTENANCE_INTERVAL = 300
+
+# Prioridades usuais (maior executa primeiro)
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -10
+
+# Módulos que registram handlers; importados antes de os workers começarem
+HANDLER_MODULES = ['app.exports', 'app.images']
+
+_handlers = {}
+
+def job_handler(name, max_attempts=JOB_MAX_ATTEMPTS):
+    """Registra a função como handler da tarefa 'name'; ela recebe o payload como kwargs"""
+    def decorator(func):
+        _handlers[name] = (func, max_attempts)
+        return func
+    return decorator
+
+def enqueue(name, payload=None, priority=PRIORITY_NORMAL, delay=0):
+    """Grava a tarefa na transação corrente (durável junto com a escrita que a originou)
+    e acorda os workers locais após o commit"""
+    max_attempts = _handlers[name][1] if name in _handlers else JOB_MAX_ATTEMPTS
+    job_id = Job.create(name, payload, priority=priority, delay=delay, max_attempts=max_attempts)
+    after_commit(worker_pool.notify)
+    return job_id
+
+def backoff_delay(attempts):
+    return min(JOB_BACKOFF_MAX, JOB_BACKOFF_BASE * (2 ** max(0, attempts - 1)))
+
+def load_handlers():
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+
+@contextmanager
+def heartbeat(job, interval=JOB_HEARTBEAT_INTERVAL):
+    """Renova locked_at enquanto a tarefa roda: exportações longas não são tomadas como presas"""
+    stop = threading.Event()
+    
+    def beat():
+        while not stop.wait(interval):
+            try:
+                Job.touch(job['id'], job['locked_by'])
+            except Exception as e:
+                print(f"⚠️  Erro no heartbeat da tarefa #{job['id']}: {e}")
+    
+    thread = threading.Thread(target=beat, name=f"job-heartbeat-{job['id']}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+
+def execute(job, app=None):
+    """Executa uma tarefa já reservada, registrando sucesso, nova tentativa ou falha definitiva"""
+    handler = _handlers.get(job['name'])
+    if handler is None:
+        Job.fail(job['id'], f"Handler não registrado: {job['name']}")
+        return False
+    
+    payload = json.loads(job['payload']) if job['payload'] else {}
+    try:
+        with heartbeat(job):
+            if app is not None:
+                with app.app_context():
+                    handler[0](**payload)
+            else:
+                handler[0](**payload)
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'[:500]
+        if job['attempts'] < job['max_attempts']:
+            delay = backoff_delay(job['attempts'])
+            Job.retry(job['id'], delay, error)
+            print(f"⚠️  Tarefa {job['name']} #{job['id']} falhou (tentativa {job['attempts']}), nova tentativa em {delay:.0f}s: {e}")
+        else:
+            Job.fail(job['id'], error)
+            print(f"❌ Tarefa {job['name']} #{job['id']} falhou definitivamente: {e}")
+        return False
+    
+    Job.complete(job['id'])
+    return True
+
+class WorkerPool:
+    """Threads que consomem a tabela job.
+    
+    Tarefas enfileiradas neste processo acordam os workers na hora (notify após o commit);
+    as de outros processos são percebidas pela consulta periódica a cada JOB_POLL_INTERVAL.
+    """
+    
+    def __init__(self, size=JOB_WORKERS, poll_interval=JOB_POLL_INTERVAL):
+        self.size = size
+        self.poll_interval = poll_interval
+        self.app = None
+        self.processed = 0
+        self.failed = 0
+        self._threads = []
+        self._pid = None
+        self._stopping = False
+        self._cond = threading.Condition()
+        self._maintained_at = 0
+    
+    def start(self, app=None, size=None):
+        with self._cond:
+            if self._pid == os.getpid() and any(t.is_alive() for t in self._threads):
+                return
+            load_handlers()
+            self.app = app
+            self._pid = os.getpid()
+            self._stopping = False
+            self._threads = []
+            for i in range(size or self.size):
+                worker_id = f'{socket.gethostname()}:{os.getpid()}:{i}'
+                thread = threading.Thread(target=self._run, args=(worker_id,), name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+    
+    def notify(self):
+        with self._cond:
+            self._cond.notify()
+    
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+    
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+    
+    def run_once(self, worker_id):
+        """Processa uma tarefa vencida, se houver; retorna True se executou alguma"""
+        if not Job.has_due():
+            return False
+        job = Job.claim_next(worker_id)
+        if job is None:
+            return False
+        if execute(job, self.app):
+            self.processed += 1
+        else:
+            self.failed += 1
+        return True
+    
+    def _maintain(self):
+        now = time.monotonic()
+        if now - self._maintained_at < MAINTENANCE_INTERVAL:
+            return
+        self._maintained_at = now
+        requeued, failed = Job.requeue_stale(JOB_LOCK_TIMEOUT)
+        if requeued:
+            print(f'♻️  {requeued} tarefas presas devolvidas à fila')
+        if failed:
+            print(f'❌ {failed} tarefas presas sem tentativas restantes marcadas como falha')
+        Job.prune(JOB_RETENTION_HOURS)
+        
+        from app.db_operations import KdsEvent
+        from app.events import EVENT_RETENTION_HOURS
+        
+        KdsEvent.prune(EVENT_RETENTION_HOURS)
+    
+    def _run(self, worker_id):
+        while not self._stopping:
+            try:
+                self._maintain()
+                if self.run_once(worker_id):
+                    continue
+            except Exception as e:
+                print(f'⚠️  Erro no worker de tarefas {worker_id}: {e}')
+            with self._cond:
+                if not self._stopping:
+                    self._cond.wait(self.poll_interval)
+    
+    def stats(self):
+        return {'workers': sum(1 for t in self._threads if t.is_alive()), 'processed': self.processed,
+                'failed': self.failed}
+
+worker_pool = WorkerPool()
+
+def init_app(app):
+    if not JOB_WORKERS_IN_PROCESS:
+        return
+    
+    # Inicia na primeira requisição: comandos do CLI (flask ...) não sobem workers
+    @app.before_request
+    def start_job_workers():
+        if worker_pool._pid != os.getpid():
+            worker_pool.start(app)
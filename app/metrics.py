@@ -0,0 +1,404 @@
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, abort, current_app, g, request
+
+from app.database import after_commit, get_db_path
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+METRICS_DIR = os.getenv('METRICS_DIR') or os.path.join(os.path.dirname(get_db_path()), 'metrics')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+# Scrape com "Authorization: Bearer <token>"; sem token, /metrics só responde em debug a partir do localhost
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+WORKER_THREADS = int(os.getenv('GUNICORN_THREADS', '8'))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+KDS_QUANTILES = (0.5, 0.9, 0.99)
+ACTIVE_ORDER_STATUSES = ['pendente', 'preparando', 'pronto']
+
+# Tipo e descrição de cada métrica exposta (# TYPE / # HELP)
+FAMILIES = {
+    'meatz_http_requests_total': ('counter', 'Requisições atendidas por endpoint, método e status'),
+    'meatz_http_request_duration_seconds': ('histogram', 'Latência das requisições por endpoint'),
+    'meatz_db_queries_total': ('counter', 'Consultas SQL executadas por endpoint'),
+    'meatz_db_query_duration_seconds': ('histogram', 'Latência das consultas SQL (execução + leitura)'),
+    'meatz_cache_requests_total': ('counter', 'Leituras dos caches em memória por resultado (hit/miss)'),
+    'meatz_cache_hit_ratio': ('gauge', 'Fração de acertos de cada cache desde o início dos workers'),
+    'meatz_checkouts_total': ('counter', 'Pedidos fechados por canal (site, pdv)'),
+    'meatz_worker_busy_seconds_total': ('counter', 'Tempo somado das threads ocupadas com requisições'),
+    'meatz_worker_busy_threads': ('gauge', 'Threads do worker atendendo requisições agora'),
+    'meatz_worker_threads': ('gauge', 'Threads disponíveis no worker'),
+    'meatz_worker_utilization': ('gauge', 'Threads ocupadas / threads disponíveis (todos os workers)'),
+    'meatz_workers': ('gauge', 'Workers vivos que publicaram métricas'),
+    'meatz_orders_active': ('gauge', 'Pedidos ativos por status'),
+    'meatz_kds_ticket_age_seconds': ('summary', 'Idade dos pedidos no KDS por status'),
+}
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+class Registry:
+    """Contadores, histogramas e gauges do processo (worker do gunicorn).
+    
+    Os valores ficam em memória e uma thread os grava a cada METRICS_FLUSH_INTERVAL em
+    METRICS_DIR/worker-<pid>.json; o /metrics soma os arquivos de todos os workers.
+    Após um fork o registro recomeça do zero (o que o processo pai contou é dele).
+    """
+    
+    def __init__(self, flush_interval=METRICS_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.busy_threads = 0
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+        self._dirty = False
+    
+    def _ensure_process(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._counters = {}
+            self._histograms = {}
+            self.busy_threads = 0
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='metrics-flusher', daemon=True)
+            self._thread.start()
+    
+    def inc(self, name, labels=None, value=1):
+        self._ensure_process()
+        key = _key(name, labels or {})
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._dirty = True
+    
+    def observe(self, name, value, labels=None, buckets=LATENCY_BUCKETS):
+        self._ensure_process()
+        key = _key(name, labels or {})
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # [limites, contagem por faixa (+Inf no fim), soma, total]
+                histogram = self._histograms[key] = [buckets, [0] * (len(buckets) + 1), 0.0, 0]
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            histogram[1][index] += 1
+            histogram[2] += value
+            histogram[3] += 1
+            self._dirty = True
+    
+    def track_busy(self, delta):
+        self._ensure_process()
+        with self._lock:
+            self.busy_threads += delta
+            self._dirty = True
+    
+    def snapshot(self):
+        with self._lock:
+            counters = [[name, list(labels), value] for (name, labels), value in self._counters.items()]
+            histograms = [[name, list(labels), list(h[0]), list(h[1]), h[2], h[3]]
+                          for (name, labels), h in self._histograms.items()]
+            busy = self.busy_threads
+        counters.extend(_process_counters())
+        return {
+            'pid': os.getpid(),
+            'counters': counters,
+            'histograms': histograms,
+            'gauges': [['meatz_worker_busy_threads', [], busy], ['meatz_worker_threads', [], WORKER_THREADS]]
+        }
+    
+    def flush(self):
+        """Grava o estado do processo (escrita atômica); chamado pela thread e antes de cada scrape"""
+        if self._pid != os.getpid():
+            return
+        self._dirty = False
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f'worker-{os.getpid()}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+    
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            if self._pid != os.getpid():
+                return
+            try:
+                # Contadores de cache mudam sem passar por inc(): grava sempre que houve tráfego
+                if self._dirty or self.busy_threads:
+                    self.flush()
+            except Exception as e:
+                print(f'⚠️  Erro ao gravar métricas do worker: {e}')
+
+registry = Registry()
+
+def _process_counters():
+    """Contadores que os caches já mantêm (lidos na hora da gravação, sem custo no caminho quente)"""
+    from app.cache import catalog_cache, settings_cache, images_cache, user_cache
+    from app.fragments import fragment_cache
+    
+    counters = []
+    for cache in (catalog_cache, settings_cache, images_cache, user_cache):
+        counters.append(['meatz_cache_requests_total', [['cache', cache.name], ['result', 'hit']], cache.hits])
+        counters.append(['meatz_cache_requests_total', [['cache', cache.name], ['result', 'miss']], cache.misses])
+    hits = misses = 0
+    for counter in fragment_cache.counters.values():
+        hits += counter['memory'] + counter['disk']
+        misses += counter['miss']
+    counters.append(['meatz_cache_requests_total', [['cache', 'fragments'], ['result', 'hit']], hits])
+    counters.append(['meatz_cache_requests_total', [['cache', 'fragments'], ['result', 'miss']], misses])
+    return counters
+
+@contextmanager
+def _dir_lock():
+    """Serializa leitura e consolidação dos arquivos entre processos"""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    with open(os.path.join(METRICS_DIR, '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _merge(target, data):
+    """Soma contadores e histogramas de um arquivo em target ({chave: valor})"""
+    for name, labels, value in data.get('counters', []):
+        key = ('c', name, tuple(tuple(pair) for pair in labels))
+        target[key] = target.get(key, 0) + value
+    for name, labels, buckets, counts, total, count in data.get('histograms', []):
+        key = ('h', name, tuple(tuple(pair) for pair in labels))
+        current = target.get(key)
+        if current is None:
+            target[key] = [list(buckets), list(counts), total, count]
+        elif current[0] == list(buckets):
+            current[1] = [a + b for a, b in zip(current[1], counts)]
+            current[2] += total
+            current[3] += count
+
+def _serialize(merged):
+    counters = [[name, [list(pair) for pair in labels], value]
+                for (kind, name, labels), value in merged.items() if kind == 'c']
+    histograms = [[name, [list(pair) for pair in labels], *value]
+                  for (kind, name, labels), value in merged.items() if kind == 'h']
+    return {'counters': counters, 'histograms': histograms}
+
+def mark_process_dead(pid):
+    """Gancho child_exit do gunicorn (no master): consolida os contadores do worker encerrado
+    em archive.json e remove o arquivo dele, para que a reciclagem (max_requests) não zere
+    os contadores nem acumule arquivos"""
+    path = os.path.join(METRICS_DIR, f'worker-{pid}.json')
+    with _dir_lock():
+        data = _read(path)
+        if data is not None:
+            merged = {}
+            archive_path = os.path.join(METRICS_DIR, 'archive.json')
+            _merge(merged, _read(archive_path) or {})
+            _merge(merged, data)
+            tmp_path = f'{archive_path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(_serialize(merged), f)
+            os.replace(tmp_path, archive_path)
+        for stale in (path, f'{path}.tmp'):
+            if os.path.exists(stale):
+                os.remove(stale)
+
+def reset():
+    """Gancho on_starting do gunicorn: contadores recomeçam junto com o servidor"""
+    for path in glob.glob(os.path.join(METRICS_DIR, '*.json')):
+        os.remove(path)
+
+def collect():
+    """Soma o estado de todos os workers: (valores consolidados, gauges dos workers vivos)"""
+    registry.flush()
+    merged = {}
+    gauges = []
+    with _dir_lock():
+        _merge(merged, _read(os.path.join(METRICS_DIR, 'archive.json')) or {})
+        for path in glob.glob(os.path.join(METRICS_DIR, 'worker-*.json')):
+            data = _read(path)
+            if data is None:
+                continue
+            # Contadores de workers mortos ainda não consolidados continuam valendo; gauges não
+            _merge(merged, data)
+            if _pid_alive(data['pid']):
+                gauges.extend([name, [['pid', str(data['pid'])], *labels], value]
+                              for name, labels, value in data.get('gauges', []))
+    return merged, gauges
+
+def _percentile(sorted_values, quantile):
+    index = min(len(sorted_values) - 1, max(0, int(round(quantile * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def app_gauges():
+    """Métricas lidas do banco no momento do scrape (iguais para todos os workers)"""
+    from app.dashboard_metrics import dashboard_snapshot
+    from app.db_operations import Order
+    
+    snapshot = dashboard_snapshot.get()
+    gauges = [
+        ['meatz_orders_active', [['status', 'pendente']], snapshot['pending_orders']],
+        ['meatz_orders_active', [['status', 'preparando']], snapshot['preparing_orders']],
+        ['meatz_orders_active', [['status', 'pronto']], snapshot['ready_orders']],
+    ]
+    
+    ages = {}
+    for row in Order.get_ages_by_status(ACTIVE_ORDER_STATUSES):
+        ages.setdefault(row['status'], []).append(max(0.0, row['age_seconds'] or 0.0))
+    summaries = []
+    for status in ACTIVE_ORDER_STATUSES:
+        values = sorted(ages.get(status, []))
+        labels = [['status', status]]
+        quantiles = [[q, _percentile(values, q) if values else 0.0] for q in KDS_QUANTILES]
+        summaries.append(['meatz_kds_ticket_age_seconds', labels, quantiles, sum(values), len(values)])
+    return gauges, summaries
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render(merged, worker_gauges, gauges, summaries):
+    """Formato texto do Prometheus (exposition format 0.0.4)"""
+    lines_by_name = {name: [] for name in FAMILIES}
+    
+    for (kind, name, labels), value in sorted(merged.items()):
+        if kind == 'c':
+            lines_by_name.setdefault(name, []).append(f'{name}{_labels(labels)} {_number(value)}')
+            continue
+        buckets, counts, total, count = value
+        cumulative = 0
+        for bound, bucket_count in zip(list(buckets) + [float('inf')], counts):
+            cumulative += bucket_count
+            lines_by_name[name].append(f"{name}_bucket{_labels([*labels, ('le', _number(bound))])} {cumulative}")
+        lines_by_name[name].append(f'{name}_sum{_labels(labels)} {_number(total)}')
+        lines_by_name[name].append(f'{name}_count{_labels(labels)} {count}')
+    
+    # Taxa de acerto calculada sobre os contadores já somados entre os workers
+    cache_totals = {}
+    for (kind, name, labels), value in merged.items():
+        if name == 'meatz_cache_requests_total':
+            label_map = dict(labels)
+            cache_totals.setdefault(label_map['cache'], {'hit': 0, 'miss': 0})[label_map['result']] += value
+    for cache, totals in sorted(cache_totals.items()):
+        requests = totals['hit'] + totals['miss']
+        ratio = totals['hit'] / requests if requests else 0.0
+        lines_by_name['meatz_cache_hit_ratio'].append(f'meatz_cache_hit_ratio{_labels([("cache", cache)])} {ratio:.4f}')
+    
+    busy = sum(value for name, _, value in worker_gauges if name == 'meatz_worker_busy_threads')
+    threads = sum(value for name, _, value in worker_gauges if name == 'meatz_worker_threads')
+    pids = {dict(labels)['pid'] for _, labels, _ in worker_gauges}
+    gauges = [*worker_gauges, *gauges, ['meatz_workers', [], len(pids)],
+              ['meatz_worker_utilization', [], round(busy / threads, 4) if threads else 0.0]]
+    for name, labels, value in gauges:
+        lines_by_name[name].append(f'{name}{_labels(labels)} {_number(value)}')
+    
+    for name, labels, quantiles, total, count in summaries:
+        for quantile, value in quantiles:
+            lines_by_name[name].append(f"{name}{_labels([*labels, ('quantile', quantile)])} {value:.3f}")
+        lines_by_name[name].append(f'{name}_sum{_labels(labels)} {total:.3f}')
+        lines_by_name[name].append(f'{name}_count{_labels(labels)} {count}')
+    
+    output = []
+    for name, lines in lines_by_name.items():
+        if not lines:
+            continue
+        kind, description = FAMILIES.get(name, ('untyped', ''))
+        output.append(f'# HELP {name} {description}')
+        output.append(f'# TYPE {name} {kind}')
+        output.extend(lines)
+    return '\n'.join(output) + '\n'
+
+def record_checkout(channel):
+    """Conta um pedido fechado depois do commit da transação que o criou"""
+    after_commit(lambda: registry.inc('meatz_checkouts_total', {'channel': channel}))
+
+def _authorized():
+    if METRICS_TOKEN:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {METRICS_TOKEN}')
+    # Atrás de um proxy local (nginx -> gunicorn) toda requisição chega de 127.0.0.1
+    return current_app.debug and request.remote_addr in ('127.0.0.1', '::1')
+
+def metrics_view():
+    if not _authorized():
+        abort(404)
+    merged, worker_gauges = collect()
+    gauges, summaries = app_gauges()
+    body = render(merged, worker_gauges, gauges, summaries)
+    return Response(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def init_app(app):
+    if not METRICS_ENABLED:
+        return
+    
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        registry.track_busy(1)
+    
+    @app.after_request
+    def observe_request(response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+        endpoint = request.endpoint or 'sem_rota'
+        registry.observe('meatz_http_request_duration_seconds', time.perf_counter() - started,
+                         {'endpoint': endpoint, 'method': request.method})
+        registry.inc('meatz_http_requests_total',
+                     {'endpoint': endpoint, 'method': request.method, 'status': str(response.status_code)})
+        
+        # Consultas registradas pelo query_stats nesta requisição (quando ativo)
+        recorder = g.get('query_recorder')
+        if recorder is not None and recorder.count:
+            registry.inc('meatz_db_queries_total', {'endpoint': endpoint}, recorder.count)
+            for _, _, elapsed_ms, _ in recorder.queries:
+                registry.observe('meatz_db_query_duration_seconds', elapsed_ms / 1000, buckets=QUERY_BUCKETS)
+        return response
+    
+    @app.teardown_request
+    def stop_request_timer(exc):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        registry.track_busy(-1)
+        registry.inc('meatz_worker_busy_seconds_total', value=time.perf_counter() - started)
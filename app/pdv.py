@@ -1,10 +1,16 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
+from flask import (Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort, Response,
+                   stream_with_context)
 from flask_login import login_required, current_user
-from app.db_operations import Product, Category, Order, Table, OrderItem, Payment, ProductSuggestion, Customer
+from app.db_operations import Product, Category, Order, Table, OrderItem, Payment, ProductSuggestion, Customer, KdsEvent
 from app.db_operations_extended import (ProductModifierGroup, ProductModifierOption, OrderItemModifier,
                                         TableGrouping, TableMergeHistory, OrderTransfer, ServiceMessage,
                                         OrderTemplate, ServiceChargePolicy, OrderServiceCharge, PaymentSplit,
-                                        DeliveryOrder, AuditLog)
+                                        DeliveryOrder)
+from app.database import get_db_connection, transaction
+from app.events import stream_kds_events, kds_events
+from app import audit
+from app.http_cache import cache_control, payload_etag
+from app.metrics import record_checkout
 from datetime import datetime
 
 pdv = Blueprint('pdv', __name__)
@@ -50,28 +56,31 @@ def create_order():
     if not table:
         abort(404)
     
-    order_id = Order.create(
-        table_id=table_id,
-        user_id=current_user.id,
-        status='pendente',
-        total=0.0
-    )
-    
-    total = 0
-    for item in items:
-        product = Product.get_by_id(item['product_id'])
-        if product:
-            OrderItem.create(
-                order_id=order_id,
-                product_id=product['id'],
-                quantity=item['quantity'],
-                price=product['price'],
-                notes=item.get('notes', '')
-            )
-            total += product['price'] * item['quantity']
-    
-    Order.update(order_id, total=total)
-    Table.update(table_id, status='ocupada', current_order_id=order_id)
+    with transaction():
+        order_id = Order.create(
+            table_id=table_id,
+            user_id=current_user.id,
+            status='pendente',
+            total=0.0
+        )
+        
+        products = Product.get_many(item['product_id'] for item in items)
+        total = 0
+        for item in items:
+            product = products.get(int(item['product_id']))
+            if product:
+                OrderItem.create(
+                    order_id=order_id,
+                    product_id=product['id'],
+                    quantity=item['quantity'],
+                    price=product['price'],
+                    notes=item.get('notes', '')
+                )
+                total += product['price'] * item['quantity']
+        
+        Order.update(order_id, total=total)
+        Table.update(table_id, status='ocupada', current_order_id=order_id)
+        record_checkout('pdv')
     
     return jsonify({'success': True, 'order_id': order_id})
 
@@ -81,45 +90,48 @@ def add_order_item(order_id):
     data = request.json
     if not data:
         return jsonify({'success': False, 'error': 'Dados inválidos'}), 400
-    order = Order.get_by_id(order_id)
-    if not order:
-        abort(404)
-    
     product = Product.get_by_id(data['product_id'])
     if not product:
         return jsonify({'success': False, 'error': 'Produto não encontrado'}), 404
     
     quantity = int(data.get('quantity', 1))
-    OrderItem.create(
-        order_id=order['id'],
-        product_id=product['id'],
-        quantity=quantity,
-        price=product['price'],
-        notes=data.get('notes', '')
-    )
-    
-    new_total = order['total'] + (product['price'] * quantity)
-    Order.update(order_id, total=new_total)
+    with transaction():
+        # Lido dentro da transação (BEGIN IMMEDIATE): adições simultâneas não sobrescrevem o total
+        order = Order.get_by_id(order_id)
+        if not order:
+            abort(404)
+        
+        OrderItem.create(
+            order_id=order['id'],
+            product_id=product['id'],
+            quantity=quantity,
+            price=product['price'],
+            notes=data.get('notes', '')
+        )
+        
+        new_total = order['total'] + (product['price'] * quantity)
+        Order.update(order_id, total=new_total)
     
     return jsonify({'success': True})
 
 @pdv.route('/api/pedido/<int:order_id>/remover-item/<int:item_id>', methods=['POST'])
 @login_required
 def remove_order_item(order_id, item_id):
-    order = Order.get_by_id(order_id)
-    if not order:
-        abort(404)
-    
-    item = OrderItem.get_by_id(item_id)
-    if not item:
-        abort(404)
-    
-    if item['order_id'] != order['id']:
-        return jsonify({'success': False, 'error': 'Item não pertence a este pedido'}), 400
-    
-    new_total = order['total'] - (item['price'] * item['quantity'])
-    OrderItem.delete(item_id)
-    Order.update(order_id, total=new_total)
+    with transaction():
+        # Pedido e item lidos já com a escrita reservada: remoções simultâneas não descontam duas vezes
+        order = Order.get_by_id(order_id)
+        if not order:
+            abort(404)
+        
+        item = OrderItem.get_by_id(item_id)
+        if not item:
+            abort(404)
+        
+        if item['order_id'] != order['id']:
+            return jsonify({'success': False, 'error': 'Item não pertence a este pedido'}), 400
+        
+        OrderItem.delete(item_id)
+        Order.update(order_id, total=order['total'] - (item['price'] * item['quantity']))
     
     return jsonify({'success': True})
 
@@ -133,17 +145,18 @@ def finalize_order(order_id):
     if request.method == 'POST':
         payment_method = request.form.get('payment_method')
         
-        Payment.create(
-            order_id=order['id'],
-            amount=order['total'],
-            method=payment_method,
-            status='pago'
-        )
-        
-        Order.update(order_id, status='pago', payment_method=payment_method)
-        
-        if order['table_id']:
-            Table.update(order['table_id'], status='livre', current_order_id=None)
+        with transaction():
+            Payment.create(
+                order_id=order['id'],
+                amount=order['total'],
+                method=payment_method,
+                status='pago'
+            )
+            
+            Order.update(order_id, status='pago', payment_method=payment_method)
+            
+            if order['table_id']:
+                Table.update(order['table_id'], status='livre', current_order_id=None)
         
         flash('Pedido finalizado com sucesso!', 'success')
         return redirect(url_for('pdv.index'))
@@ -204,155 +217,164 @@ def kitchen():
     
     return render_template('pdv/kitchen.html', orders_with_items=orders_with_items)
 
+KDS_STATUSES = ['pendente', 'preparando', 'pronto']
+KDS_COLUMNS = {'pendente': 'new', 'preparando': 'preparing', 'pronto': 'ready'}
+
+def load_kds_board():
+    """Carrega o quadro do KDS (pedidos, itens, seções e mesas) com duas consultas"""
+    with get_db_connection():
+        orders = Order.get_board(KDS_STATUSES)
+        items = OrderItem.get_by_order_statuses(KDS_STATUSES)
+    
+    items_by_order = {}
+    for item in items:
+        items_by_order.setdefault(item['order_id'], []).append(item)
+    
+    # A consulta já vem ordenada do mais antigo para o mais novo
+    board = {column: [] for column in KDS_COLUMNS.values()}
+    for order in orders:
+        board[KDS_COLUMNS[order['status']]].append({
+            'order': order,
+            'items': items_by_order.get(order['id'], []),
+            'age_minutes': order['age_minutes'],
+            'priority_class': order['priority_class']
+        })
+    return board
+
+def load_kds_changes(since):
+    """Carrega só o que mudou no KDS depois do cursor since, incluindo as exclusões"""
+    with get_db_connection():
+        orders = Order.get_board(KDS_STATUSES, since=since)
+        items = OrderItem.get_by_order_statuses(KDS_STATUSES, since=since)
+        left_board = Order.get_left_board_since(KDS_STATUSES, since)
+        tombstones = KdsEvent.get_tombstones_since(since)
+    
+    changed_order_ids = {order['id'] for order in orders}
+    items_by_order = {}
+    loose_items = []
+    for item in items:
+        if item['order_id'] in changed_order_ids:
+            items_by_order.setdefault(item['order_id'], []).append(item)
+        else:
+            loose_items.append(item)
+    
+    removed_orders = set(left_board)
+    removed_items = set()
+    for tombstone in tombstones:
+        if tombstone['event_type'] == 'order_deleted':
+            removed_orders.add(tombstone['order_id'])
+        else:
+            removed_items.add(tombstone['item_id'])
+    
+    return {
+        'orders': [{
+            'order': order,
+            'items': items_by_order.get(order['id'], []),
+            'age_minutes': order['age_minutes'],
+            'priority_class': order['priority_class']
+        } for order in orders],
+        'items': loose_items,
+        'removed_orders': sorted(removed_orders - changed_order_ids),
+        'removed_items': sorted(removed_items)
+    }
+
 @pdv.route('/kds')
 @login_required
+@cache_control()
 def kds():
     """Kitchen Display System - Interface moderna para cozinha"""
-    from datetime import datetime
-    
-    # Pegar todos os pedidos ativos
-    pending_orders = Order.get_by_statuses(['pendente', 'preparando', 'pronto'])
-    
-    # Organizar pedidos por status com detalhes dos items
-    new_orders = []
-    preparing_orders = []
-    ready_orders = []
-    
-    for order in pending_orders:
-        items = OrderItem.get_by_order(order['id'])
-        
-        # Calcular tempo de espera
-        order_age_minutes = 0
-        if order['created_at']:
-            try:
-                created_time = datetime.strptime(order['created_at'], '%Y-%m-%d %H:%M:%S')
-                order_age_minutes = (datetime.now() - created_time).total_seconds() / 60
-            except:
-                pass
-        
-        # Definir prioridade
-        priority_class = 'low'
-        if order_age_minutes > 30:
-            priority_class = 'critical'
-        elif order_age_minutes > 20:
-            priority_class = 'high'
-        elif order_age_minutes > 10:
-            priority_class = 'medium'
-        
-        order_data = {
-            'order': dict(order),
-            'items': items,
-            'age_minutes': int(order_age_minutes),
-            'priority_class': priority_class
-        }
-        
-        # Organizar por status
-        if order['status'] == 'pendente':
-            new_orders.append(order_data)
-        elif order['status'] == 'preparando':
-            preparing_orders.append(order_data)
-        elif order['status'] == 'pronto':
-            ready_orders.append(order_data)
-    
-    # Ordenar por tempo (mais antigos primeiro)
-    new_orders.sort(key=lambda x: x['age_minutes'], reverse=True)
-    preparing_orders.sort(key=lambda x: x['age_minutes'], reverse=True)
-    ready_orders.sort(key=lambda x: x['age_minutes'], reverse=True)
+    kds_cursor = KdsEvent.get_last_id()
+    board = load_kds_board()
     
     # Pegar todas as seções únicas dos produtos
     all_products = Product.get_all()
-    sections = list(set([p.get('prep_section', 'geral') for p in all_products if p.get('prep_section')]))
+    sections = sorted({p['prep_section'] for p in all_products if p['prep_section']})
     
     return render_template('pdv/kds.html', 
-                         new_orders=new_orders,
-                         preparing_orders=preparing_orders,
-                         ready_orders=ready_orders,
-                         sections=sections)
+                         new_orders=board['new'],
+                         preparing_orders=board['preparing'],
+                         ready_orders=board['ready'],
+                         sections=sections,
+                         kds_cursor=kds_cursor)
+
+def serialize_kds_item(item):
+    return {
+        'id': item['id'],
+        'order_id': item['order_id'],
+        'product_name': item['product_name'],
+        'quantity': item['quantity'],
+        'status': item['status'] or 'novo',
+        'notes': item['notes'] or '',
+        'prep_section': item['prep_section'] or 'geral'
+    }
+
+def serialize_kds_order(entry):
+    order = entry['order']
+    return {
+        'id': order['id'],
+        'table_number': order['table_number'] if order['table_number'] is not None else 'N/A',
+        'status': order['status'],
+        'age_minutes': entry['age_minutes'],
+        'priority_class': entry['priority_class'],
+        'created_at': order['created_at'],
+        'items': [serialize_kds_item(item) for item in entry['items']]
+    }
 
 @pdv.route('/api/kds/orders')
 @login_required
+@cache_control()
 def kds_api():
-    """API JSON para KDS - retorna pedidos ativos para polling"""
-    from datetime import datetime
-    
-    # Parâmetro opcional para filtrar por timestamp
-    since = request.args.get('since', None)
-    
-    # Pegar todos os pedidos ativos
-    pending_orders = Order.get_by_statuses(['pendente', 'preparando', 'pronto'])
-    
-    result = {
-        'new': [],
-        'preparing': [],
-        'ready': [],
-        'timestamp': datetime.now().isoformat()
-    }
-    
-    for order in pending_orders:
-        # Verificar se o pedido foi modificado desde o timestamp fornecido
-        if since:
-            try:
-                # Aqui você poderia adicionar lógica para verificar updated_at
-                pass
-            except:
-                pass
-        
-        items = OrderItem.get_by_order(order['id'])
-        
-        # Calcular tempo de espera
-        order_age_minutes = 0
-        if order['created_at']:
-            try:
-                created_time = datetime.strptime(order['created_at'], '%Y-%m-%d %H:%M:%S')
-                order_age_minutes = (datetime.now() - created_time).total_seconds() / 60
-            except:
-                pass
-        
-        # Definir prioridade
-        priority_class = 'low'
-        if order_age_minutes > 30:
-            priority_class = 'critical'
-        elif order_age_minutes > 20:
-            priority_class = 'high'
-        elif order_age_minutes > 10:
-            priority_class = 'medium'
-        
-        # Enriquecer items com informações do produto (prep_section)
-        items_with_section = []
-        for item in items:
-            product = Product.get_by_id(item['product_id'])
-            items_with_section.append({
-                'id': item['id'],
-                'product_name': item['product_name'],
-                'quantity': item['quantity'],
-                'status': item.get('status', 'novo'),
-                'notes': item.get('notes', ''),
-                'prep_section': product.get('prep_section', 'geral') if product else 'geral'
-            })
-        
-        order_data = {
-            'id': order['id'],
-            'table_number': order.get('table_number', 'N/A'),
-            'status': order['status'],
-            'age_minutes': int(order_age_minutes),
-            'priority_class': priority_class,
-            'created_at': order['created_at'],
-            'items': items_with_section
+    """API JSON para KDS.
+    
+    Sem parâmetros retorna o quadro completo. Com since=<cursor> retorna só os pedidos
+    (com todos os itens) e itens alterados depois do cursor, mais removed_orders e
+    removed_items. Toda resposta traz o cursor a ser usado na próxima chamada; se o
+    cursor for antigo demais (eventos já expurgados), volta o quadro completo (full=true).
+    """
+    since = request.args.get('since', type=int)
+    
+    # Lido antes das consultas: alterações concorrentes saem de novo na próxima chamada
+    cursor = KdsEvent.get_last_id()
+    first_id = KdsEvent.get_first_id() or cursor + 1
+    
+    if since is None or since <= 0 or since > cursor or since < first_id - 1:
+        board = load_kds_board()
+        result = {column: [serialize_kds_order(entry) for entry in entries]
+                  for column, entries in board.items()}
+        result['full'] = True
+    else:
+        changes = load_kds_changes(since)
+        result = {
+            'full': False,
+            'orders': [serialize_kds_order(entry) for entry in changes['orders']],
+            'items': [serialize_kds_item(item) for item in changes['items']],
+            'removed_orders': changes['removed_orders'],
+            'removed_items': changes['removed_items']
         }
-        
-        # Organizar por status
-        if order['status'] == 'pendente':
-            result['new'].append(order_data)
-        elif order['status'] == 'preparando':
-            result['preparing'].append(order_data)
-        elif order['status'] == 'pronto':
-            result['ready'].append(order_data)
-    
-    # Ordenar por tempo (mais antigos primeiro)
-    for status_list in [result['new'], result['preparing'], result['ready']]:
-        status_list.sort(key=lambda x: x['age_minutes'], reverse=True)
+    result['cursor'] = cursor
     
-    return jsonify(result)
+    response = jsonify({**result, 'timestamp': datetime.now().isoformat()})
+    response.set_etag(payload_etag(result))
+    return response
+
+@pdv.route('/api/kds/stream')
+@login_required
+def kds_stream():
+    """Canal SSE do KDS - envia eventos de pedidos e itens assim que são confirmados"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id', '')
+    last_id = int(last_event_id) if last_event_id.isdigit() else KdsEvent.get_last_id()
+    
+    # Cada stream prende uma thread do worker: acima do limite a tela usa o polling do ?since=
+    if not kds_events.reserve():
+        return jsonify({'error': 'Limite de streams do KDS atingido'}), 503, {'Retry-After': '30'}
+    
+    # stream_with_context: o teardown (métricas de thread ocupada) só roda quando o stream termina
+    response = Response(stream_with_context(stream_kds_events(last_id)),
+                        mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # call_on_close roda mesmo se o gerador nunca chegar a ser iniciado
+    response.call_on_close(kds_events.release)
+    return response
 
 @pdv.route('/api/pedido/<int:order_id>/status', methods=['POST'])
 @login_required
@@ -477,16 +499,14 @@ def merge_tables():
     for table_id in table_ids:
         TableMergeHistory.create(group_id, table_id, table_ids[0], 'merge', current_user.id)
     
-    AuditLog.create('merge_tables', 'table_grouping', group_id, current_user.id, 
-                   None, {'table_ids': table_ids, 'name': name})
+    audit.record('merge_tables', 'table_grouping', group_id, current_user.id, 
+                None, {'table_ids': table_ids, 'name': name})
     
     return jsonify({'success': True, 'group_id': group_id})
 
 @pdv.route('/api/mesas/separar/<int:group_id>', methods=['POST'])
 @login_required
 def split_tables(group_id):
-    from app.database import get_db_connection
-    
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM table_grouping WHERE id = ? AND dissolved_at IS NULL', (group_id,))
@@ -507,8 +527,8 @@ def split_tables(group_id):
     
     TableGrouping.dissolve(group_id)
     
-    AuditLog.create('split_tables', 'table_grouping', group_id, current_user.id, 
-                   {'table_ids': table_ids, 'order_preserved_on': table_ids[0] if table_ids else None})
+    audit.record('split_tables', 'table_grouping', group_id, current_user.id, 
+                {'table_ids': table_ids, 'order_preserved_on': table_ids[0] if table_ids else None})
     
     return jsonify({'success': True, 'main_table_id': table_ids[0] if table_ids else None})
 
@@ -524,8 +544,8 @@ def open_table(table_id):
     
     Table.update(table_id, status='ocupada')
     
-    AuditLog.create('open_table', 'table', table_id, current_user.id,
-                   {'status': table['status']}, {'status': 'ocupada'})
+    audit.record('open_table', 'table', table_id, current_user.id,
+                {'status': table['status']}, {'status': 'ocupada'})
     
     return jsonify({'success': True, 'message': 'Mesa aberta com sucesso'})
 
@@ -553,9 +573,9 @@ def close_table(table_id):
     
     Table.update(table_id, status='livre', current_order_id=None)
     
-    AuditLog.create('close_table', 'table', table_id, current_user.id,
-                   {'status': table['status'], 'current_order_id': table['current_order_id']}, 
-                   {'status': 'livre', 'current_order_id': None})
+    audit.record('close_table', 'table', table_id, current_user.id,
+                {'status': table['status'], 'current_order_id': table['current_order_id']}, 
+                {'status': 'livre', 'current_order_id': None})
     
     return jsonify({'success': True, 'message': 'Mesa fechada com sucesso'})
 
@@ -575,8 +595,8 @@ def transfer_order(order_id):
     OrderTransfer.create(order_id, current_user.id, to_user_id, reason)
     Order.update(order_id, user_id=to_user_id)
     
-    AuditLog.create('transfer_order', 'order', order_id, current_user.id,
-                   {'user_id': order['user_id']}, {'user_id': to_user_id})
+    audit.record('transfer_order', 'order', order_id, current_user.id,
+                {'user_id': order['user_id']}, {'user_id': to_user_id})
     
     return jsonify({'success': True})
 
@@ -627,33 +647,35 @@ def duplicate_order(order_id):
         return jsonify({'success': False, 'error': 'Dados inválidos'}), 400
     table_id = data.get('table_id', original_order['table_id'])
     
-    new_order_id = Order.create(
-        table_id=table_id,
-        user_id=current_user.id,
-        status='pendente',
-        total=0.0
-    )
-    
     items = OrderItem.get_by_order(order_id)
-    total = 0
-    for item in items:
-        OrderItem.create(
-            order_id=new_order_id,
-            product_id=item['product_id'],
-            quantity=item['quantity'],
-            price=item['price'],
-            notes=item.get('notes', '')
+    
+    with transaction():
+        new_order_id = Order.create(
+            table_id=table_id,
+            user_id=current_user.id,
+            status='pendente',
+            total=0.0
         )
-        total += item['price'] * item['quantity']
         
-        modifiers = OrderItemModifier.get_by_order_item(item['id'])
-        for mod in modifiers:
-            OrderItemModifier.create(new_order_id, mod['modifier_option_id'], mod['price_adjustment'])
-    
-    Order.update(new_order_id, total=total)
-    
-    if table_id:
-        Table.update(table_id, status='ocupada', current_order_id=new_order_id)
+        total = 0
+        for item in items:
+            new_item_id = OrderItem.create(
+                order_id=new_order_id,
+                product_id=item['product_id'],
+                quantity=item['quantity'],
+                price=item['price'],
+                notes=item['notes'] or ''
+            )
+            total += item['price'] * item['quantity']
+            
+            modifiers = OrderItemModifier.get_by_order_item(item['id'])
+            for mod in modifiers:
+                OrderItemModifier.create(new_item_id, mod['modifier_option_id'], mod['price_adjustment'])
+        
+        Order.update(new_order_id, total=total)
+        
+        if table_id:
+            Table.update(table_id, status='ocupada', current_order_id=new_order_id)
     
     return jsonify({'success': True, 'order_id': new_order_id})
 
@@ -0,0 +1,45 @@
+import dataclasses
+from typing import Any, Tuple
+
+from flask import g, session
+
+from app.db_operations import Product
+
+@dataclasses.dataclass(frozen=True)
+class PricedLine:
+    product: Any
+    quantity: int
+    unit_price: float
+    subtotal: float
+
+@dataclasses.dataclass(frozen=True)
+class PricedCart:
+    """Carrinho já precificado - calculado uma vez e reaproveitado no total, na gravação e na renderização"""
+    lines: Tuple[PricedLine, ...] = ()
+    total: float = 0
+
+def price_cart(cart):
+    """Precifica {product_id: quantidade} com uma única consulta, na ordem do carrinho"""
+    quantities = [(int(product_id), quantity) for product_id, quantity in cart.items()]
+    products = Product.get_many(product_id for product_id, _ in quantities)
+    
+    lines = []
+    total = 0
+    for product_id, quantity in quantities:
+        product = products.get(product_id)
+        if not product:
+            continue
+        subtotal = product['price'] * quantity
+        lines.append(PricedLine(product=product, quantity=quantity, unit_price=product['price'], subtotal=subtotal))
+        total += subtotal
+    return PricedCart(lines=tuple(lines), total=total)
+
+def get_priced_cart():
+    """Carrinho da sessão precificado, memorizado na requisição enquanto o carrinho não mudar"""
+    cart = session.get('cart', {})
+    key = tuple(cart.items())
+    cached = g.get('priced_cart')
+    if cached is None or cached[0] != key:
+        cached = (key, price_cart(cart))
+        g.priced_cart = cached
+    return cached[1]
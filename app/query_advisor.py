@@ -0,0 +1,109 @@
+import ast
+import os
+import re
+import sqlite3
+from app.database import get_db_connection
+
+DATA_LAYER_MODULES = ['db_operations.py', 'db_operations_extended.py']
+
+SCAN_RE = re.compile(r'^SCAN (\S+)(.*)$')
+
+EXPR_MARKER = '__expr__'
+
+def _render_sql(node):
+    """Converte o literal SQL passado a cursor.execute() em texto analisável.
+    
+    Interpolações de f-string viram '?', exceto listas de colunas em SET, que viram
+    uma atribuição neutra (o plano de um UPDATE depende apenas do WHERE).
+    """
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                parts.append(value.value)
+            else:
+                parts.append(EXPR_MARKER)
+        sql = ''.join(parts)
+        sql = re.sub(rf'SET {EXPR_MARKER}', 'SET rowid = rowid', sql)
+        sql = re.sub(rf'{EXPR_MARKER} = CURRENT_TIMESTAMP', 'rowid = rowid', sql)
+        return sql.replace(EXPR_MARKER, '?')
+    return None
+
+def collect_queries(module_paths=None):
+    """Extrai (local, sql) de todas as chamadas execute() nos módulos da camada de dados"""
+    base_dir = os.path.dirname(__file__)
+    module_paths = module_paths or [os.path.join(base_dir, name) for name in DATA_LAYER_MODULES]
+    
+    queries = []
+    for path in module_paths:
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=path)
+        
+        for class_node in [n for n in tree.body if isinstance(n, ast.ClassDef)]:
+            for func in [n for n in class_node.body if isinstance(n, ast.FunctionDef)]:
+                for node in ast.walk(func):
+                    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                            and node.func.attr == 'execute' and node.args):
+                        sql = _render_sql(node.args[0])
+                        if sql:
+                            location = f'{class_node.name}.{func.name} ({os.path.basename(path)}:{node.lineno})'
+                            queries.append((location, ' '.join(sql.split())))
+    return queries
+
+def explain(conn, sql):
+    """Retorna as linhas de EXPLAIN QUERY PLAN para o SQL, com parâmetros nulos"""
+    placeholders = sql.count('?')
+    rows = conn.execute(f'EXPLAIN QUERY PLAN {sql}', [None] * placeholders).fetchall()
+    return [row[3] for row in rows]
+
+def analyze(module_paths=None):
+    """Analisa o plano de cada consulta e classifica em: scan, sort, ok ou erro"""
+    findings = []
+    with get_db_connection() as conn:
+        for location, sql in collect_queries(module_paths):
+            if not sql.upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+                continue
+            try:
+                plan = explain(conn, sql)
+            except sqlite3.Error as e:
+                findings.append({'location': location, 'sql': sql, 'kind': 'erro', 'detail': str(e)})
+                continue
+            
+            scans = [line for line in plan if SCAN_RE.match(line) and ' USING ' not in line]
+            sorts = [line for line in plan if line.startswith('USE TEMP B-TREE')]
+            # Listagens completas (sem WHERE) sempre percorrem a tabela; não são falhas de índice
+            full_listing = ' WHERE ' not in f' {sql.upper()} '
+            
+            if scans and not full_listing:
+                kind = 'scan'
+            elif scans or sorts:
+                kind = 'sort' if sorts else 'listagem'
+            else:
+                kind = 'ok'
+            findings.append({'location': location, 'sql': sql, 'kind': kind, 'detail': '; '.join(plan)})
+    return findings
+
+def print_report(findings, verbose=False):
+    labels = {
+        'scan': '❌ SCAN',
+        'sort': '⚠️  SORT',
+        'listagem': 'ℹ️  LISTA',
+        'erro': '⚠️  N/A',
+        'ok': '✅ OK',
+    }
+    for finding in findings:
+        if finding['kind'] == 'ok' and not verbose:
+            continue
+        print(f"{labels[finding['kind']]}  {finding['location']}")
+        print(f"      {finding['sql'][:160]}")
+        print(f"      plano: {finding['detail']}")
+    
+    counts = {}
+    for finding in findings:
+        counts[finding['kind']] = counts.get(finding['kind'], 0) + 1
+    print(f"\nConsultas analisadas: {len(findings)} | com scan: {counts.get('scan', 0)} | "
+          f"ordenação temporária: {counts.get('sort', 0)} | listagens: {counts.get('listagem', 0)} | "
+          f"não analisáveis: {counts.get('erro', 0)}")
+    return counts.get('scan', 0)
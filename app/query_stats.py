@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from flask import g, request
+
+from app.database import get_db_path, set_query_recorder
+
+QUERY_STATS_ENABLED = os.getenv('QUERY_STATS', '1') == '1'
+# Server-Timing: sempre com o app em debug; QUERY_SERVER_TIMING=1 liga também em produção
+QUERY_SERVER_TIMING = os.getenv('QUERY_SERVER_TIMING') == '1'
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '50'))
+SLOW_REQUEST_DB_MS = float(os.getenv('SLOW_REQUEST_DB_MS', '200'))
+# Mesmo formato de SQL repetido mais que isso em uma requisição = padrão N+1
+QUERY_REPEAT_THRESHOLD = int(os.getenv('QUERY_REPEAT_THRESHOLD', '5'))
+SLOWEST_KEPT = 5
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG') or os.path.join(os.path.dirname(get_db_path()), 'slow_queries.log')
+SLOW_QUERY_LOG_BYTES = int(os.getenv('SLOW_QUERY_LOG_BYTES', str(5 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv('SLOW_QUERY_LOG_BACKUPS', '3'))
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SENSITIVE_RE = re.compile(r'password|token|secret', re.IGNORECASE)
+
+def sql_shape(sql):
+    """SQL normalizado (literais viram ?): consultas iguais a menos dos valores têm a mesma forma"""
+    shape = _WHITESPACE_RE.sub(' ', sql).strip()
+    shape = _STRING_RE.sub('?', shape)
+    shape = _NUMBER_RE.sub('?', shape)
+    return _IN_LIST_RE.sub('(?, ...)', shape)
+
+def format_params(sql, params, many=False):
+    if _SENSITIVE_RE.search(sql):
+        return '<omitidos>'
+    if many:
+        return f'<{len(params)} linhas>'
+    if isinstance(params, dict):
+        params = list(params.values())
+    return [repr(value)[:80] for value in params]
+
+class QueryRecorder:
+    """Consultas de uma requisição: contagem, tempo total, mais lentas e formas repetidas"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.total_ms = 0.0
+        self.queries = []
+    
+    def record(self, sql, params, elapsed_ms, many=False):
+        # [sql, parâmetros, ms, executemany]; a formatação fica para o resumo
+        entry = [sql, params, elapsed_ms, many]
+        self.queries.append(entry)
+        self.count += 1
+        self.total_ms += elapsed_ms
+        return entry
+    
+    def add_time(self, entry, elapsed_ms):
+        entry[2] += elapsed_ms
+        self.total_ms += elapsed_ms
+    
+    def slowest(self, limit=SLOWEST_KEPT):
+        top = sorted(self.queries, key=lambda q: q[2], reverse=True)[:limit]
+        return [{'ms': round(ms, 2), 'sql': _WHITESPACE_RE.sub(' ', sql).strip()[:500],
+                 'params': format_params(sql, params, many)}
+                for sql, params, ms, many in top]
+    
+    def repeated(self, threshold=QUERY_REPEAT_THRESHOLD):
+        """Formas de SQL executadas mais de 'threshold' vezes (candidatas a N+1)"""
+        # Consultas parametrizadas já têm o mesmo texto; a normalização roda uma vez por texto
+        by_text = defaultdict(lambda: [0, 0.0])
+        for sql, _, ms, _ in self.queries:
+            by_text[sql][0] += 1
+            by_text[sql][1] += ms
+        by_shape = defaultdict(lambda: [0, 0.0])
+        for sql, (count, ms) in by_text.items():
+            shape = by_shape[sql_shape(sql)[:500]]
+            shape[0] += count
+            shape[1] += ms
+        return sorted(({'sql': shape, 'count': count, 'ms': round(ms, 2)}
+                       for shape, (count, ms) in by_shape.items() if count > threshold),
+                      key=lambda r: r['count'], reverse=True)
+    
+    def summary(self):
+        return {
+            'queries': self.count,
+            'db_ms': round(self.total_ms, 2),
+            'request_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'slowest': self.slowest(),
+            'repeated': self.repeated()
+        }
+
+_logger = None
+
+def get_slow_query_logger():
+    """Log rotativo (uma linha JSON por requisição lenta) aberto no primeiro registro"""
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger('meatz.slow_queries')
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        if not logger.handlers:
+            os.makedirs(os.path.dirname(SLOW_QUERY_LOG), exist_ok=True)
+            handler = RotatingFileHandler(SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_BYTES,
+                                          backupCount=SLOW_QUERY_LOG_BACKUPS, encoding='utf-8', delay=True)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+def is_slow(summary):
+    return (summary['db_ms'] >= SLOW_REQUEST_DB_MS or bool(summary['repeated'])
+            or any(q['ms'] >= SLOW_QUERY_MS for q in summary['slowest']))
+
+def server_timing(summary):
+    value = f"db;dur={summary['db_ms']:.1f};desc=\"{summary['queries']} consultas\""
+    if summary['repeated']:
+        value += f", n-plus-1;desc=\"{summary['repeated'][0]['count']}x mesma consulta\""
+    return value
+
+def read_log(path=SLOW_QUERY_LOG):
+    """Registros do log atual e dos arquivos rotacionados (mais antigos primeiro)"""
+    paths = [f'{path}.{i}' for i in range(SLOW_QUERY_LOG_BACKUPS, 0, -1)] + [path]
+    for log_path in paths:
+        if not os.path.exists(log_path):
+            continue
+        with open(log_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+def summarize_log(entries):
+    """Agrega o log por rota: requisições lentas, médias de consultas/tempo e formas repetidas"""
+    routes = defaultdict(lambda: {'requests': 0, 'queries': 0, 'db_ms': 0.0, 'max_db_ms': 0.0, 'repeated': Counter()})
+    for entry in entries:
+        route = routes[entry.get('endpoint') or entry.get('path')]
+        route['requests'] += 1
+        route['queries'] += entry['queries']
+        route['db_ms'] += entry['db_ms']
+        route['max_db_ms'] = max(route['max_db_ms'], entry['db_ms'])
+        for repeated in entry.get('repeated', []):
+            route['repeated'][repeated['sql']] += repeated['count']
+    return routes
+
+def init_app(app):
+    if not QUERY_STATS_ENABLED:
+        return
+    
+    @app.before_request
+    def start_query_recorder():
+        if request.endpoint == 'static':
+            return
+        g.query_recorder = QueryRecorder()
+        set_query_recorder(g.query_recorder)
+    
+    @app.after_request
+    def report_queries(response):
+        recorder = g.get('query_recorder')
+        set_query_recorder(None)
+        if recorder is None:
+            return response
+        
+        summary = recorder.summary()
+        if app.debug or QUERY_SERVER_TIMING:
+            response.headers.add('Server-Timing', server_timing(summary))
+        if is_slow(summary):
+            entry = {'at': datetime.now().isoformat(timespec='seconds'), 'pid': os.getpid(),
+                     'method': request.method, 'path': request.path, 'endpoint': request.endpoint,
+                     'status': response.status_code, **summary}
+            try:
+                get_slow_query_logger().info(json.dumps(entry, ensure_ascii=False, default=str))
+            except Exception as e:
+                print(f'⚠️  Erro ao gravar log de consultas lentas: {e}')
+        return response
+    
+    @app.teardown_request
+    def stop_query_recorder(exc):
+        # Requisições que terminam em exceção não passam pelo after_request
+        set_query_recorder(None)
@@ -2,22 +2,29 @@ from flask import Blueprint, render_template, request, jsonify, session, redirec
 from flask_login import current_user, login_required
 from app.db_operations import Product, Category, Order, OrderItem, Table, Customer, Settings
 from app.geo_utils import get_coordinates_from_zipcode, is_within_delivery_radius
+from app.database import transaction
+from app.http_cache import cache_control, payload_etag
+from app.pricing import get_priced_cart
+from app.metrics import record_checkout
 
 main = Blueprint('main', __name__)
 
 @main.route('/')
+@cache_control()
 def index():
     categories = Category.get_all()
     featured_products = Product.get_featured(4)
     return render_template('index.html', categories=categories, products=featured_products)
 
 @main.route('/cardapio')
+@cache_control()
 def menu():
     categories = Category.get_all()
     products = Product.get_all(available_only=True)
     return render_template('menu.html', categories=categories, products=products)
 
 @main.route('/produto/<int:id>')
+@cache_control()
 def product_detail(id):
     product = Product.get_by_id(id)
     if not product:
@@ -32,22 +39,8 @@ def product_detail(id):
 
 @main.route('/carrinho')
 def cart():
-    cart_items = session.get('cart', {})
-    items = []
-    total = 0
-    
-    for product_id, quantity in cart_items.items():
-        product = Product.get_by_id(int(product_id))
-        if product:
-            subtotal = product['price'] * quantity
-            items.append({
-                'product': product,
-                'quantity': quantity,
-                'subtotal': subtotal
-            })
-            total += subtotal
-    
-    return render_template('cart.html', items=items, total=total)
+    priced = get_priced_cart()
+    return render_template('cart.html', items=priced.lines, total=priced.total)
 
 @main.route('/carrinho/adicionar/<int:product_id>', methods=['POST'])
 def add_product_to_cart(product_id):
@@ -126,10 +119,9 @@ def checkout():
         flash('Por favor, faça login para finalizar seu pedido', 'warning')
         return redirect(url_for('auth.customer_login', next=request.url))
     
-    settings = Settings.get()
-    settings_dict = dict(settings) if settings else {}
-    delivery_enabled = settings_dict.get('enable_delivery', 1)
-    delivery_fee = settings_dict.get('delivery_fee', 5.0) or 5.0
+    settings = Settings.get_cached()
+    delivery_enabled = settings.enable_delivery
+    delivery_fee = settings.delivery_fee or 5.0
     
     if request.method == 'POST':
         order_type = request.form.get('order_type', 'retirada')
@@ -137,11 +129,8 @@ def checkout():
         notes = request.form.get('notes', '')
         customer_id = session.get('customer_id')
         
-        total = 0
-        for product_id, quantity in cart.items():
-            product = Product.get_by_id(int(product_id))
-            if product:
-                total += product['price'] * quantity
+        priced = get_priced_cart()
+        total = priced.total
         
         table_id = None
         delivery_address = None
@@ -178,13 +167,13 @@ def checkout():
                 flash('CEP inválido ou não encontrado', 'danger')
                 return redirect(url_for('main.checkout'))
             
-            if settings_dict.get('store_latitude') and settings_dict.get('store_longitude'):
-                delivery_radius = settings_dict.get('delivery_radius_km', 5.0)
+            if settings.store_latitude and settings.store_longitude:
+                delivery_radius = settings.delivery_radius_km
                 within_radius, distance = is_within_delivery_radius(
                     geo_data['lat'], 
                     geo_data['lng'],
-                    settings_dict['store_latitude'],
-                    settings_dict['store_longitude'],
+                    settings.store_latitude,
+                    settings.store_longitude,
                     delivery_radius
                 )
                 
@@ -203,54 +192,42 @@ def checkout():
             delivery_address = address
             final_total = total + delivery_fee
         
-        order_id = Order.create(
-            table_id=table_id,
-            user_id=None,
-            customer_id=customer_id,
-            payment_method=payment_method,
-            notes=notes,
-            order_type=order_type,
-            delivery_address=delivery_address,
-            delivery_fee=delivery_fee if order_type == 'entrega' else 0,
-            total=final_total,
-            status='pendente'
-        )
-        
-        for product_id, quantity in cart.items():
-            product = Product.get_by_id(int(product_id))
-            if product:
+        with transaction():
+            order_id = Order.create(
+                table_id=table_id,
+                user_id=None,
+                customer_id=customer_id,
+                payment_method=payment_method,
+                notes=notes,
+                order_type=order_type,
+                delivery_address=delivery_address,
+                delivery_fee=delivery_fee if order_type == 'entrega' else 0,
+                total=final_total,
+                status='pendente'
+            )
+            record_checkout('site')
+            
+            for line in priced.lines:
                 OrderItem.create(
                     order_id=order_id,
-                    product_id=product['id'],
-                    quantity=quantity,
-                    price=product['price']
+                    product_id=line.product['id'],
+                    quantity=line.quantity,
+                    price=line.unit_price
                 )
-        
-        if table_id:
-            Table.update(table_id, current_order_id=order_id, status='ocupada')
+            
+            if table_id:
+                Table.update(table_id, current_order_id=order_id, status='ocupada')
         
         session['cart'] = {}
         
         return redirect(url_for('main.order_success', order_id=order_id))
     
-    items = []
-    total = 0
-    for product_id, quantity in cart.items():
-        product = Product.get_by_id(int(product_id))
-        if product:
-            subtotal = product['price'] * quantity
-            items.append({
-                'product': product,
-                'quantity': quantity,
-                'subtotal': subtotal
-            })
-            total += subtotal
-    
+    priced = get_priced_cart()
     customer = Customer.get_by_id(session.get('customer_id'))
     
     return render_template('checkout.html', 
-                         items=items, 
-                         total=total,
+                         items=priced.lines, 
+                         total=priced.total,
                          delivery_enabled=delivery_enabled,
                          delivery_fee=delivery_fee,
                          customer=customer)
@@ -314,6 +291,7 @@ def track_order(order_id):
                          estimated_time=estimated_time)
 
 @main.route('/api/pedido/<int:order_id>/status')
+@cache_control()
 def order_status_api(order_id):
     """API JSON para acompanhamento do pedido - usado para polling"""
     from datetime import datetime
@@ -356,7 +334,7 @@ def order_status_api(order_id):
     elif order['status'] == 'pronto':
         estimated_time = 'Disponível agora'
     
-    return jsonify({
+    payload = {
         'order_id': order_id,
         'status': order['status'],
         'status_friendly': status_friendly_map.get(order['status'], order['status']),
@@ -364,9 +342,13 @@ def order_status_api(order_id):
         'estimated_time': estimated_time,
         'order_age_minutes': order_age_minutes,
         'total_items': total_items,
-        'items_done': items_done,
-        'timestamp': datetime.now().isoformat()
-    })
+        'items_done': items_done
+    }
+    
+    # O ETag ignora o timestamp: polls sem mudança recebem 304 sem corpo
+    response = jsonify({**payload, 'timestamp': datetime.now().isoformat()})
+    response.set_etag(payload_etag(payload))
+    return response
 
 @main.route('/api/cart/count')
 def cart_count():
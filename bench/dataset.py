@@ -0,0 +1,293 @@
+"""Gera um meatz.db realista para testes de carga (pedidos, itens, mesas, clientes, pagamentos)
+
+O esquema, o usuário admin, as configurações e o cardápio vêm das APIs reais (init_db,
+seed_defaults, db_operations); pedidos, itens, pagamentos e clientes são gravados em lote.
+Os pedidos seguem o movimento de uma hamburgueria: picos no almoço e no jantar, fins de
+semana mais cheios, produtos com popularidade desigual e clientes que voltam.
+
+Uso: python -m bench.dataset --output data/bench.db [--orders 1000000] [--items 5000000]
+                             [--tables 300] [--customers 50000] [--days 365] [--seed 42]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+# Credenciais dos usuários criados aqui (usadas por bench.load)
+STAFF_PASSWORD = 'bench123'
+FIRST_NAMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique', 'Isabela', 'João',
+               'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael', 'Sofia', 'Thiago', 'Vanessa', 'Yuri']
+LAST_NAMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa', 'Ferreira', 'Almeida', 'Ribeiro',
+              'Carvalho', 'Gomes', 'Martins', 'Rocha', 'Barbosa', 'Araújo', 'Melo', 'Cardoso', 'Teixeira', 'Moura']
+
+EXTRA_PRODUCTS = [
+    ('Burgers', 'Meatz Cheddar', 36.90), ('Burgers', 'Meatz Salada', 33.90), ('Burgers', 'Meatz Costela', 44.90),
+    ('Burgers', 'Meatz Frango Crispy', 31.90), ('Burgers', 'Meatz Smash Duplo', 38.90), ('Burgers', 'Meatz Picante', 35.90),
+    ('Burgers', 'Meatz Kids', 24.90), ('Burgers', 'Meatz Gorgonzola', 41.90),
+    ('Acompanhamentos', 'Batata Rústica', 19.90), ('Acompanhamentos', 'Batata com Cheddar e Bacon', 27.90),
+    ('Acompanhamentos', 'Mandioca Frita', 18.90), ('Acompanhamentos', 'Salada da Casa', 16.90),
+    ('Bebidas', 'Guaraná', 6.90), ('Bebidas', 'Água com Gás', 4.90), ('Bebidas', 'Cerveja Artesanal', 18.90),
+    ('Bebidas', 'Limonada Suíça', 11.90), ('Bebidas', 'Chá Gelado', 8.90), ('Bebidas', 'Refrigerante Zero', 6.90),
+    ('Sobremesas', 'Cheesecake', 19.90), ('Sobremesas', 'Sorvete (2 bolas)', 14.90), ('Sobremesas', 'Banoffee', 21.90),
+    ('Sobremesas', 'Cookie Recheado', 9.90),
+]
+
+PAYMENT_METHODS = (['pix', 'credito', 'debito', 'dinheiro'], [40, 30, 20, 10])
+ORDER_TYPES = (['mesa', 'retirada', 'entrega'], [60, 25, 15])
+# Status por idade dos pedidos mais recentes (os únicos ainda em andamento)
+ACTIVE_BY_AGE = [(15, 'pendente', 'novo'), (30, 'preparando', 'preparando'), (45, 'pronto', 'pronto'),
+                 (None, 'entregue', 'entregue')]
+BATCH_SIZE = 20000
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def customer_name(index):
+    """Nome determinístico do cliente 'index' (1..N): o teste de carga faz login com ele"""
+    first = FIRST_NAMES[index % len(FIRST_NAMES)]
+    last = LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    return f'{first} {last} {index}'
+
+def customer_phone(index):
+    return f'11{900000000 + index}'
+
+def order_hour(rng):
+    roll = rng.random()
+    if roll < 0.45:
+        hour = rng.gauss(12.75, 0.8)
+    elif roll < 0.85:
+        hour = rng.gauss(20.5, 1.1)
+    else:
+        hour = rng.uniform(11, 23)
+    return min(23.99, max(10.5, hour))
+
+def order_times(rng, count, active, days, now):
+    """Horários dos pedidos (ordenados): almoço, jantar e um pouco ao longo do dia; fim de semana +40%.
+    
+    Os 'active' últimos caem na última hora: são os pedidos ainda em andamento no KDS.
+    """
+    start = (now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    day_weights = [1.4 if (start + timedelta(days=d)).weekday() >= 4 else 1.0 for d in range(days)]
+    day_indexes = rng.choices(range(days), weights=day_weights, k=count - active)
+    times = sorted(start + timedelta(days=day, hours=order_hour(rng)) for day in day_indexes)
+    times.extend(sorted(now - timedelta(minutes=rng.uniform(1, 60)) for _ in range(active)))
+    return times
+
+def setup_app_data(args, rng):
+    """Esquema, admin, configurações, cardápio, equipe e mesas pelas APIs da aplicação"""
+    from app import database, seed_defaults
+    from app.db_operations import Category, Product, Table, User
+    
+    database.init_db()
+    seed_defaults()
+    
+    categories = {row['name']: row['id'] for row in Category.get_all()}
+    with database.transaction():
+        for category, name, price in EXTRA_PRODUCTS:
+            Product.create(name=name, price=price, description=f'{name} da casa',
+                           category_id=categories.get(category), available=True)
+        for number in range(1, args.tables + 1):
+            Table.create(number=number, capacity=rng.choice([2, 4, 4, 4, 6, 8]))
+    
+    staff = []
+    for i in range(1, args.waiters + 1):
+        staff.append(User.create(username=f'garcom{i}', email=f'garcom{i}@meatz.com', password=STAFF_PASSWORD))
+    User.create(username='cozinha', email='cozinha@meatz.com', password=STAFF_PASSWORD, role='cozinha')
+    User.create(username='caixa', email='caixa@meatz.com', password=STAFF_PASSWORD, role='caixa')
+    
+    products = [(row['id'], row['price']) for row in Product.get_all(available_only=True)]
+    tables = [row['id'] for row in Table.get_all()]
+    database.get_pool().close_all()
+    return staff, products, tables
+
+def insert_customers(conn, args, rng, now):
+    rows = []
+    for index in range(1, args.customers + 1):
+        created_at = now - timedelta(days=rng.uniform(0, args.days))
+        rows.append((customer_name(index), customer_phone(index), f'cliente{index}@exemplo.com',
+                     f'0{rng.randint(1000000, 9999999)}', 'São Paulo', 'SP', created_at.strftime(TIMESTAMP_FORMAT)))
+    conn.executemany('''
+        INSERT INTO customer (name, phone, email, zipcode, city, state, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+
+def generate_orders(args, rng, staff, products, tables, now):
+    """Gera (pedido, itens, pagamento) em ordem cronológica; ids explícitos a partir de 1"""
+    times = order_times(rng, args.orders, args.active, args.days, now)
+    mean_items = args.items / args.orders
+    # Popularidade estilo Zipf: os primeiros produtos (embaralhados) vendem muito mais
+    popular = products[:]
+    rng.shuffle(popular)
+    product_weights = [1 / (rank + 1) ** 0.9 for rank in range(len(popular))]
+    active_from = args.orders - args.active
+    
+    item_id = 0
+    for index, created in enumerate(times):
+        order_id = index + 1
+        order_type = rng.choices(*ORDER_TYPES)[0]
+        payment_method = rng.choices(*PAYMENT_METHODS)[0]
+        age_minutes = (now - created).total_seconds() / 60
+        
+        if index >= active_from:
+            status, item_status = next((s, i) for limit, s, i in ACTIVE_BY_AGE if limit is None or age_minutes < limit)
+        elif rng.random() < 0.04:
+            status, item_status = 'cancelado', 'novo'
+        else:
+            status, item_status = 'pago', 'entregue'
+        
+        table_id = rng.choice(tables) if order_type == 'mesa' else None
+        user_id = rng.choice(staff) if order_type == 'mesa' else None
+        customer_id = None
+        if order_type != 'mesa' and args.customers:
+            # Clientes frequentes: 10% da base fazem cerca de metade dos pedidos
+            regulars = max(1, args.customers // 10)
+            customer_id = rng.randint(1, regulars) if rng.random() < 0.45 else rng.randint(1, args.customers)
+        
+        count = max(1, int(round(rng.gauss(mean_items, mean_items / 2))))
+        chosen = rng.choices(popular, weights=product_weights, k=count)
+        created_at = created.strftime(TIMESTAMP_FORMAT)
+        started = (created + timedelta(minutes=rng.uniform(1, 6))).strftime(TIMESTAMP_FORMAT)
+        completed = (created + timedelta(minutes=rng.uniform(8, 20))).strftime(TIMESTAMP_FORMAT)
+        delivered = (created + timedelta(minutes=rng.uniform(20, 35))).strftime(TIMESTAMP_FORMAT)
+        items = []
+        subtotal = 0.0
+        for product_id, price in chosen:
+            quantity = rng.choices([1, 2, 3], weights=[80, 15, 5])[0]
+            subtotal += price * quantity
+            item_id += 1
+            items.append((item_id, order_id, product_id, quantity, price, created_at, item_status,
+                          started if item_status != 'novo' else None,
+                          completed if item_status in ('pronto', 'entregue') else None,
+                          delivered if item_status == 'entregue' else None))
+        
+        delivery_fee = 5.0 if order_type == 'entrega' else 0.0
+        tip = round(subtotal * 0.1, 2) if order_type == 'mesa' and status == 'pago' and rng.random() < 0.6 else 0.0
+        total = round(subtotal + delivery_fee + tip, 2)
+        order = (order_id, table_id, user_id, status, total, payment_method if status == 'pago' else None,
+                 created_at, created_at, order_type, customer_id, 'Rua Exemplo, 100' if order_type == 'entrega' else None,
+                 delivery_fee, tip, 10.0 if tip else 0.0)
+        payment = (order_id, total, payment_method, 'pago', delivered) if status == 'pago' else None
+        yield order, items, payment
+
+def insert_orders(conn, rows_iter, args):
+    orders, items, payments = [], [], []
+    totals = {'orders': 0, 'items': 0, 'payments': 0}
+    started = time.perf_counter()
+    
+    def flush():
+        conn.executemany('''
+            INSERT INTO "order" (id, table_id, user_id, status, total, payment_method, created_at, updated_at,
+                                 order_type, customer_id, delivery_address, delivery_fee, tip_amount, tip_percentage)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', orders)
+        conn.executemany('''
+            INSERT INTO order_item (id, order_id, product_id, quantity, price, created_at, status,
+                                    prep_started_at, prep_completed_at, delivered_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', items)
+        conn.executemany('INSERT INTO payment (order_id, amount, method, status, created_at) VALUES (?, ?, ?, ?, ?)',
+                         payments)
+        conn.commit()
+        totals['orders'] += len(orders)
+        totals['items'] += len(items)
+        totals['payments'] += len(payments)
+        orders.clear()
+        items.clear()
+        payments.clear()
+        elapsed = time.perf_counter() - started
+        print(f"   {totals['orders']:>10,} pedidos | {totals['items']:>10,} itens | "
+              f"{totals['orders'] / elapsed:,.0f} pedidos/s", end='\r', flush=True)
+    
+    for order, order_items, payment in rows_iter:
+        orders.append(order)
+        items.extend(order_items)
+        if payment:
+            payments.append(payment)
+        if len(orders) >= BATCH_SIZE:
+            flush()
+    if orders:
+        flush()
+    print()
+    return totals
+
+def finalize(conn):
+    """Campos derivados: gasto dos clientes, mesas ocupadas pelos pedidos em andamento"""
+    conn.execute('''
+        UPDATE customer SET total_spent = s.total, loyalty_points = CAST(s.total / 10 AS INTEGER)
+        FROM (SELECT customer_id, SUM(total) as total FROM "order"
+              WHERE status = 'pago' AND customer_id IS NOT NULL GROUP BY customer_id) s
+        WHERE customer.id = s.customer_id
+    ''')
+    conn.execute('''
+        UPDATE "table" SET status = 'ocupada', current_order_id = a.order_id
+        FROM (SELECT table_id, MAX(id) as order_id FROM "order"
+              WHERE status IN ('pendente', 'preparando', 'pronto', 'entregue') AND table_id IS NOT NULL
+              GROUP BY table_id) a
+        WHERE "table".id = a.table_id
+    ''')
+    conn.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default=os.path.join('data', 'bench.db'))
+    parser.add_argument('--orders', type=int, default=1000000)
+    parser.add_argument('--items', type=int, default=5000000, help='Total aproximado de itens de pedido')
+    parser.add_argument('--tables', type=int, default=300)
+    parser.add_argument('--customers', type=int, default=50000)
+    parser.add_argument('--waiters', type=int, default=12)
+    parser.add_argument('--days', type=int, default=365, help='Dias de histórico antes de hoje')
+    parser.add_argument('--active', type=int, default=40, help='Pedidos mais recentes ainda em andamento (KDS)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help='Sobrescreve o arquivo de saída')
+    args = parser.parse_args()
+    args.active = min(args.active, args.orders)
+    
+    path = os.path.abspath(args.output)
+    if os.path.exists(path):
+        if not args.force:
+            parser.error(f'{path} já existe (use --force para sobrescrever)')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    
+    # Antes de qualquer conexão: o pool e os módulos usam o caminho do banco de teste
+    os.environ['DATABASE_PATH'] = path
+    from app import database
+    database.DB_PATH = path
+    
+    rng = random.Random(args.seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    started = time.perf_counter()
+    
+    print(f'🗄️  Gerando {path}')
+    staff, products, tables = setup_app_data(args, rng)
+    print(f'   {len(products)} produtos, {len(tables)} mesas, {len(staff)} garçons (senha: {STAFF_PASSWORD})')
+    
+    # Carga em lote numa conexão própria, sem fsync: o arquivo é descartável até o fim
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA cache_size = -200000')
+    insert_customers(conn, args, rng, now)
+    print(f'   {args.customers:,} clientes')
+    totals = insert_orders(conn, generate_orders(args, rng, staff, products, tables, now), args)
+    finalize(conn)
+    conn.close()
+    
+    from app.db_operations import SalesRollup
+    days = SalesRollup.backfill()
+    with database.get_db_connection() as conn:
+        conn.execute('ANALYZE')
+        conn.execute('PRAGMA optimize')
+    database.get_pool().close_all()
+    checkpoint = sqlite3.connect(path)
+    checkpoint.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    checkpoint.close()
+    
+    size_mb = os.path.getsize(path) / 1024 / 1024
+    print(f"✅ {totals['orders']:,} pedidos, {totals['items']:,} itens, {totals['payments']:,} pagamentos, "
+          f'{days} dias consolidados em {time.perf_counter() - started:.0f}s ({size_mb:,.0f} MB)')
+    print(f'   Para usar: DATABASE_PATH={path}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+"""Teste de carga com cenários de uso contra um servidor local (p50/p95/p99 e vazão por endpoint)
+
+Cenários (rodam juntos, cada usuário virtual em uma thread com sua própria sessão):
+  lunch_rush  garçons lançando pedidos no PDV (POST /pdv/api/pedido/criar)
+  kds         telas da cozinha consultando /pdv/api/kds/orders (quadro completo e depois ?since=)
+  browse      clientes navegando no cardápio, montando o carrinho e parte deles finalizando o pedido
+  admin       administradores abrindo /admin/relatorios
+
+Os usuários (garcom1..N, cozinha, admin) e os clientes seguem o banco gerado por bench.dataset.
+
+Uso: python -m bench.load [--base-url http://127.0.0.1:5000] [--duration 60]
+                          [--scenarios lunch_rush,kds,browse,admin] [--json resultado.json]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+from bench.dataset import STAFF_PASSWORD, customer_name, customer_phone
+
+SCENARIOS = ['lunch_rush', 'kds', 'browse', 'admin']
+PRODUCT_ID_RE = re.compile(r'data-id="(\d+)"')
+TABLE_ID_RE = re.compile(r'data-table-id="(\d+)"')
+REQUEST_TIMEOUT = 30
+
+class Stats:
+    """Latências (ms) e erros por rótulo de endpoint, compartilhados entre as threads"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.started = time.perf_counter()
+        self.finished = None
+    
+    def record(self, label, elapsed_ms, ok):
+        with self.lock:
+            self.latencies[label].append(elapsed_ms)
+            if not ok:
+                self.errors[label] += 1
+    
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+    
+    def report(self):
+        elapsed = self.elapsed()
+        rows = []
+        with self.lock:
+            for label in sorted(self.latencies):
+                values = sorted(self.latencies[label])
+                rows.append({
+                    'endpoint': label,
+                    'requests': len(values),
+                    'errors': self.errors[label],
+                    'rps': round(len(values) / elapsed, 2),
+                    'p50_ms': round(percentile(values, 50), 1),
+                    'p95_ms': round(percentile(values, 95), 1),
+                    'p99_ms': round(percentile(values, 99), 1),
+                    'max_ms': round(values[-1], 1)
+                })
+        return {'duration_s': round(elapsed, 1), 'endpoints': rows}
+
+def percentile(sorted_values, pct):
+    """Percentil por interpolação linear entre as amostras ordenadas"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+class Client:
+    """Sessão HTTP de um usuário virtual; cada chamada é cronometrada e registrada em Stats"""
+    
+    def __init__(self, base_url, stats):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.session = requests.Session()
+    
+    def request(self, label, method, path, expect=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, allow_redirects=False,
+                                            timeout=REQUEST_TIMEOUT, **kwargs)
+        except requests.RequestException:
+            self.stats.record(label, (time.perf_counter() - started) * 1000, False)
+            return None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        ok = expect(response) if expect else response.status_code < 400
+        self.stats.record(label, elapsed_ms, ok)
+        return response
+    
+    def get(self, label, path, **kwargs):
+        return self.request(label, 'GET', path, **kwargs)
+    
+    def post(self, label, path, **kwargs):
+        return self.request(label, 'POST', path, **kwargs)
+    
+    def staff_login(self, username, password):
+        # Login certo redireciona (302); senha errada devolve o formulário de novo (200)
+        response = self.post('POST /auth/login', '/auth/login', data={'username': username, 'password': password},
+                             expect=lambda r: r.status_code == 302)
+        return response is not None and response.status_code == 302
+
+def discover(base_url, args):
+    """Ids reais de produtos (cardápio) e mesas (mapa do salão); sem mesas, usa 1..--tables"""
+    session = requests.Session()
+    try:
+        menu = session.get(f'{base_url}/cardapio', timeout=REQUEST_TIMEOUT)
+        menu.raise_for_status()
+    except requests.RequestException as e:
+        raise SystemExit(f'❌ Servidor indisponível em {base_url}: {e}')
+    product_ids = sorted({int(i) for i in PRODUCT_ID_RE.findall(menu.text)})
+    if not product_ids:
+        raise SystemExit('Nenhum produto encontrado em /cardapio')
+    
+    table_ids = []
+    session.post(f'{base_url}/auth/login', data={'username': 'garcom1', 'password': args.staff_password},
+                 allow_redirects=False, timeout=REQUEST_TIMEOUT)
+    floor = session.get(f'{base_url}/pdv/mapa-salao', allow_redirects=False, timeout=REQUEST_TIMEOUT)
+    if floor.status_code == 200:
+        table_ids = sorted({int(i) for i in TABLE_ID_RE.findall(floor.text)})
+    return product_ids, table_ids or list(range(1, args.tables + 1))
+
+def lunch_rush(client, ctx, index, stop):
+    """Garçom: lança pedidos de 1 a 6 itens em mesas aleatórias, com pausas curtas"""
+    rng = random.Random(index)
+    username = f'garcom{index % ctx.args.staff_users + 1}'
+    if not client.staff_login(username, ctx.args.staff_password):
+        return
+    while not stop.is_set():
+        items = [{'product_id': product_id, 'quantity': rng.choice([1, 1, 1, 2])}
+                 for product_id in rng.sample(ctx.product_ids, min(len(ctx.product_ids), rng.randint(1, 6)))]
+        client.post('POST /pdv/api/pedido/criar', '/pdv/api/pedido/criar',
+                    json={'table_id': rng.choice(ctx.table_ids), 'items': items})
+        stop.wait(rng.uniform(*ctx.args.waiter_think))
+
+def kds(client, ctx, index, stop):
+    """Tela da cozinha: quadro completo na primeira chamada, depois só as mudanças (?since=cursor)"""
+    if not client.staff_login('cozinha', ctx.args.staff_password):
+        return
+    cursor = None
+    # Telas não ficam sincronizadas: cada uma começa em um ponto do intervalo
+    stop.wait(random.uniform(0, ctx.args.kds_interval))
+    while not stop.is_set():
+        if cursor:
+            response = client.get('GET /pdv/api/kds/orders?since', f'/pdv/api/kds/orders?since={cursor}')
+        else:
+            response = client.get('GET /pdv/api/kds/orders', '/pdv/api/kds/orders')
+        if response is not None and response.status_code == 200:
+            cursor = response.json().get('cursor', cursor)
+        stop.wait(ctx.args.kds_interval)
+
+def browse(client, ctx, index, stop):
+    """Cliente: home, cardápio, produtos e carrinho; uma parte faz login e finaliza a compra"""
+    rng = random.Random(1000 + index)
+    while not stop.is_set():
+        # Cada volta é um visitante novo (sessão e carrinho vazios)
+        client.session = requests.Session()
+        client.get('GET /', '/')
+        client.get('GET /cardapio', '/cardapio')
+        for product_id in rng.sample(ctx.product_ids, min(len(ctx.product_ids), rng.randint(1, 3))):
+            client.get('GET /produto/<id>', f'/produto/{product_id}')
+            stop.wait(rng.uniform(*ctx.args.customer_think))
+            client.post('POST /api/cart/add', '/api/cart/add',
+                        json={'product_id': product_id, 'quantity': rng.choice([1, 1, 2])})
+        client.get('GET /carrinho', '/carrinho')
+        
+        if stop.is_set() or rng.random() >= ctx.args.checkout_rate:
+            stop.wait(rng.uniform(*ctx.args.customer_think))
+            continue
+        customer = rng.randint(1, ctx.args.customer_pool)
+        client.post('POST /auth/cliente/login', '/auth/cliente/login',
+                    data={'name': customer_name(customer), 'phone': customer_phone(customer)})
+        client.get('GET /checkout', '/checkout')
+        client.post('POST /checkout', '/checkout', data={'order_type': 'retirada', 'payment_method': 'pix'},
+                    expect=lambda r: r.status_code == 302 and '/sucesso' in r.headers.get('Location', ''))
+        stop.wait(rng.uniform(*ctx.args.customer_think))
+
+def admin(client, ctx, index, stop):
+    """Administrador: relatórios de hoje, da semana e do mês, com leitura demorada entre eles"""
+    rng = random.Random(2000 + index)
+    if not client.staff_login('admin', ctx.args.admin_password):
+        return
+    while not stop.is_set():
+        period = rng.choice(['today', 'week', 'month'])
+        client.get(f'GET /admin/relatorios?period={period}', f'/admin/relatorios?period={period}')
+        stop.wait(rng.uniform(*ctx.args.admin_think))
+
+class Context:
+    def __init__(self, args, product_ids, table_ids):
+        self.args = args
+        self.product_ids = product_ids
+        self.table_ids = table_ids
+
+def run(args):
+    product_ids, table_ids = discover(args.base_url, args)
+    print(f'🎯 {args.base_url}: {len(product_ids)} produtos, {len(table_ids)} mesas')
+    ctx = Context(args, product_ids, table_ids)
+    stats = Stats()
+    stop = threading.Event()
+    
+    users = {'lunch_rush': (lunch_rush, args.waiters), 'kds': (kds, args.kds_screens),
+             'browse': (browse, args.customers), 'admin': (admin, args.admins)}
+    threads = []
+    for name in args.scenarios:
+        scenario, count = users[name]
+        for index in range(count):
+            client = Client(args.base_url, stats)
+            threads.append(threading.Thread(target=scenario, args=(client, ctx, index, stop),
+                                            name=f'{name}-{index}', daemon=True))
+    print(f"🚦 {len(threads)} usuários virtuais por {args.duration}s ({', '.join(args.scenarios)})")
+    
+    # Rampa de subida: as threads entram espaçadas ao longo de --ramp segundos
+    for thread in threads:
+        thread.start()
+        time.sleep(args.ramp / max(1, len(threads)))
+    stop.wait(max(0, args.duration - args.ramp))
+    stop.set()
+    for thread in threads:
+        thread.join(REQUEST_TIMEOUT)
+    stats.finished = time.perf_counter()
+    return stats.report()
+
+def print_report(result):
+    rows = result['endpoints']
+    width = max([len('Endpoint')] + [len(row['endpoint']) for row in rows])
+    print(f"\n📊 Resultado ({result['duration_s']}s)")
+    print(f"{'Endpoint':<{width}} {'Req':>7} {'Erros':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'máx ms':>8}")
+    for row in rows:
+        print(f"{row['endpoint']:<{width}} {row['requests']:>7} {row['errors']:>6} {row['rps']:>8.1f} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}")
+    total = sum(row['requests'] for row in rows)
+    errors = sum(row['errors'] for row in rows)
+    print(f"\nTotal: {total} requisições, {errors} erros, {total / max(result['duration_s'], 0.001):.1f} req/s")
+
+def think_range(value):
+    low, _, high = value.partition(',')
+    return float(low), float(high or low)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--duration', type=float, default=60, help='Duração total em segundos (inclui a rampa)')
+    parser.add_argument('--ramp', type=float, default=5, help='Segundos para subir todos os usuários')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Lista separada por vírgulas')
+    parser.add_argument('--waiters', type=int, default=8, help='Garçons no lunch_rush')
+    parser.add_argument('--kds-screens', type=int, default=10)
+    parser.add_argument('--kds-interval', type=float, default=5, help='Segundos entre consultas (igual ao JS do KDS)')
+    parser.add_argument('--customers', type=int, default=20, help='Clientes navegando ao mesmo tempo')
+    parser.add_argument('--admins', type=int, default=2)
+    parser.add_argument('--checkout-rate', type=float, default=0.3, help='Fração dos clientes que finaliza o pedido')
+    parser.add_argument('--waiter-think', type=think_range, default=(0.5, 2), help='Pausa entre pedidos: min,max (s)')
+    parser.add_argument('--customer-think', type=think_range, default=(1, 4))
+    parser.add_argument('--admin-think', type=think_range, default=(5, 15))
+    parser.add_argument('--staff-users', type=int, default=12, help='Quantidade de garcomN no banco (--waiters do dataset)')
+    parser.add_argument('--staff-password', default=STAFF_PASSWORD)
+    parser.add_argument('--admin-password', default=os.getenv('ADMIN_DEFAULT_PASSWORD', 'admin123'))
+    parser.add_argument('--customer-pool', type=int, default=50000, help='Clientes existentes (--customers do dataset)')
+    parser.add_argument('--tables', type=int, default=300, help='Mesas assumidas se o mapa do salão não abrir')
+    parser.add_argument('--json', help='Grava o resultado também em JSON')
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"cenários desconhecidos: {', '.join(sorted(unknown))}")
+    args.ramp = min(args.ramp, args.duration)
+    
+    result = run(args)
+    result['scenarios'] = args.scenarios
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f'💾 {args.json}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Micro-benchmark: conexões por segundo com e sem o pool de app/database.py
+
+Uso: python -m bench.pool_benchmark [--iterations 20000]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+
+from app import database
+
+def setup_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE product (id INTEGER PRIMARY KEY, name TEXT, price REAL)')
+    conn.executemany('INSERT INTO product (name, price) VALUES (?, ?)',
+                     [(f'Produto {i}', 10.0 + i) for i in range(100)])
+    conn.commit()
+    conn.close()
+
+@contextmanager
+def unpooled_connection(path):
+    """Comportamento antigo: connect/close a cada chamada"""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def run(label, factory, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        with factory() as conn:
+            conn.execute('SELECT * FROM product WHERE id = ?', (i % 100 + 1,)).fetchone()
+    elapsed = time.perf_counter() - start
+    rate = iterations / elapsed
+    print(f'{label:<12} {iterations} conexões em {elapsed:.3f}s -> {rate:,.0f} conexões/s')
+    return rate
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        setup_db(path)
+        database.DB_PATH = path
+        
+        before = run('sem pool', lambda: unpooled_connection(path), args.iterations)
+        after = run('com pool', database.get_db_connection, args.iterations)
+        database.get_pool().close_all()
+    
+    print(f'Ganho: {after / before:.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Stress test de leitores/escritores concorrentes: configuração antiga x WAL com pragmas ajustados
+
+Cada processo simula um worker do gunicorn: escritores inserem pedidos com itens (como o PDV)
+e leitores consultam o quadro de pedidos ativos (como o KDS).
+
+Uso: python -m bench.wal_benchmark [--readers 4] [--writers 2] [--duration 5]
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+# Comportamento anterior: journal em modo DELETE, fsync completo e o timeout padrão de 5s do sqlite3
+LEGACY = {
+    'JOURNAL_MODE': 'DELETE',
+    'SYNCHRONOUS': 'FULL',
+    'MMAP_SIZE': 0,
+    'CACHE_SIZE': -2000,
+    'TEMP_STORE': 'DEFAULT',
+    'BUSY_TIMEOUT_MS': 5000,
+    'LOCK_RETRIES': 0,
+    'CHECKPOINT_INTERVAL': 0,
+}
+
+TUNED = {}
+
+def setup_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE "order" (id INTEGER PRIMARY KEY, status TEXT, total REAL,
+                              created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE order_item (id INTEGER PRIMARY KEY, order_id INTEGER, product_id INTEGER,
+                                 quantity INTEGER, price REAL);
+        CREATE INDEX idx_order_status ON "order" (status);
+        CREATE INDEX idx_order_item_order ON order_item (order_id);
+    ''')
+    conn.close()
+
+def worker(role, path, settings, duration, results):
+    from app import database
+    database.DB_PATH = path
+    for key, value in settings.items():
+        setattr(database, key, value)
+    
+    ops = errors = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        try:
+            if role == 'writer':
+                with database.transaction() as conn:
+                    order_id = conn.execute('INSERT INTO "order" (status, total) VALUES (?, ?)',
+                                            ('pendente', 42.0)).lastrowid
+                    conn.executemany('INSERT INTO order_item (order_id, product_id, quantity, price) VALUES (?, ?, ?, ?)',
+                                     [(order_id, p, 1, 10.5) for p in range(1, 5)])
+                    conn.execute('UPDATE "order" SET status = ? WHERE id = ?', ('preparando', order_id - 10))
+            else:
+                with database.get_db_connection() as conn:
+                    conn.execute('''
+                        SELECT o.id, COUNT(oi.id) FROM "order" o
+                        LEFT JOIN order_item oi ON oi.order_id = o.id
+                        WHERE o.status IN ('pendente', 'preparando')
+                        GROUP BY o.id ORDER BY o.id DESC LIMIT 40
+                    ''').fetchall()
+            ops += 1
+        except sqlite3.OperationalError as e:
+            if not database.is_locked_error(e):
+                raise
+            errors += 1
+    results.put((role, ops, errors))
+
+def run(label, settings, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'stress.db')
+        setup_db(path)
+        results = multiprocessing.Queue()
+        roles = ['reader'] * args.readers + ['writer'] * args.writers
+        procs = [multiprocessing.Process(target=worker, args=(role, path, settings, args.duration, results))
+                 for role in roles]
+        for proc in procs:
+            proc.start()
+        totals = {'reader': [0, 0], 'writer': [0, 0]}
+        for _ in procs:
+            role, ops, errors = results.get()
+            totals[role][0] += ops
+            totals[role][1] += errors
+        for proc in procs:
+            proc.join()
+    
+    reads, read_errors = totals['reader']
+    writes, write_errors = totals['writer']
+    print(f'{label:<8} leituras/s: {reads / args.duration:>9,.0f}  escritas/s: {writes / args.duration:>7,.0f}  '
+          f'"database is locked": {read_errors + write_errors}')
+    return (reads + writes) / args.duration
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=5)
+    args = parser.parse_args()
+    
+    before = run('antigo', LEGACY, args)
+    after = run('WAL', TUNED, args)
+    print(f'Ganho de throughput total: {after / before:.1f}x')
+
+if __name__ == '__main__':
+    main()
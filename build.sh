@@ -6,5 +6,8 @@ echo "📦 Instalando dependências..."
 pip install --upgrade pip
 pip install -r requirements.txt
 
+echo "🗜️  Gerando assets estáticos (hash, minificação, gzip/brotli)..."
+python -m app.assets
+
 echo "✅ Build completo!"
 echo "ℹ️  Banco de dados será inicializado no primeiro start (runtime)"
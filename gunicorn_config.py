@@ -4,7 +4,9 @@ import multiprocessing
 bind = "0.0.0.0:" + str(os.getenv("PORT", "10000"))
 
 workers = 2
-worker_class = "sync"
+# gthread: conexões SSE do KDS (/pdv/api/kds/stream) ocupam uma thread, não o worker inteiro
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
 worker_connections = 100
 max_requests = 500
 max_requests_jitter = 50
@@ -20,3 +22,25 @@ errorlog = "-"
 loglevel = "info"
 
 worker_tmp_dir = "/dev/shm"
+
+def on_starting(server):
+    # Métricas (/metrics) recomeçam junto com o servidor: descarta arquivos de execuções anteriores
+    from app.metrics import reset
+    reset()
+
+def worker_exit(server, worker):
+    # Grava os registros de auditoria ainda no buffer antes de o worker encerrar
+    # (reciclagem por max_requests, deploy, SIGTERM)
+    from app.audit import flush_on_shutdown
+    flush_on_shutdown()
+    
+    from app.metrics import registry
+    try:
+        registry.flush()
+    except Exception as e:
+        print(f'⚠️  Erro ao gravar métricas do worker: {e}')
+
+def child_exit(server, worker):
+    # No master: consolida os contadores do worker encerrado para não zerá-los na reciclagem
+    from app.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Antes de importar o app: banco, métricas e logs num diretório temporário e sem threads
+# de fundo (workers de jobs, flush de métricas, build de assets)
+_TMP_DIR = tempfile.mkdtemp(prefix='meatz-tests-')
+os.environ['DATABASE_PATH'] = os.path.join(_TMP_DIR, 'meatz.db')
+os.environ.setdefault('SESSION_SECRET', 'test')
+os.environ.setdefault('JOB_WORKERS_IN_PROCESS', '0')
+os.environ.setdefault('METRICS_ENABLED', '0')
+os.environ.setdefault('ASSETS_BUILD_ON_STARTUP', '0')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import database
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Banco vazio e exclusivo do teste; o pool é recriado para o novo caminho"""
+    path = str(tmp_path / 'meatz.db')
+    monkeypatch.setattr(database, 'DB_PATH', path)
+    yield path
+    if database._pool is not None:
+        database._pool.close_all()
+
+
+@pytest.fixture
+def db(db_path):
+    """Banco do teste já migrado"""
+    database.migrate()
+    return db_path
+
+
+@pytest.fixture
+def app(db):
+    from app import create_app
+    
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def admin_client(app):
+    from app import seed_defaults
+    
+    seed_defaults()
+    client = app.test_client()
+    response = client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 302
+    return client
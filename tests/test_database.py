@@ -0,0 +1,49 @@
+import multiprocessing
+
+from app import database
+from app.database import get_db_connection, get_pool
+
+
+def _child_pool_check(parent_pool_id, parent_conn_id, results):
+    pool = get_pool()
+    with get_db_connection() as conn:
+        value = conn.execute('SELECT 1').fetchone()[0]
+        results.put({
+            'new_pool': id(pool) != parent_pool_id,
+            'pool_pid': pool.pid == database.os.getpid(),
+            'new_conn': id(conn) != parent_conn_id,
+            'value': value,
+        })
+
+
+def test_pool_reuses_connections(db):
+    pool = get_pool()
+    with get_db_connection() as first:
+        pass
+    with get_db_connection() as second:
+        pass
+    assert first is second
+    assert get_pool() is pool
+
+
+def test_pool_rebuilt_after_fork(db):
+    # Fork com uma conexão retirada do pool, como no preload do gunicorn: o filho não
+    # pode reaproveitar nem o pool nem a conexão da thread herdados do pai
+    ctx = multiprocessing.get_context('fork')
+    results = ctx.Queue()
+    parent_pool = get_pool()
+    with get_db_connection() as parent_conn:
+        child = ctx.Process(target=_child_pool_check, args=(id(parent_pool), id(parent_conn), results))
+        child.start()
+        result = results.get(timeout=10)
+        child.join(timeout=10)
+    
+    assert child.exitcode == 0
+    assert result == {'new_pool': True, 'pool_pid': True, 'new_conn': True, 'value': 1}
+    assert get_pool() is parent_pool
+
+
+def test_pool_rebuilt_when_pid_changes(db, monkeypatch):
+    pool = get_pool()
+    monkeypatch.setattr(database.os, 'getpid', lambda: pool.pid + 1)
+    assert get_pool() is not pool
@@ -0,0 +1,103 @@
+import pytest
+
+from app.database import get_db_connection
+from app.db_operations import Order, OrderItem, Table
+
+
+@pytest.fixture
+def kds(admin_client):
+    def fetch(since=None):
+        url = '/pdv/api/kds/orders' + (f'?since={since}' if since is not None else '')
+        response = admin_client.get(url)
+        assert response.status_code == 200
+        return response.get_json()
+    
+    return fetch
+
+
+def create_order(client, table_number, product_ids):
+    response = client.post('/pdv/api/pedido/criar', json={
+        'table_id': table_number,
+        'items': [{'product_id': product_id, 'quantity': 1} for product_id in product_ids]
+    })
+    assert response.status_code == 200
+    return response.get_json()['order_id']
+
+
+def test_since_returns_only_changes_and_tombstones(admin_client, kds):
+    Table.create(1)
+    Table.create(2)
+    first_order = create_order(admin_client, 1, [1, 2])
+    second_order = create_order(admin_client, 2, [3])
+    
+    board = kds()
+    assert board['full'] is True
+    cursor = board['cursor']
+    
+    # Sem alterações: delta vazio e o mesmo cursor
+    delta = kds(cursor)
+    assert delta['full'] is False
+    assert (delta['orders'], delta['items'], delta['removed_orders'], delta['removed_items']) == ([], [], [], [])
+    assert delta['cursor'] == cursor
+    
+    # Item alterado sai sozinho, sem o pedido inteiro
+    first_item, second_item = OrderItem.get_by_order(first_order)
+    OrderItem.update_status(first_item['id'], 'preparando')
+    delta = kds(cursor)
+    assert delta['orders'] == []
+    assert [(item['id'], item['status']) for item in delta['items']] == [(first_item['id'], 'preparando')]
+    assert delta['cursor'] > cursor
+    cursor = delta['cursor']
+    
+    # Item excluído vira tombstone
+    OrderItem.delete(second_item['id'])
+    delta = kds(cursor)
+    assert delta['removed_items'] == [second_item['id']]
+    assert second_item['id'] not in [item['id'] for item in delta['items']]
+    cursor = delta['cursor']
+    
+    # Pedido que sai do quadro (entregue) e pedido excluído entram em removed_orders
+    Order.update(first_order, status='entregue')
+    Order.delete(second_order)
+    delta = kds(cursor)
+    assert delta['orders'] == []
+    assert delta['removed_orders'] == [first_order, second_order]
+    cursor = delta['cursor']
+    
+    # Pedido novo chega completo, com todos os itens
+    third_order = create_order(admin_client, 1, [1, 3])
+    delta = kds(cursor)
+    assert [order['id'] for order in delta['orders']] == [third_order]
+    assert len(delta['orders'][0]['items']) == 2
+    assert delta['items'] == []
+    assert delta['removed_orders'] == []
+
+
+def test_stale_cursor_falls_back_to_full_board(admin_client, kds):
+    Table.create(1)
+    create_order(admin_client, 1, [1])
+    cursor = kds()['cursor']
+    
+    assert kds(cursor + 100)['full'] is True
+    
+    # Eventos expurgados: o cliente precisa recarregar o quadro inteiro
+    with get_db_connection() as conn:
+        conn.execute('DELETE FROM kds_event')
+    assert kds(1)['full'] is True
+
+
+def test_job_maintenance_prunes_events_without_streams(db, monkeypatch):
+    from app.events import EVENT_RETENTION_HOURS, kds_events
+    from app.jobs import worker_pool
+    
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO kds_event (event_type, order_id, created_at) VALUES ('order_created', 1, datetime('now', ?))",
+                     (f'-{EVENT_RETENTION_HOURS + 1} hours',))
+        conn.execute("INSERT INTO kds_event (event_type, order_id) VALUES ('order_created', 2)")
+    
+    assert kds_events.subscribers == 0
+    monkeypatch.setattr(worker_pool, '_maintained_at', 0)
+    worker_pool._maintain()
+    
+    with get_db_connection() as conn:
+        assert [row[0] for row in conn.execute('SELECT order_id FROM kds_event')] == [2]
@@ -0,0 +1,59 @@
+import multiprocessing
+import sqlite3
+
+from app import database
+from app.database import SCHEMA_VERSION, MIGRATIONS, get_db_connection, get_schema_version, init_db, migrate
+
+
+def columns(table):
+    with get_db_connection() as conn:
+        return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def _migrate_in_child(barrier, results):
+    barrier.wait(timeout=10)
+    results.put(migrate())
+
+
+def test_migrate_runs_once_across_processes(db_path):
+    ctx = multiprocessing.get_context('fork')
+    barrier = ctx.Barrier(2)
+    results = ctx.Queue()
+    workers = [ctx.Process(target=_migrate_in_child, args=(barrier, results)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    applied = [results.get(timeout=30) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=10)
+    
+    assert [worker.exitcode for worker in workers] == [0, 0]
+    # Um worker aplica tudo; o outro espera a trava e encontra o esquema em dia
+    assert sorted(applied, key=len) == [[], [version for version, _, _ in MIGRATIONS]]
+    with get_db_connection() as conn:
+        versions = [row[0] for row in conn.execute('SELECT version FROM schema_version ORDER BY version')]
+    assert versions == [version for version, _, _ in MIGRATIONS]
+
+
+def test_init_db_adopts_baseline_database(db_path):
+    # Banco criado antes do versionamento: tabelas originais, sem schema_version nem change_seq
+    conn = sqlite3.connect(db_path)
+    database._create_tables(conn.cursor())
+    conn.execute("INSERT INTO user (username, email, role) VALUES ('antigo', 'antigo@meatz.com', 'admin')")
+    conn.commit()
+    conn.close()
+    assert 'change_seq' not in columns('"order"')
+    assert get_schema_version() == 0
+    
+    assert init_db() is True
+    
+    assert get_schema_version() == SCHEMA_VERSION
+    assert 'change_seq' in columns('"order"')
+    assert 'change_seq' in columns('order_item')
+    with get_db_connection() as conn:
+        assert conn.execute('SELECT username FROM user').fetchall()[0][0] == 'antigo'
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {name for name, _, _ in database.INDEXES} <= indexes
+    
+    # Com o esquema em dia o boot seguinte não migra nada
+    assert init_db() is False
+    assert migrate() == []
@@ -0,0 +1,65 @@
+from app.database import get_db_connection
+from app.db_operations import Order, OrderItem, Product, SalesRollup
+
+
+def snapshot():
+    with get_db_connection() as conn:
+        sales = [tuple(row) for row in conn.execute(
+            'SELECT sale_date, orders_count, ROUND(revenue, 2) FROM daily_sales ORDER BY sale_date')]
+        products = [tuple(row) for row in conn.execute('''
+            SELECT sale_date, product_id, quantity, ROUND(revenue, 2) FROM daily_product_sales
+            ORDER BY sale_date, product_id
+        ''')]
+    return sales, products
+
+
+def create_order(items):
+    order_id = Order.create(total=sum(price * quantity for _, quantity, price in items))
+    for product_id, quantity, price in items:
+        OrderItem.create(order_id, product_id, quantity, price)
+    return order_id
+
+
+def test_deltas_match_full_rebuild(db):
+    burger = Product.create('Burger', 30.0)
+    fries = Product.create('Fritas', 12.5)
+    
+    first = create_order([(burger, 2, 30.0), (fries, 1, 12.5)])
+    second = create_order([(burger, 1, 30.0)])
+    third = create_order([(fries, 3, 12.5)])
+    assert snapshot() == ([], [])
+    
+    Order.update(first, status='pago')
+    Order.update(second, status='pago')
+    Order.update(third, status='pago')
+    Order.update(second, total=35.0)
+    Order.update(third, status='cancelado')
+    Order.update(first, notes='sem cebola')
+    Order.delete(second)
+    
+    incremental = snapshot()
+    SalesRollup.backfill()
+    assert incremental == snapshot()
+    assert incremental[0][0][1:] == (1, 72.5)
+
+
+def test_leaving_paid_removes_empty_rows(db):
+    burger = Product.create('Burger', 30.0)
+    order_id = create_order([(burger, 1, 30.0)])
+    
+    Order.update(order_id, status='pago')
+    assert snapshot()[0][0][1:] == (1, 30.0)
+    
+    Order.update(order_id, status='pendente')
+    assert snapshot() == ([], [])
+
+
+def test_update_without_status_or_total_skips_rollup(db, monkeypatch):
+    burger = Product.create('Burger', 30.0)
+    order_id = create_order([(burger, 1, 30.0)])
+    Order.update(order_id, status='pago')
+    
+    calls = []
+    monkeypatch.setattr(SalesRollup, 'apply_order_change', staticmethod(lambda *args: calls.append(args)))
+    Order.update(order_id, notes='mesa 4')
+    assert calls == []
@@ -0,0 +1,16 @@
+from app.db_operations import Settings
+
+
+def test_missing_settings_row_keeps_site_fallback(db):
+    settings = Settings._load_typed()
+    assert settings.id is None
+    assert settings.store_name == 'BurgerLoft'
+    assert (settings.phone, settings.email, settings.address, settings.opening_hours) == ('', '', '', '')
+
+
+def test_settings_row_is_typed(db):
+    Settings.create(store_name='Meatz Burger', enable_delivery=0, delivery_fee=7)
+    settings = Settings._load_typed()
+    assert settings.store_name == 'Meatz Burger'
+    assert settings.enable_delivery is False
+    assert settings.delivery_fee == 7.0
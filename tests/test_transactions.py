@@ -0,0 +1,121 @@
+import pytest
+
+from app import database
+from app.database import get_db_connection, transaction, after_commit
+
+
+def count_categories():
+    with get_db_connection() as conn:
+        return conn.execute('SELECT COUNT(*) FROM category').fetchone()[0]
+
+
+def insert_category(conn, name):
+    conn.execute('INSERT INTO category (name) VALUES (?)', (name,))
+
+
+def test_nested_transaction_rolls_back_on_exception(db):
+    with pytest.raises(RuntimeError):
+        with transaction() as conn:
+            insert_category(conn, 'Externa')
+            with transaction() as inner:
+                assert inner is conn
+                insert_category(inner, 'Interna')
+                raise RuntimeError('falha no meio da unidade de trabalho')
+    
+    assert count_categories() == 0
+    assert not database.in_transaction()
+
+
+def test_nested_transaction_commits_once_at_outer_block(db):
+    with transaction() as conn:
+        with transaction() as inner:
+            insert_category(inner, 'Interna')
+        # O bloco interno não confirma: a escrita ainda está pendente
+        assert conn.in_transaction
+        insert_category(conn, 'Externa')
+    
+    assert count_categories() == 2
+
+
+def test_after_commit_skipped_on_rollback(db):
+    calls = []
+    with pytest.raises(RuntimeError):
+        with transaction() as conn:
+            insert_category(conn, 'Burgers')
+            after_commit(lambda: calls.append('commit'))
+            raise RuntimeError('desfaz')
+    
+    assert calls == []
+    
+    # A lista de callbacks não vaza para a próxima transação da mesma thread
+    with transaction() as conn:
+        insert_category(conn, 'Bebidas')
+    assert calls == []
+
+
+def test_after_commit_runs_after_commit(db):
+    seen = []
+    
+    def callback():
+        # Roda fora da transação, com os dados já visíveis para outras conexões
+        seen.append((database.in_transaction(), count_categories()))
+    
+    with transaction() as conn:
+        insert_category(conn, 'Burgers')
+        after_commit(callback)
+        assert seen == []
+    
+    assert seen == [(False, 1)]
+
+
+def test_after_commit_without_transaction_runs_immediately(db):
+    calls = []
+    after_commit(lambda: calls.append('agora'))
+    assert calls == ['agora']
+
+
+def test_caught_inner_failure_undoes_only_its_writes(db):
+    calls = []
+    with transaction() as conn:
+        insert_category(conn, 'Externa')
+        after_commit(lambda: calls.append('externa'))
+        try:
+            with get_db_connection() as inner:
+                insert_category(inner, 'Interna')
+                after_commit(lambda: calls.append('interna'))
+                raise RuntimeError('falha capturada pelo bloco externo')
+        except RuntimeError:
+            pass
+        assert conn.in_transaction
+        insert_category(conn, 'Depois')
+    
+    with get_db_connection() as conn:
+        names = [row[0] for row in conn.execute('SELECT name FROM category ORDER BY id')]
+    assert names == ['Externa', 'Depois']
+    assert calls == ['externa']
+
+
+def test_caught_inner_failure_before_outer_writes(db):
+    # Bloco externo ainda sem transação aberta: a falha interna desfaz só o que ela escreveu
+    with get_db_connection() as conn:
+        assert not conn.in_transaction
+        try:
+            with transaction() as inner:
+                insert_category(inner, 'Interna')
+                raise RuntimeError('falha')
+        except RuntimeError:
+            pass
+        insert_category(conn, 'Externa')
+    
+    with get_db_connection() as conn:
+        assert [row[0] for row in conn.execute('SELECT name FROM category')] == ['Externa']
+
+
+def test_nested_success_keeps_writes_in_outer_unit(db):
+    with pytest.raises(RuntimeError):
+        with transaction() as conn:
+            with get_db_connection() as inner:
+                insert_category(inner, 'Interna')
+            raise RuntimeError('falha depois do bloco interno')
+    
+    assert count_categories() == 0